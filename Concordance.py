@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from Corpus_query import INPUT_FILE, load_corpus, dataset_fingerprint, parse_years
+from Corpus_mmap import OUTPUT_DIR as MMAP_DIR, MappedCorpus, build_mmap_corpus, is_current
+import Text_pipeline
+from Text_pipeline import tokenize
+
+# --- Configuration ---
+INDEX_DIR = 'Data/UHRI_Internet.kwic'   # Positional index over the mapped corpus
+WINDOW = 8          # Tokens shown on each side of a hit
+PAGE_SIZE = 20      # Contexts per page
+CHUNK = 4096        # Hits formatted per step when streaming
+FORMAT_VERSION = 1
+
+# Layout of INDEX_DIR (positions count tokens over the whole corpus):
+#   vocab.json         token of every token ID (lowercased, as Text_pipeline.tokenize)
+#   tokens.npy         int32[n_tokens] token IDs of all records, concatenated
+#   record_starts.npy  int64[n_records + 1] position of each record's first token
+#   postings.npy       positions grouped by token ID, ascending within each token
+#   post_offsets.npy   int64[n_vocab + 1] start of each token's positions in postings
+#   meta.json          written last; source fingerprint, tokenizer, counts
+
+
+def build_index(corpus, out_dir=INDEX_DIR, fingerprint=None):
+    """Tokenize every record of the mapped corpus once and write the positional index."""
+    os.makedirs(out_dir, exist_ok=True)
+    vocab = {}
+    tokens = array('i')
+    starts = np.zeros(len(corpus) + 1, dtype=np.int64)
+    for i, text in enumerate(corpus.texts()):
+        tokens.extend(vocab.setdefault(t, len(vocab)) for t in tokenize(text))
+        starts[i + 1] = len(tokens)
+    tokens = np.frombuffer(tokens, dtype=np.int32) if len(tokens) else np.zeros(0, dtype=np.int32)
+
+    # A stable sort by token ID lists every token's positions in ascending order
+    pos_dtype = np.int32 if len(tokens) < 2 ** 31 else np.int64
+    postings = np.argsort(tokens, kind='stable').astype(pos_dtype)
+    post_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tokens, minlength=len(vocab)), out=post_offsets[1:])
+
+    with open(os.path.join(out_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(list(vocab), f)
+    np.save(os.path.join(out_dir, 'tokens.npy'), tokens)
+    np.save(os.path.join(out_dir, 'record_starts.npy'), starts)
+    np.save(os.path.join(out_dir, 'postings.npy'), postings)
+    np.save(os.path.join(out_dir, 'post_offsets.npy'), post_offsets)
+    # meta.json is written last: its presence marks a complete index
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': FORMAT_VERSION, 'n_records': len(corpus), 'n_tokens': len(tokens),
+                   'n_vocab': len(vocab), 'tokenizer': Text_pipeline.TOKENIZER,
+                   'source_fingerprint': fingerprint}, f, indent=4)
+
+
+class ConcordanceIndex:
+    """
+    Keyword-in-context lookups over a positional index. Hits of a term or
+    phrase come from its postings, never from a rescan of the texts; body,
+    year and group filters are record masks over the mapped corpus arrays.
+    """
+
+    def __init__(self, corpus, path=INDEX_DIR):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version {self.meta['version']}")
+        with open(os.path.join(path, 'vocab.json'), 'r', encoding='utf-8') as f:
+            self.vocab = json.load(f)
+        self.ids = {t: i for i, t in enumerate(self.vocab)}
+        self.corpus = corpus
+        self.tokens = np.load(os.path.join(path, 'tokens.npy'), mmap_mode='r')
+        self.starts = np.load(os.path.join(path, 'record_starts.npy'), mmap_mode='r')
+        self.postings = np.load(os.path.join(path, 'postings.npy'), mmap_mode='r')
+        self.post_offsets = np.load(os.path.join(path, 'post_offsets.npy'), mmap_mode='r')
+
+    def positions(self, token):
+        """Ascending corpus positions of one (lowercased) token."""
+        k = self.ids.get(token)
+        if k is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.postings[self.post_offsets[k]:self.post_offsets[k + 1]], dtype=np.int64)
+
+    def record_of(self, positions):
+        return np.searchsorted(self.starts, positions, side='right') - 1
+
+    def phrase_positions(self, phrase):
+        """
+        Start positions of 'phrase' (tokenized like the corpus), ascending.
+        The rarest token's postings are the candidates; the other tokens are
+        checked in the token array, and hits may not cross record boundaries.
+        """
+        words = tokenize(phrase)
+        if not words or any(w not in self.ids for w in words):
+            return np.zeros(0, dtype=np.int64)
+        ids = [self.ids[w] for w in words]
+        sizes = [self.post_offsets[k + 1] - self.post_offsets[k] for k in ids]
+        anchor = int(np.argmin(sizes))
+        cand = self.positions(words[anchor]) - anchor
+        cand = cand[(cand >= 0) & (cand + len(ids) <= len(self.tokens))]
+        for j, k in enumerate(ids):
+            if j != anchor:
+                cand = cand[self.tokens[cand + j] == k]
+        return cand[cand + len(ids) <= self.starts[self.record_of(cand) + 1]]
+
+    def record_mask(self, years=None, bodies=None, group=None):
+        """
+        True for records in the year range (start, end), of one of 'bodies'
+        and, with 'group' (a tuple of words such as Bodies_groups.related_words),
+        containing any of its words as a token.
+        """
+        mask = np.ones(len(self.corpus), dtype=bool)
+        if years is not None:
+            year = np.asarray(self.corpus.year)
+            mask &= (year >= years[0]) & (year <= years[1])
+        if bodies is not None:
+            codes = [self.corpus.body_code(b) for b in bodies]
+            mask &= np.isin(np.asarray(self.corpus.body), [c for c in codes if c >= 0])
+        if group is not None:
+            in_group = np.zeros(len(self.corpus), dtype=bool)
+            for w in group:
+                in_group[self.record_of(self.positions(w.lower()))] = True
+            mask &= in_group
+        return mask
+
+    def hits(self, phrase, years=None, bodies=None, group=None):
+        """Positions of the hits of 'phrase' in records passing the filters, in corpus order."""
+        pos = self.phrase_positions(phrase)
+        if years is None and bodies is None and group is None:
+            return pos
+        return pos[self.record_mask(years, bodies, group)[self.record_of(pos)]]
+
+    def contexts(self, phrase, hits, window=WINDOW, chunk=CHUNK):
+        """
+        Yield one row per hit: record, year, body and the 'window' tokens left
+        and right of the match (clipped at the record's edges). Hits are
+        formatted 'chunk' at a time, so memory does not grow with their number.
+        """
+        length = len(tokenize(phrase))
+        for a in range(0, len(hits), chunk):
+            pos = np.asarray(hits[a:a + chunk])
+            recs = self.record_of(pos)
+            for p, r in zip(pos.tolist(), recs.tolist()):
+                lo, hi = max(int(self.starts[r]), p - window), min(int(self.starts[r + 1]), p + length + window)
+                words = [self.vocab[k] for k in self.tokens[lo:hi].tolist()]
+                cut = p - lo
+                yield {'Record': r, 'Year': int(self.corpus.year[r]) or None,
+                       'Body': self.corpus.bodies[self.corpus.body[r]],
+                       'Left': ' '.join(words[:cut]), 'Match': ' '.join(words[cut:cut + length]),
+                       'Right': ' '.join(words[cut + length:])}
+
+    def page(self, phrase, page=0, page_size=PAGE_SIZE, window=WINDOW, **filters):
+        """(total hits, DataFrame of the contexts on page 'page', counted from 0)."""
+        hits = self.hits(phrase, **filters)
+        rows = self.contexts(phrase, hits[page * page_size:(page + 1) * page_size], window)
+        return len(hits), pd.DataFrame(list(rows), columns=['Record', 'Year', 'Body', 'Left', 'Match', 'Right'])
+
+    def stream(self, phrase, window=WINDOW, **filters):
+        """Every context of 'phrase' passing the filters, as a generator."""
+        return self.contexts(phrase, self.hits(phrase, **filters), window)
+
+
+def is_index_current(index_dir=INDEX_DIR, source=INPUT_FILE):
+    """True if the index at 'index_dir' was built from 'source' with the current tokenizer."""
+    try:
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    return (meta.get('source_fingerprint') == dataset_fingerprint(source)
+            and meta.get('tokenizer') == Text_pipeline.TOKENIZER)
+
+
+def get_index(input_file=INPUT_FILE, mmap_dir=MMAP_DIR, index_dir=INDEX_DIR):
+    """Concordance index for 'input_file', rebuilding the mapped corpus and/or index when the source changed."""
+    fingerprint = dataset_fingerprint(input_file)
+    if not is_current(mmap_dir, input_file):
+        build_mmap_corpus(load_corpus(input_file), mmap_dir, fingerprint)
+    corpus = MappedCorpus(mmap_dir)
+    if not is_index_current(index_dir, input_file):
+        build_index(corpus, index_dir, fingerprint)
+    return ConcordanceIndex(corpus, index_dir)
+
+
+def kwic_line(row, width=60):
+    """One aligned concordance line: right-aligned left context, [match], right context."""
+    left = row['Left'][-width:]
+    return f"{row['Year'] or '':>4} {row['Body'][:12]:<12} {left:>{width}} [{row['Match']}] {row['Right'][:width]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword-in-context concordance of a term or phrase.")
+    parser.add_argument('phrase', help='Term or phrase, e.g. "internet access"')
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--years', type=parse_years, help="Year range, e.g. 2010-2024")
+    parser.add_argument('--bodies', nargs='+', help="Recommending bodies, e.g. '- CRC' '- UPR'")
+    parser.add_argument('--group', nargs='+', help="Only records containing one of these words, e.g. child children")
+    parser.add_argument('--window', type=int, default=WINDOW, help="Tokens on each side")
+    parser.add_argument('--page', type=int, default=1, help="Page to print (from 1)")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--all', action='store_true', help="Stream every context as TSV to stdout")
+    args = parser.parse_args()
+
+    try:
+        index = get_index(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    filters = {'years': args.years, 'bodies': args.bodies, 'group': args.group}
+    if args.all:
+        print('\t'.join(['Record', 'Year', 'Body', 'Left', 'Match', 'Right']))
+        for row in index.stream(args.phrase, args.window, **filters):
+            sys.stdout.write('\t'.join(str(v) for v in row.values()) + '\n')
+        return
+
+    total, df = index.page(args.phrase, args.page - 1, args.page_size, args.window, **filters)
+    n_pages = max(1, -(-total // args.page_size))
+    print(f"'{args.phrase}': {total} hits, page {args.page} of {n_pages}")
+    for _, row in df.iterrows():
+        print(kwic_line(row))
+
+
+if __name__ == "__main__":
+    main()
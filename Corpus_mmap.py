@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Corpus_query import INPUT_FILE, CACHE_DIR, load_corpus, dataset_fingerprint, standardize_body, record_themes
+
+# --- Configuration ---
+OUTPUT_DIR = 'Data/UHRI_Internet.mmap'   # Directory holding the memory-mapped corpus
+FORMAT_VERSION = 1
+
+# Layout of OUTPUT_DIR:
+#   meta.json         record count, body and theme vocabularies, source fingerprint
+#   year.npy          int16[n]        publication year (0 = unknown)
+#   body.npy          uint16[n]       index into meta['bodies'] (standardized body)
+#   themes.npy        uint64[n, w]    theme bitmask, bit k = meta['themes'][k]
+#   text_offsets.npy  int64[n + 1]    byte offsets of each 'Text' in text.bin
+#   text.bin          UTF-8 blob of all texts
+
+
+def build_mmap_corpus(records, out_dir=OUTPUT_DIR, fingerprint=None):
+    """
+    Write 'records' in the memory-mapped layout described above. Each build
+    goes to a new '<out_dir>.v-*' directory and 'out_dir' is a symlink that is
+    atomically replaced to point at it once complete, so readers always find
+    a whole corpus and an interrupted build leaves the previous one in place.
+    Processes that mapped the previous corpus keep reading its (unlinked)
+    files until they attach again. Where symlinks are unavailable, 'out_dir'
+    is a directory swapped with two renames instead: between them it briefly
+    does not exist.
+    """
+    out_dir = os.path.normpath(out_dir)
+    parent = os.path.dirname(out_dir) or '.'
+    os.makedirs(parent, exist_ok=True)
+    new_dir = tempfile.mkdtemp(prefix=os.path.basename(out_dir) + '.v-', dir=parent)
+    try:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(new_dir, 0o777 & ~umask)   # mkdtemp creates the directory private
+        _write_mmap_corpus(records, new_dir, fingerprint)
+        old_dir = _swap_link(new_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(new_dir, ignore_errors=True)
+        raise
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    _ATTACHED.pop(os.path.abspath(out_dir), None)
+
+
+def _swap_link(new_dir, out_dir):
+    """Point the symlink 'out_dir' at 'new_dir' in one rename; returns the directory to delete."""
+    link = new_dir + '.link'
+    try:
+        os.symlink(os.path.basename(new_dir), link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        return _swap_dir(new_dir, out_dir)
+    try:
+        if os.path.islink(out_dir):
+            old_dir = os.path.realpath(out_dir)
+        else:
+            # A corpus directory from before the symlink layout is moved aside once
+            old_dir = _move_aside(out_dir)
+        os.replace(link, out_dir)
+    except BaseException:
+        os.remove(link)
+        raise
+    return old_dir
+
+
+def _swap_dir(new_dir, out_dir):
+    """Replace the directory 'out_dir' by 'new_dir' with two renames; returns the directory to delete."""
+    old_dir = _move_aside(out_dir)
+    os.replace(new_dir, out_dir)
+    return old_dir
+
+
+def _move_aside(out_dir):
+    """Move an existing 'out_dir' into a new '<out_dir>.old-*' directory and return that, or None."""
+    if not os.path.exists(out_dir):
+        return None
+    old_dir = tempfile.mkdtemp(prefix=os.path.basename(out_dir) + '.old-', dir=os.path.dirname(out_dir) or '.')
+    os.replace(out_dir, os.path.join(old_dir, 'corpus'))
+    return old_dir
+
+
+def _write_mmap_corpus(records, out_dir, fingerprint):
+    n = len(records)
+
+    bodies, body_index = [], {}
+    themes, theme_index = [], {}
+    year = np.zeros(n, dtype=np.int16)
+    body = np.zeros(n, dtype=np.uint16)
+    rec_themes = []
+    for i, r in enumerate(records):
+        y = r.get('Year')
+        year[i] = y if isinstance(y, int) else 0
+        b = standardize_body(r.get('Reccomending Body', ''))
+        if b not in body_index:
+            body_index[b] = len(bodies)
+            bodies.append(b)
+        body[i] = body_index[b]
+        ts = record_themes(r)
+        for t in ts:
+            if t not in theme_index:
+                theme_index[t] = len(themes)
+                themes.append(t)
+        rec_themes.append([theme_index[t] for t in ts])
+
+    words = max(1, (len(themes) + 63) // 64)
+    mask = np.zeros((n, words), dtype=np.uint64)
+    for i, ts in enumerate(rec_themes):
+        for k in ts:
+            mask[i, k // 64] |= np.uint64(1) << np.uint64(k % 64)
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    with open(os.path.join(out_dir, 'text.bin'), 'wb') as f:
+        for i, r in enumerate(records):
+            txt = r.get('Text')
+            data = txt.encode('utf-8') if isinstance(txt, str) else b''
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+
+    np.save(os.path.join(out_dir, 'year.npy'), year)
+    np.save(os.path.join(out_dir, 'body.npy'), body)
+    np.save(os.path.join(out_dir, 'themes.npy'), mask)
+    np.save(os.path.join(out_dir, 'text_offsets.npy'), offsets)
+    # meta.json is written last: its presence marks a complete corpus
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': FORMAT_VERSION, 'n_records': n, 'bodies': bodies,
+                   'themes': themes, 'source_fingerprint': fingerprint}, f, indent=4)
+
+
+class MappedCorpus:
+    """
+    Read-only view of a memory-mapped corpus. Arrays are mapped, not loaded,
+    so every process attached to the same directory shares one physical copy
+    through the OS page cache.
+    """
+
+    def __init__(self, path=OUTPUT_DIR):
+        # Resolve the symlink once so every file comes from the same build; if
+        # a rebuild deleted that build meanwhile, retry with the new one
+        while True:
+            real = os.path.realpath(path)
+            try:
+                self._load(real)
+                break
+            except FileNotFoundError:
+                if os.path.realpath(path) == real:
+                    raise
+        self.path = path
+
+    def _load(self, path):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format version {self.meta['version']}")
+        self.bodies = self.meta['bodies']
+        self.themes = self.meta['themes']
+        self.year = np.load(os.path.join(path, 'year.npy'), mmap_mode='r')
+        self.body = np.load(os.path.join(path, 'body.npy'), mmap_mode='r')
+        self.theme_bits = np.load(os.path.join(path, 'themes.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'text_offsets.npy'), mmap_mode='r')
+        blob_file = os.path.join(path, 'text.bin')
+        # np.memmap cannot map an empty file
+        self.blob = (np.memmap(blob_file, dtype=np.uint8, mode='r')
+                     if os.path.getsize(blob_file) else np.zeros(0, dtype=np.uint8))
+
+    def __len__(self):
+        return self.meta['n_records']
+
+    def text(self, i):
+        """Decoded 'Text' of record i."""
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def texts(self, start=0, stop=None):
+        """Iterate over the texts of records start..stop-1."""
+        stop = len(self) if stop is None else stop
+        for i in range(start, stop):
+            yield self.text(i)
+
+    def body_code(self, name):
+        """Code of a (standardized) body name, or -1 if the body does not occur."""
+        name = standardize_body(name)
+        return self.bodies.index(name) if name in self.bodies else -1
+
+    def theme_mask(self, names):
+        """Boolean array: True for records tagged with any of the theme 'names'."""
+        want = np.zeros(self.theme_bits.shape[1], dtype=np.uint64)
+        for t in names:
+            if t in self.themes:
+                k = self.themes.index(t)
+                want[k // 64] |= np.uint64(1) << np.uint64(k % 64)
+        return (np.asarray(self.theme_bits) & want).any(axis=1)
+
+    def record(self, i):
+        """Rebuild a (reduced) record dict for record i."""
+        themes = [t for k, t in enumerate(self.themes)
+                  if int(self.theme_bits[i, k // 64]) >> (k % 64) & 1]
+        y = int(self.year[i])
+        return {'Text': self.text(i), 'Themes': '\n'.join(themes),
+                'Reccomending Body': self.bodies[self.body[i]], 'Year': y or None}
+
+
+# ----------------------------------------------------------------------
+# Worker attachment
+# ----------------------------------------------------------------------
+_ATTACHED = {}   # absolute path -> (meta.json identity, MappedCorpus)
+
+
+def attach(path=OUTPUT_DIR):
+    """
+    Return this process's MappedCorpus for 'path', mapping it on first use and
+    again after the corpus was rebuilt (a rebuild gives a new meta.json file).
+    """
+    key = os.path.abspath(path)
+    st = os.stat(os.path.join(path, 'meta.json'))
+    identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+    entry = _ATTACHED.get(key)
+    if entry is None or entry[0] != identity:
+        entry = _ATTACHED[key] = (identity, MappedCorpus(path))
+    return entry[1]
+
+
+def _run_shard(path, fn, start, stop):
+    return fn(attach(path), start, stop)
+
+
+def map_shards(fn, path=OUTPUT_DIR, n_workers=None, n_shards=None):
+    """
+    Run fn(corpus, start, stop) over contiguous record shards in a process pool.
+    Workers attach to the mapped files themselves, so nothing but the shard
+    bounds and the (small) results cross process boundaries. 'fn' must be a
+    module-level function. Returns the per-shard results in order.
+    """
+    n = len(attach(path))
+    n_workers = n_workers or os.cpu_count() or 1
+    n_shards = n_shards or n_workers * 4
+    bounds = np.linspace(0, n, n_shards + 1).astype(int)
+    shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    with ProcessPoolExecutor(n_workers) as pool:
+        futures = [pool.submit(_run_shard, path, fn, a, b) for a, b in shards]
+        return [f.result() for f in futures]
+
+
+def is_current(path=OUTPUT_DIR, source=INPUT_FILE, cache_dir=CACHE_DIR):
+    """True if the mapped corpus at 'path' was built from the current 'source' file."""
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    return meta.get('source_fingerprint') == dataset_fingerprint(source, cache_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped corpus from the prepared JSON.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    try:
+        records = load_corpus(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    build_mmap_corpus(records, args.output, dataset_fingerprint(args.input))
+    corpus = MappedCorpus(args.output)
+    print(f"Mapped corpus saved to '{args.output}': {len(corpus)} records, "
+          f"{len(corpus.bodies)} bodies, {len(corpus.themes)} themes, {corpus.blob.size} text bytes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+
+import Text_pipeline
+from Text_pipeline import english_stopwords
+
+# --- Configuration ---
+INPUT_FILE = 'Data/UHRI_Internet.json'    # Output of Dataset_prep.py
+CACHE_DIR = 'Data/.query_cache'           # On-disk cache of query results
+QUERY_VERSION = 2                         # Bump when result semantics change
+SP_PREFIXES = ['- IE', '- WG', '- SR']
+GROUP_FIELDS = ['year', 'body', 'theme', 'country']
+# Raw UHRI columns holding the affected State(s) and region(s); the first present is used
+COUNTRY_FIELDS = ['Countries', 'Country', 'State under Review', 'Affected Country']
+REGION_FIELDS = ['Regions', 'Region']
+UNKNOWN_COUNTRY = '(no country)'
+METRICS = ['counts', 'shares', 'ngrams']
+
+
+def load_corpus(path=INPUT_FILE):
+    """Load the prepared JSON corpus (list of record dicts)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dataset_fingerprint(path=INPUT_FILE, cache_dir=CACHE_DIR):
+    """
+    Return a SHA-256 of the dataset file. The digest is remembered per
+    (size, mtime) in 'cache_dir' so unchanged files are not re-hashed.
+    """
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    index_file = os.path.join(cache_dir, 'fingerprints.json')
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry and entry['stamp'] == stamp:
+        return entry['sha256']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    index[key] = {'stamp': stamp, 'sha256': h.hexdigest()}
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under a per-process name and renamed into place, so concurrent
+    # processes or a crash never leave a truncated index (a lost entry is re-hashed)
+    tmp = f'{index_file}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp, index_file)
+    return index[key]['sha256']
+
+
+def standardize_body(body):
+    """Collapse IE/WG/SR mandates into '- Special Procedures' and strip whitespace."""
+    if not isinstance(body, str):
+        return 'Unknown'
+    body = body.strip()
+    if '- Special Procedures' in body or body.startswith(tuple(SP_PREFIXES)):
+        return '- Special Procedures'
+    return body
+
+
+def record_themes(record):
+    """Return the list of theme labels of a record ('Themes' is newline-separated)."""
+    themes = record.get('Themes')
+    if not isinstance(themes, str):
+        return []
+    return [t.strip() for t in themes.split('\n') if t.strip()]
+
+
+def split_labels(value):
+    """Split a UHRI multi-value cell ("- A\n- B", "A; B") into clean, de-duplicated labels."""
+    if isinstance(value, list):
+        parts = value
+    elif isinstance(value, str):
+        parts = value.replace(';', '\n').split('\n')
+    else:
+        return []
+    labels = [p.strip().lstrip('-').strip() for p in parts if isinstance(p, str)]
+    return list(dict.fromkeys(l for l in labels if l))
+
+
+def _first_field(record, fields):
+    for f in fields:
+        if record.get(f) not in (None, ''):
+            return record.get(f)
+    return None
+
+
+def record_countries(record):
+    """Affected countries of a record: 'Country List' (see Dataset_prep.py) or the parsed raw column."""
+    countries = record.get('Country List')
+    if countries is None:
+        countries = split_labels(_first_field(record, COUNTRY_FIELDS))
+    return countries
+
+
+def record_regions(record):
+    """Regions of a record: 'Region List' (see Dataset_prep.py) or the parsed raw column."""
+    regions = record.get('Region List')
+    if regions is None:
+        regions = split_labels(_first_field(record, REGION_FIELDS))
+    return regions
+
+
+def parse_keyword_expression(expr):
+    """
+    Parse a keyword expression into a list of (include, exclude) term lists.
+    '|' separates alternatives, '&' joins required terms and a leading '!'
+    negates a term, e.g. "internet access|digital divide|online&!game".
+    """
+    if not expr:
+        return []
+    clauses = []
+    for alt in expr.lower().split('|'):
+        include, exclude = [], []
+        for term in alt.split('&'):
+            term = term.strip()
+            if term.startswith('!'):
+                if term[1:].strip():
+                    exclude.append(term[1:].strip())
+            elif term:
+                include.append(term)
+        if include or exclude:
+            clauses.append((include, exclude))
+    return clauses
+
+
+def matches_keywords(text, clauses):
+    """Return True if 'text' satisfies any clause of a parsed keyword expression."""
+    if not clauses:
+        return True
+    if not isinstance(text, str):
+        return False
+    txt = text.lower()
+    return any(all(k in txt for k in inc) and not any(k in txt for k in exc)
+               for inc, exc in clauses)
+
+
+def tokenize(text):
+    """Lowercase, tokenize and keep alphabetic non-stopword tokens (as in Bodies_groups.py)."""
+    stop_words = english_stopwords()
+    return [w for w in Text_pipeline.tokenize(text) if w.isalpha() and w not in stop_words]
+
+
+def make_query(years=None, bodies=None, themes=None, keywords=None,
+               group_by=None, metric='counts', n=2, top=10, unique=False):
+    """Build a normalized query spec; equal queries produce equal specs (and cache keys)."""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    group_by = list(group_by or [])
+    for g in group_by:
+        if g not in GROUP_FIELDS:
+            raise ValueError(f"Unknown group-by field '{g}', expected one of {GROUP_FIELDS}")
+    spec = {
+        'years': list(years) if years else None,
+        'bodies': sorted(standardize_body(b) for b in bodies) if bodies else None,
+        'themes': sorted(themes) if themes else None,
+        'keywords': keywords or None,
+        'group_by': group_by,
+        'metric': metric,
+        'unique': bool(unique),
+    }
+    if metric == 'ngrams':
+        spec['n'] = int(n)
+        spec['top'] = int(top)
+    return spec
+
+
+def _group_keys(record, body, themes, group_by, theme_filter):
+    """Yield one group key tuple per group the record falls into ('theme' explodes)."""
+    keys = [()]
+    for g in group_by:
+        if g == 'year':
+            vals = [record.get('Year')]
+        elif g == 'body':
+            vals = [body]
+        elif g == 'country':
+            vals = record_countries(record) or [UNKNOWN_COUNTRY]
+        else:
+            vals = [t for t in themes if not theme_filter or t in theme_filter]
+        keys = [k + (v,) for k in keys for v in vals]
+    return keys
+
+
+def execute_query(spec, records):
+    """
+    Evaluate a query spec over 'records' without any caching.
+    Years and bodies define the universe; themes and keywords select the target
+    records. 'counts' reports target counts, 'shares' also the universe totals
+    and the target share (%), 'ngrams' the top-n n-grams of target records.
+    With 'unique', each near-duplicate cluster (see Dataset_prep.py) counts
+    once per group instead of once per record.
+    """
+    y0, y1 = spec['years'] or (None, None)
+    bodies = set(spec['bodies']) if spec['bodies'] else None
+    themes = set(spec['themes']) if spec['themes'] else None
+    clauses = parse_keyword_expression(spec['keywords'])
+    group_by = spec['group_by']
+    metric = spec['metric']
+
+    unique = spec.get('unique', False)
+    target, total = Counter(), Counter()
+    seen_target, seen_total = set(), set()
+    ngrams = {}
+    for i, r in enumerate(records):
+        y = r.get('Year')
+        if y0 is not None and not (isinstance(y, int) and y0 <= y <= y1):
+            continue
+        body = standardize_body(r.get('Reccomending Body', ''))
+        if bodies and body not in bodies:
+            continue
+        rec_themes = record_themes(r)
+        cluster = r.get('Cluster ID', i)
+        is_target = ((not themes or any(t in themes for t in rec_themes))
+                     and matches_keywords(r.get('Text', ''), clauses))
+
+        if metric == 'shares':
+            # For theme groups the universe is every theme mention in the slice
+            for key in _group_keys(r, body, rec_themes, group_by, None):
+                if unique:
+                    if (key, cluster) in seen_total:
+                        continue
+                    seen_total.add((key, cluster))
+                total[key] += 1
+        if not is_target:
+            continue
+        keys = _group_keys(r, body, rec_themes, group_by, themes)
+        if unique:
+            keys = [k for k in keys if (k, cluster) not in seen_target]
+            seen_target.update((k, cluster) for k in keys)
+        if metric == 'ngrams':
+            toks = tokenize(r.get('Text') or '')
+            grams = list(zip(*[toks[i:] for i in range(spec['n'])]))
+            for key in keys:
+                ngrams.setdefault(key, Counter()).update(grams)
+        else:
+            for key in keys:
+                target[key] += 1
+
+    rows = []
+    if metric == 'ngrams':
+        for key in sorted(ngrams, key=str):
+            for gram, cnt in ngrams[key].most_common(spec['top']):
+                row = dict(zip(group_by, key))
+                row.update({'ngram': ' '.join(gram), 'count': cnt})
+                rows.append(row)
+        return rows
+
+    for key in sorted(set(target) | set(total), key=str):
+        row = dict(zip(group_by, key))
+        row['count'] = target.get(key, 0)
+        if metric == 'shares':
+            row['total'] = total.get(key, 0)
+            row['share'] = round(row['count'] / row['total'] * 100, 1) if row['total'] else 0
+        rows.append(row)
+    return rows
+
+
+def run_query(spec, path=INPUT_FILE, records=None, cache_dir=CACHE_DIR, use_cache=True):
+    """
+    Evaluate 'spec' against the dataset at 'path', memoizing the result on disk
+    under a key derived from the query, the dataset fingerprint and QUERY_VERSION.
+    Pass 'records' to reuse an already loaded corpus on a cache miss.
+    """
+    fingerprint = dataset_fingerprint(path, cache_dir)
+    key_src = json.dumps({'query': spec, 'dataset': fingerprint, 'version': QUERY_VERSION,
+                          'tokenizer': Text_pipeline.TOKENIZER},
+                         sort_keys=True)
+    cache_file = os.path.join(cache_dir, hashlib.sha256(key_src.encode('utf-8')).hexdigest() + '.json')
+
+    if use_cache and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['rows']
+
+    if records is None:
+        records = load_corpus(path)
+    rows = execute_query(spec, records)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'query': spec, 'dataset': fingerprint, 'rows': rows}, f)
+        os.replace(tmp_file, cache_file)
+    return rows
+
+
+def query(path=INPUT_FILE, records=None, use_cache=True, **kwargs):
+    """Convenience wrapper: query(years=(2010, 2024), bodies=['- UPR'], group_by=['year'], metric='shares')."""
+    return run_query(make_query(**kwargs), path=path, records=records, use_cache=use_cache)
+
+
+def parse_years(value):
+    """Parse '2010-2024' or '2015' into a (start, end) tuple."""
+    start, _, end = value.partition('-')
+    return int(start), int(end or start)
+
+
+def print_rows(rows):
+    """Print result rows as a tab-separated table."""
+    if not rows:
+        print("No results.")
+        return
+    cols = list(rows[0].keys())
+    print('\t'.join(cols))
+    for row in rows:
+        print('\t'.join(str(row[c]) for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the prepared UHRI corpus.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--years', type=parse_years, help="Year or year range, e.g. 2010-2024")
+    parser.add_argument('--bodies', nargs='+', help="Recommending bodies, e.g. '- UPR' '- CRC'")
+    parser.add_argument('--themes', nargs='+', help="Theme labels (any of)")
+    parser.add_argument('--keywords', help="Keyword expression, e.g. 'internet access|digital divide'")
+    parser.add_argument('--group-by', nargs='*', default=[], choices=GROUP_FIELDS)
+    parser.add_argument('--metric', default='counts', choices=METRICS)
+    parser.add_argument('--n', type=int, default=2, help="n-gram order (metric 'ngrams')")
+    parser.add_argument('--top', type=int, default=10, help="n-grams per group (metric 'ngrams')")
+    parser.add_argument('--unique', action='store_true', help="Count near-duplicate clusters once")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the on-disk result cache")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    spec = make_query(years=args.years, bodies=args.bodies, themes=args.themes,
+                      keywords=args.keywords, group_by=args.group_by,
+                      metric=args.metric, n=args.n, top=args.top, unique=args.unique)
+    try:
+        rows = run_query(spec, path=args.input, use_cache=not args.no_cache)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    if args.json:
+        print(json.dumps(rows, indent=4))
+    else:
+        print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from Corpus_query import INPUT_FILE, CACHE_DIR, load_corpus, dataset_fingerprint, standardize_body, record_themes
+
+# --- Configuration ---
+DB_FILE = 'Data/UHRI_Internet.sqlite'   # Embedded database built from the prepared corpus
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE years (year INTEGER PRIMARY KEY);
+CREATE TABLE bodies (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE,        -- 'Reccomending Body' as in the corpus
+    standard TEXT NOT NULL             -- Corpus_query.standardize_body(label)
+);
+CREATE TABLE themes (id INTEGER PRIMARY KEY, label TEXT NOT NULL UNIQUE);
+CREATE TABLE records (
+    id INTEGER PRIMARY KEY,            -- position in the JSON corpus
+    text TEXT,
+    body_id INTEGER REFERENCES bodies(id),
+    year INTEGER REFERENCES years(year),
+    publication_date TEXT,
+    text_hash TEXT,
+    cluster_id TEXT,
+    cluster_size INTEGER
+);
+CREATE TABLE record_themes (
+    theme_id INTEGER NOT NULL REFERENCES themes(id),
+    record_id INTEGER NOT NULL REFERENCES records(id),
+    PRIMARY KEY (theme_id, record_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE records_fts USING fts5(text, content='records', content_rowid='id');
+"""
+
+INDEXES = """
+CREATE INDEX records_year_body ON records(year, body_id);
+CREATE INDEX records_body_year ON records(body_id, year);
+CREATE INDEX record_themes_record ON record_themes(record_id, theme_id);
+CREATE INDEX bodies_standard ON bodies(standard);
+"""
+
+
+def build_database(records, path=DB_FILE, fingerprint=None):
+    """
+    Load the prepared records into a fresh SQLite file at 'path': normalized
+    records / bodies / themes / years tables, indexes on year, body and theme,
+    and an FTS5 full-text index on the text. The file is written next to
+    'path' and moved into place when complete.
+    """
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        bodies, themes, years = {}, {}, set()
+        rows, links = [], []
+        for i, r in enumerate(records):
+            label = r.get('Reccomending Body')
+            label = label if isinstance(label, str) else ''
+            b = bodies.setdefault(label, len(bodies) + 1)
+            y = r.get('Year') if isinstance(r.get('Year'), int) else None
+            if y is not None:
+                years.add(y)
+            text = r.get('Text')
+            rows.append((i, text if isinstance(text, str) else None, b, y, r.get('Document Publication Date'),
+                         r.get('Text Hash'), r.get('Cluster ID'), r.get('Cluster Size')))
+            for t in dict.fromkeys(record_themes(r)):
+                links.append((themes.setdefault(t, len(themes) + 1), i))
+        conn.executemany("INSERT INTO bodies VALUES (?, ?, ?)",
+                         [(b, label, standardize_body(label)) for label, b in bodies.items()])
+        conn.executemany("INSERT INTO themes VALUES (?, ?)", [(t, label) for label, t in themes.items()])
+        conn.executemany("INSERT INTO years VALUES (?)", [(y,) for y in sorted(years)])
+        conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO record_themes VALUES (?, ?)", links)
+        conn.executescript(INDEXES)
+        conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                         [('source_fingerprint', fingerprint or ''), ('records', str(len(rows)))])
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+def connect(path=DB_FILE):
+    """Read-only connection to an existing database file."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def get_database(input_file=INPUT_FILE, db_file=DB_FILE, cache_dir=CACHE_DIR):
+    """Connection to the database, rebuilding it when the source corpus changed."""
+    fingerprint = dataset_fingerprint(input_file, cache_dir)
+    if os.path.exists(db_file):
+        conn = connect(db_file)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'source_fingerprint'").fetchone()
+        if row and row[0] == fingerprint:
+            return conn
+        conn.close()
+    build_database(load_corpus(input_file), db_file, fingerprint)
+    return connect(db_file)
+
+
+def query_df(conn, sql, params=()):
+    """Run an ad-hoc SQL query and return the result as a DataFrame."""
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+# ----------------------------------------------------------------------
+# Aggregations
+# ----------------------------------------------------------------------
+def _in(column, values):
+    return f"{column} IN ({', '.join('?' * len(values))})", list(values)
+
+
+def body_year_counts(conn, bodies=None, start_yr=None, end_yr=None, standard=True):
+    """
+    Records per (body, year) as a body x year DataFrame. Bodies are the
+    standardized labels unless standard=False; 'bodies' restricts the rows.
+    """
+    col = 'b.standard' if standard else 'b.label'
+    where, params = ['r.year IS NOT NULL'], []
+    if start_yr is not None:
+        where.append('r.year >= ?')
+        params.append(start_yr)
+    if end_yr is not None:
+        where.append('r.year <= ?')
+        params.append(end_yr)
+    if bodies is not None:
+        clause, values = _in(col, bodies)
+        where.append(clause)
+        params += values
+    df = query_df(conn, f"""
+        SELECT {col} AS body, r.year AS year, COUNT(*) AS n
+        FROM records r JOIN bodies b ON b.id = r.body_id
+        WHERE {' AND '.join(where)}
+        GROUP BY body, year""", params)
+    return df.pivot(index='body', columns='year', values='n').fillna(0).astype(int)
+
+
+def theme_counts(conn, start_yr=None, end_yr=None, themes=None, exclude_bodies=()):
+    """{theme: records} for records in the year range, optionally only for 'themes' and without 'exclude_bodies' (raw labels)."""
+    where, params = ['1'], []
+    if start_yr is not None:
+        where.append('r.year >= ?')
+        params.append(start_yr)
+    if end_yr is not None:
+        where.append('r.year <= ?')
+        params.append(end_yr)
+    if exclude_bodies:
+        clause, values = _in('label', exclude_bodies)
+        where.append(f'r.body_id NOT IN (SELECT id FROM bodies WHERE {clause})')
+        params += values
+    theme_filter = ''
+    if themes is not None:
+        theme_filter, values = _in('t.label', themes)
+        theme_filter = 'WHERE ' + theme_filter
+        params += values
+    # Records drive the join (year/body index), themes are labelled after grouping
+    rows = conn.execute(f"""
+        SELECT t.label, c.n
+        FROM (SELECT rt.theme_id AS theme_id, COUNT(*) AS n
+              FROM records r JOIN record_themes rt ON rt.record_id = r.id
+              WHERE {' AND '.join(where)}
+              GROUP BY rt.theme_id) c
+        JOIN themes t ON t.id = c.theme_id
+        {theme_filter}""", params).fetchall()
+    return dict(rows)
+
+
+def search(conn, match, limit=20):
+    """Records whose text matches the FTS5 query 'match' (e.g. '"internet access" NEAR rural'), best first."""
+    return query_df(conn, """
+        SELECT r.id, r.year, b.label AS body, snippet(records_fts, 0, '[', ']', '...', 12) AS snippet
+        FROM records_fts JOIN records r ON r.id = records_fts.rowid JOIN bodies b ON b.id = r.body_id
+        WHERE records_fts MATCH ?
+        ORDER BY rank LIMIT ?""", (match, limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedded SQLite store of the prepared corpus.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--db', default=DB_FILE, help="Database file")
+    parser.add_argument('--sql', help="Run an ad-hoc SQL query")
+    parser.add_argument('--search', help="Full-text search (FTS5 query syntax)")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        conn = get_database(args.input, args.db)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.max_colwidth', 120):
+        try:
+            if args.sql:
+                print(query_df(conn, args.sql).to_string())
+            elif args.search:
+                print(search(conn, args.search, args.limit).to_string())
+            else:
+                for table in ('records', 'bodies', 'themes', 'years', 'record_themes'):
+                    print(f"{table}: {conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]} rows")
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            print(f"SQL error: {e}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import json
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+class Record(Mapping):
+    """Read-only view of one record; derived fields are computed on access."""
+
+    __slots__ = ('_base', '_derived')
+
+    def __init__(self, base, derived):
+        self._base = base
+        self._derived = derived
+
+    def __getitem__(self, key):
+        fn = self._derived.get(key)
+        if fn is not None:
+            return fn(self._base)
+        return self._base[key]
+
+    def get(self, key, default=None):
+        fn = self._derived.get(key)
+        if fn is not None:
+            return fn(self._base)
+        return self._base.get(key, default)
+
+    def __iter__(self):
+        yield from self._base
+        for key in self._derived:
+            if key not in self._base:
+                yield key
+
+    def __len__(self):
+        return len(self._base) + sum(1 for key in self._derived if key not in self._base)
+
+    def __repr__(self):
+        return f"Record({dict(self)!r})"
+
+
+class CorpusView:
+    """
+    Lazy, composable view over an immutable list of record dicts.
+
+    A view is the shared record tuple plus an index array and a set of derived
+    fields. where()/exclude() return new views whose index is only computed
+    (as a boolean mask over the parent) when first needed; derive() overrides
+    or adds a field without touching the records. Records are yielded as
+    read-only Record mappings, so no view can change the data another sees.
+    """
+
+    def __init__(self, records, index=None, derived=None):
+        self._records = records if isinstance(records, tuple) else tuple(records)
+        self._index = np.arange(len(self._records)) if index is None else np.asarray(index, dtype=np.int64)
+        self._derived = derived or {}
+        self._parent = None
+        self._pred = None
+
+    @classmethod
+    def from_json(cls, path):
+        """View over the prepared JSON corpus at 'path'."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _child(self, index=None, derived=None, pred=None):
+        view = CorpusView.__new__(CorpusView)
+        view._records = self._records
+        view._index = index
+        view._derived = self._derived if derived is None else derived
+        view._parent = self if index is None else None
+        view._pred = pred
+        return view
+
+    @property
+    def index(self):
+        """Positions of this view's records in the underlying corpus."""
+        if self._index is None:
+            self._index = self._parent.index[self._parent.mask(self._pred)]
+            self._parent = self._pred = None
+        return self._index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        records, derived = self._records, self._derived
+        for i in self.index:
+            yield Record(records[i], derived)
+
+    def __getitem__(self, i):
+        return Record(self._records[self.index[i]], self._derived)
+
+    def mask(self, pred):
+        """Boolean array: pred(record) for every record of the view."""
+        return np.fromiter((bool(pred(r)) for r in self), dtype=bool, count=len(self))
+
+    def where(self, pred):
+        """View of the records for which pred(record) is true (evaluated lazily)."""
+        return self._child(pred=pred)
+
+    def exclude(self, pred):
+        """View of the records for which pred(record) is false (evaluated lazily)."""
+        return self._child(pred=lambda r: not pred(r))
+
+    def select(self, selection):
+        """View of a boolean mask or an array of positions relative to this view."""
+        selection = np.asarray(selection)
+        return self._child(index=self.index[selection])
+
+    def derive(self, field, fn):
+        """View in which record[field] is fn(record), computed on access."""
+        parent = self._derived
+        derived = dict(parent)
+        derived[field] = lambda base: fn(Record(base, parent))
+        view = self._child(derived=derived)
+        view._index, view._parent, view._pred = self._index, self._parent, self._pred
+        return view
+
+    def column(self, field, default=None):
+        """List of record.get(field, default) over the view."""
+        return [r.get(field, default) for r in self]
+
+    def fields(self):
+        """Field names present in the view, in first-seen order."""
+        names = {}
+        for r in self:
+            names.update(dict.fromkeys(r))
+        return list(names)
+
+    def to_dataframe(self, fields=None):
+        """DataFrame with one row per record (index 0..n-1) built column by column."""
+        fields = self.fields() if fields is None else fields
+        return pd.DataFrame({f: self.column(f) for f in fields}, columns=fields)
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from Corpus_query import (INPUT_FILE, UNKNOWN_COUNTRY, load_corpus, dataset_fingerprint, parse_years,
+                          standardize_body, record_themes, record_countries, record_regions)
+
+# --- Configuration ---
+AGG_FILE = 'Data/UHRI_Internet.countries.npz'   # Sparse (country x year*body*theme) counts
+ALL_THEMES = '(all records)'                      # Extra theme slot counting every record once
+START_YR, END_YR = 2006, 2024
+UNKNOWN_REGION = '(no region)'
+
+# Columns of the matrix enumerate (year, body, theme) as
+#   col = (year - START_YR) * n_bodies * n_themes + body * n_themes + theme
+# with the last theme slot (ALL_THEMES) holding each record once.
+
+
+def build_country_aggregates(records, start_yr=START_YR, end_yr=END_YR):
+    """
+    Count records per (country, year, body, theme) in one pass. Records with
+    several affected countries count once for each; records without one are
+    filed under UNKNOWN_COUNTRY. Returns the CSR matrix and its metadata.
+    """
+    countries, bodies, themes = {}, {}, {}
+    regions = {}
+    rows, cols = [], []
+    entries = []
+    for r in records:
+        y = r.get('Year')
+        if not (isinstance(y, int) and start_yr <= y <= end_yr):
+            continue
+        b = bodies.setdefault(standardize_body(r.get('Reccomending Body', '')), len(bodies))
+        ts = [themes.setdefault(t, len(themes)) for t in record_themes(r)]
+        rec_countries = record_countries(r) or [UNKNOWN_COUNTRY]
+        rec_regions = record_regions(r)
+        # A country's region is taken from a record naming just that country, or
+        # from a multi-country record listing exactly one region per country
+        if len(rec_countries) == 1 and rec_regions:
+            regions[rec_countries[0]] = rec_regions[0]
+        elif len(rec_regions) == len(rec_countries):
+            for c, reg in zip(rec_countries, rec_regions):
+                regions.setdefault(c, reg)
+        cs = [countries.setdefault(c, len(countries)) for c in rec_countries]
+        entries.append((y - start_yr, b, ts, cs))
+
+    n_years, n_bodies, n_themes = end_yr - start_yr + 1, len(bodies), len(themes) + 1
+    for yi, b, ts, cs in entries:
+        base = (yi * n_bodies + b) * n_themes
+        rec_cols = [base + t for t in ts] + [base + n_themes - 1]
+        for c in cs:
+            rows.extend([c] * len(rec_cols))
+            cols.extend(rec_cols)
+
+    M = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                          shape=(len(countries), n_years * n_bodies * n_themes))
+    M.sum_duplicates()
+    meta = {'years': list(range(start_yr, end_yr + 1)), 'countries': list(countries),
+            'bodies': list(bodies), 'themes': list(themes) + [ALL_THEMES],
+            'regions': {c: regions.get(c, UNKNOWN_REGION) for c in countries}}
+    return M, meta
+
+
+def save_aggregates(M, meta, path=AGG_FILE):
+    sparse.save_npz(path, M)
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+
+
+def load_aggregates(path=AGG_FILE):
+    with open(path + '.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return sparse.load_npz(path).tocsr(), meta
+
+
+def get_aggregates(input_file=INPUT_FILE, agg_file=AGG_FILE):
+    """Load the country aggregates, rebuilding them when the source changed."""
+    fingerprint = dataset_fingerprint(input_file)
+    if os.path.exists(agg_file) and os.path.exists(agg_file + '.json'):
+        M, meta = load_aggregates(agg_file)
+        if meta.get('source_fingerprint') == fingerprint:
+            return M, meta
+    M, meta = build_country_aggregates(load_corpus(input_file))
+    meta['source_fingerprint'] = fingerprint
+    save_aggregates(M, meta, agg_file)
+    return M, meta
+
+
+# ----------------------------------------------------------------------
+# Slicing
+# ----------------------------------------------------------------------
+def column_index(meta, years=None, bodies=None, themes=None):
+    """Matrix columns of every (year, body, theme) combination in the given subsets (None = all)."""
+    nb, nt = len(meta['bodies']), len(meta['themes'])
+    y0 = meta['years'][0]
+    yi = np.arange(len(meta['years'])) if years is None else np.array(
+        [y - y0 for y in years if y in meta['years']], dtype=np.int64)
+    bi = np.arange(nb) if bodies is None else np.array(
+        [meta['bodies'].index(standardize_body(b)) for b in bodies
+         if standardize_body(b) in meta['bodies']], dtype=np.int64)
+    ti = np.arange(nt - 1) if themes is None else np.array(
+        [meta['themes'].index(t) for t in themes if t in meta['themes']], dtype=np.int64)
+    return ((yi[:, None, None] * nb + bi[None, :, None]) * nt + ti[None, None, :]).ravel()
+
+
+def group_rows(M, meta, by='country'):
+    """Rows summed per country (no-op) or per region; returns (matrix, row labels)."""
+    if by == 'country':
+        return M, meta['countries']
+    labels = sorted(set(meta['regions'].values()))
+    index = {l: i for i, l in enumerate(labels)}
+    R = sparse.csr_matrix((np.ones(len(meta['countries']), dtype=np.int32),
+                           ([index[meta['regions'][c]] for c in meta['countries']],
+                            np.arange(len(meta['countries'])))),
+                          shape=(len(labels), len(meta['countries'])))
+    return (R @ M).tocsr(), labels
+
+
+def theme_shares(M, meta, theme, bodies=None, years=None, by='country', min_total=1):
+    """
+    Per country (or region): records on 'theme' and their share of all records
+    for the selected bodies and years, e.g. UPR freedom-of-expression shares
+    for every State under review.
+    """
+    G, labels = group_rows(M, meta, by)
+    count = np.asarray(G[:, column_index(meta, years, bodies, [theme])].sum(axis=1)).ravel()
+    total = np.asarray(G[:, column_index(meta, years, bodies, [ALL_THEMES])].sum(axis=1)).ravel()
+    keep = total >= min_total
+    df = pd.DataFrame({by.capitalize(): np.array(labels, dtype=object)[keep],
+                       'Theme Count': count[keep], 'Total': total[keep]})
+    df['Share (%)'] = (df['Theme Count'] / df['Total'] * 100).round(1)
+    return df.sort_values(['Share (%)', 'Total'], ascending=False).reset_index(drop=True)
+
+
+def country_profile(M, meta, name, bodies=None, by='country'):
+    """Year x theme counts for one country (or region), with the yearly total in ALL_THEMES."""
+    G, labels = group_rows(M, meta, by)
+    if name not in labels:
+        raise KeyError(f"Unknown {by} '{name}'")
+    row = G[labels.index(name)].toarray().reshape(len(meta['years']), len(meta['bodies']), len(meta['themes']))
+    if bodies is not None:
+        row = row[:, [meta['bodies'].index(standardize_body(b)) for b in bodies
+                      if standardize_body(b) in meta['bodies']], :]
+    df = pd.DataFrame(row.sum(axis=1), index=meta['years'], columns=meta['themes'])
+    df.index.name = 'Year'
+    return df.loc[:, df.sum(axis=0) > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-country and per-region theme profiles.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--theme', default="- Freedom of opinion and expression & access to information")
+    parser.add_argument('--bodies', nargs='+', default=['- UPR'], help="Recommending bodies ('all' for every body)")
+    parser.add_argument('--years', type=parse_years, default=(2010, 2024), help="Year range, e.g. 2010-2024")
+    parser.add_argument('--by', default='country', choices=['country', 'region'])
+    parser.add_argument('--profile', help="Print the year x theme profile of one country/region instead")
+    parser.add_argument('--min-total', type=int, default=10, help="Minimum records per row")
+    parser.add_argument('--top', type=int, default=30, help="Rows to print")
+    args = parser.parse_args()
+
+    try:
+        M, meta = get_aggregates(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    bodies = None if args.bodies == ['all'] else args.bodies
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        if args.profile:
+            try:
+                print(country_profile(M, meta, args.profile, bodies, args.by))
+            except KeyError as e:
+                print(e.args[0])
+            return
+        years = range(args.years[0], args.years[1] + 1)
+        df = theme_shares(M, meta, args.theme, bodies, years, args.by, args.min_total)
+        print(f"{args.theme} — share of recommendations by {args.by} "
+              f"({args.years[0]}–{args.years[1]}, {', '.join(bodies or ['all bodies'])}):")
+        print(df.head(args.top).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,126 @@
 import pandas as pd
+import numpy as np
 import json
+import hashlib
+import os
+import re
+import zlib
 from dateutil.parser import parse
 
+from Corpus_query import record_countries, record_regions, dataset_fingerprint
+from Multilingual import LanguageDetector, batches, tag_languages, match_keywords
+
 # --- Configuration ---
-INPUT_FILE = 'Data/UHRI_2006_2024.xlsx'   # Path to input Excel file
+INPUT_FILE = 'Data/UHRI_2006_2024.xlsx'   # Path to input Excel file or UHRI JSON export (.json)
 OUTPUT_FILE = 'Data/UHRI_Internet.json'   # Path to output JSON file
 KEYWORDS = ['internet', 'online', 'digital']
+# Detect each record's language(s) (Multilingual.py) and also keep records containing a keyword
+# of their language; records are tagged with 'Language' and 'Languages' (primary first).
+# The English KEYWORDS always apply, so a misdetected English record is still kept.
+DETECT_LANGUAGE = False
+KEYWORDS_BY_LANGUAGE = {
+    'en': KEYWORDS,
+    'fr': ['internet', 'en ligne', 'numérique'],
+    'es': ['internet', 'en línea', 'digital'],
+}
+LANGUAGE_BATCH_SIZE = 10_000   # Records read, tagged and matched per batch
+SQL_FILE = None                            # e.g. 'Data/UHRI_Internet.sqlite' to also load the output into SQLite (Corpus_sql.py)
+
+# UHRI JSON export: ijson prefix of the record array ('item' for a top-level
+# array, e.g. 'data.item' if the array is wrapped in an object) and the export
+# keys read into each record field (first present wins; matching is
+# case-insensitive). Other keys are kept as they are.
+JSON_RECORDS_PREFIX = 'item'
+JSON_FIELDS = {
+    'Text': ['Text', 'Recommendation', 'RecommendationText', 'AnnotationText'],
+    'Themes': ['Themes', 'Theme'],
+    'Reccomending Body': ['Reccomending Body', 'Recommending Body', 'RecommendingBody', 'Body', 'Mechanism'],
+    'Document Publication Date': ['Document Publication Date', 'DocumentPublicationDate', 'PublicationDate',
+                                  'Publication Date', 'Date'],
+}
+
+# Deduplication: exact text hashes plus MinHash/LSH near-duplicate clusters
+DEDUP = True
+SHINGLE_SIZE = 3           # Words per shingle
+NUM_PERM = 128             # MinHash permutations
+LSH_BANDS = 16             # Bands of NUM_PERM // LSH_BANDS rows each
+JACCARD_THRESHOLD = 0.8    # Minimum estimated Jaccard similarity to merge two records
+MERSENNE_PRIME = (1 << 31) - 1
 
 def contains_keywords(text, keywords):
     """Return True if 'text' contains any of the 'keywords' (case-insensitive)."""
     return any(k in text.lower() for k in keywords) if isinstance(text, str) else False
 
+def label_list(value, sep):
+    """
+    Join a JSON list of labels (strings or objects with a name) into the Excel
+    export's format, e.g. '- Theme A\n- Theme B' for sep='\n'.
+    """
+    if not isinstance(value, list):
+        return value
+    labels = []
+    for v in value:
+        if isinstance(v, dict):
+            v = next((v[k] for k in ('Name', 'name', 'Title', 'title') if k in v), None)
+        if isinstance(v, str) and v.strip():
+            v = v.strip()
+            labels.append(v if v.startswith('- ') else '- ' + v)
+    return sep.join(labels)
+
+def map_json_record(raw):
+    """Map one UHRI JSON export object onto the record fields of the Excel export."""
+    lower = {k.lower(): k for k in raw}
+    item = {}
+    used = set()
+    for field, keys in JSON_FIELDS.items():
+        key = next((lower[k.lower()] for k in keys if k.lower() in lower), None)
+        if key is not None:
+            used.add(key)
+        item[field] = raw.get(key) if key is not None else None
+    item['Themes'] = label_list(item['Themes'], '\n')
+    item['Reccomending Body'] = label_list(item['Reccomending Body'], '; ')
+    date = item['Document Publication Date']
+    if isinstance(date, str) and 'T' in date:
+        item['Document Publication Date'] = date.split('T')[0]   # ISO timestamp -> date, as in the Excel export
+    for k, v in raw.items():
+        if k not in used:
+            item[k] = v
+    return item
+
+def read_json_records(path, prefix=JSON_RECORDS_PREFIX):
+    """Stream the records of a UHRI JSON export one at a time (memory stays flat)."""
+    import ijson
+    with open(path, 'rb') as f:
+        for raw in ijson.items(f, prefix, use_float=True):
+            yield map_json_record(raw)
+
+def read_excel_records(path):
+    """Records (one dict per row) of the UHRI Excel export."""
+    return pd.read_excel(path).to_dict(orient='records')
+
+def read_records(path=INPUT_FILE):
+    """Records of the Excel or (streamed) JSON export at 'path', chosen by file extension."""
+    if os.path.splitext(path)[1].lower() == '.json':
+        return read_json_records(path, JSON_RECORDS_PREFIX)
+    return read_excel_records(path)
+
+def filter_records(records, keywords=KEYWORDS):
+    """
+    Records containing one of the keywords. With DETECT_LANGUAGE the records are
+    read in batches, tagged with their language(s) and matched against 'keywords'
+    plus the KEYWORDS_BY_LANGUAGE words of those languages; otherwise against
+    'keywords' only.
+    """
+    if not DETECT_LANGUAGE:
+        yield from (i for i in records if contains_keywords(i.get('Text', ''), keywords))
+        return
+    detector = LanguageDetector()
+    for batch in batches(records, LANGUAGE_BATCH_SIZE):
+        langs = tag_languages(batch, detector)
+        keep = match_keywords([i.get('Text') for i in batch], [key + ('en',) for key in langs],
+                              {**KEYWORDS_BY_LANGUAGE, 'en': keywords})
+        yield from (i for i, k in zip(batch, keep) if k)
+
 def is_empty_record(item):
     """Return True if all values in 'item' are None, empty string, or empty list."""
     return all(v in [None, "", []] for v in item.values())
@@ -18,7 +128,8 @@ def is_empty_record(item):
 def process_record(item):
     """
     Append '; - Special Procedures' to 'Reccomending Body' if it starts with
-    '- IE', '- WG', or '- SR', and extract year from 'Document Publication Date'.
+    '- IE', '- WG', or '- SR', extract year from 'Document Publication Date' and
+    parse the affected countries/regions into 'Country List' and 'Region List'.
     """
     body = item.get('Reccomending Body', '')
     if isinstance(body, str) and any(body.startswith(prefix) for prefix in ['- IE', '- WG', '- SR']):
@@ -38,24 +149,115 @@ def process_record(item):
 
     # Convert publication date to string or None for JSON compatibility
     item['Document Publication Date'] = pub_date if pub_date else None
+
+    item['Country List'] = record_countries(item)
+    item['Region List'] = record_regions(item)
     return item
 
+def normalize_text(text):
+    """Lowercase 'text' and reduce it to space-separated word characters."""
+    return ' '.join(re.findall(r'\w+', text.lower())) if isinstance(text, str) else ''
+
+def text_hash(norm_text):
+    """Exact-duplicate key of a normalized text."""
+    return hashlib.sha1(norm_text.encode('utf-8')).hexdigest()
+
+def shingle_hashes(norm_text, k=SHINGLE_SIZE):
+    """Set of CRC32 hashes of the k-word shingles of a normalized text."""
+    words = norm_text.split()
+    shingles = {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)} or {norm_text}
+    return np.fromiter((zlib.crc32(sh.encode('utf-8')) for sh in shingles), dtype=np.uint64)
+
+def minhash_signatures(norm_texts, num_perm=NUM_PERM, seed=1):
+    """MinHash signature matrix (len(norm_texts) x num_perm) using (a*x + b) mod p hashing."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+    b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+    sigs = np.empty((len(norm_texts), num_perm), dtype=np.uint32)
+    for i, t in enumerate(norm_texts):
+        x = shingle_hashes(t) % MERSENNE_PRIME
+        sigs[i] = ((np.outer(a, x) + b[:, None]) % MERSENNE_PRIME).min(axis=1)
+    return sigs
+
+def lsh_clusters(sigs, bands=LSH_BANDS, threshold=JACCARD_THRESHOLD):
+    """
+    Group rows of a MinHash signature matrix into near-duplicate clusters.
+    Rows sharing a band bucket are compared with the bucket's first row only,
+    and accepted pairs are merged with union-find, so the cost stays linear in
+    the number of bucket members instead of quadratic in the corpus size.
+    Returns one root index per row.
+    """
+    n, num_perm = sigs.shape
+    rows = num_perm // bands
+    parent = np.arange(n)
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for band in range(bands):
+        block = sigs[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        # Polynomial hash of the band; collisions are caught by the verification step
+        keys = np.zeros(n, dtype=np.uint64)
+        for j in range(rows):
+            keys = keys * np.uint64(1000003) + block[:, j]
+        _, bucket = np.unique(keys, return_inverse=True)
+        order = np.argsort(bucket, kind='stable')
+        splits = np.flatnonzero(np.diff(bucket[order])) + 1
+        for members in np.split(order, splits):
+            if len(members) < 2:
+                continue
+            rep = members[0]
+            agree = (sigs[members[1:]] == sigs[rep]).mean(axis=1)
+            for m in members[1:][agree >= threshold]:
+                ra, rb = find(rep), find(m)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    return np.array([find(i) for i in range(n)])
+
+def assign_clusters(records):
+    """
+    Add 'Text Hash' (exact duplicates share it), 'Cluster ID' (near duplicates
+    share it; the text hash of the cluster's first record) and 'Cluster Size'
+    to every record. Returns the number of clusters.
+    """
+    norm = [normalize_text(r.get('Text', '')) for r in records]
+    hashes = [text_hash(t) for t in norm]
+
+    # MinHash only one representative per exact-duplicate group
+    unique_idx = {}
+    for i, h in enumerate(hashes):
+        unique_idx.setdefault(h, i)
+    reps = list(unique_idx.values())
+    roots = lsh_clusters(minhash_signatures([norm[i] for i in reps])) if reps else []
+
+    rep_cluster = {hashes[rep]: hashes[reps[root]] for rep, root in zip(reps, roots)}
+    cluster_ids = [rep_cluster[h] for h in hashes]
+    sizes = pd.Series(cluster_ids).value_counts().to_dict()
+    for r, h, c in zip(records, hashes, cluster_ids):
+        r['Text Hash'] = h
+        r['Cluster ID'] = c
+        r['Cluster Size'] = int(sizes[c])
+    return len(sizes)
+
 def main():
+    # Filter by keywords and process record by record; only matching records are kept in memory
     try:
-        df = pd.read_excel(INPUT_FILE)
+        filtered_data = filter_records(read_records(INPUT_FILE), KEYWORDS)
+        processed_data = [process_record(i) for i in filtered_data]
     except FileNotFoundError:
         print(f"Error: The file '{INPUT_FILE}' was not found.")
         return
     except Exception as e:
-        print(f"Error: Could not load the Excel file. {e}")
+        print(f"Error: Could not load the input file. {e}")
         return
 
-    # Convert to list of dicts and filter by keywords
-    data = df.to_dict(orient='records')
-    filtered_data = [i for i in data if contains_keywords(i.get('Text', ''), KEYWORDS)]
-
-    # Process, remove empty records, and count changes
-    processed_data = [process_record(i) for i in filtered_data]
+    # Remove empty records and count changes
     final_data = [i for i in processed_data if not is_empty_record(i)]
     removed_count = len(processed_data) - len(final_data)
 
@@ -64,7 +266,18 @@ def main():
 
     print(f"Total records after filtering: {total_records}")
     print(f"Records with assigned year: {records_with_year}")
+    print(f"Records with affected country: {sum(1 for i in final_data if i['Country List'])} "
+          f"({len({c for i in final_data for c in i['Country List']})} distinct countries)")
     print(f"Empty records removed: {removed_count}")
+    if DETECT_LANGUAGE:
+        languages = pd.Series(['+'.join(i['Languages']) for i in final_data], dtype=object).value_counts()
+        print("Records by language: " + ", ".join(f"{lang} {n}" for lang, n in languages.items()))
+
+    if DEDUP:
+        n_clusters = assign_clusters(final_data)
+        n_exact = len({i['Text Hash'] for i in final_data})
+        print(f"Unique texts (exact): {n_exact}")
+        print(f"Unique recommendation clusters (near-duplicate): {n_clusters}")
 
     # Convert any remaining non-serializable types to strings
     serializable_data = json.loads(json.dumps(final_data, default=str))
@@ -75,6 +288,12 @@ def main():
         print(f"Data saved to '{OUTPUT_FILE}'.")
     except Exception as e:
         print(f"Error: Could not save to '{OUTPUT_FILE}'. {e}")
+        return
+
+    if SQL_FILE:
+        import Corpus_sql
+        Corpus_sql.build_database(serializable_data, SQL_FILE, dataset_fingerprint(OUTPUT_FILE))
+        print(f"SQL store saved to '{SQL_FILE}'.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from Corpus_query import INPUT_FILE, load_corpus, standardize_body
+from Text_pipeline import Vocabulary, TokenFilter, english_stopwords, tokenize
+
+# --- Configuration ---
+NGRAM_RANGE = (1, 2)     # Unigrams and bigrams share one matrix
+MIN_DF = 2               # Drop features seen in fewer documents
+PRIOR_STRENGTH = 500.0   # alpha_0 of the informative Dirichlet prior (log-odds)
+
+
+def build_doc_term_matrix(texts, token_filter, tokenize=tokenize, ngram_range=NGRAM_RANGE, min_df=MIN_DF):
+    """
+    Sparse (documents x features) count matrix of the n-grams of every text.
+    Returns the CSR matrix and the list of feature names ('word' / 'word word').
+    """
+    vocab = token_filter.vocab
+    features = {}
+    indptr, indices, data = [0], [], []
+    for txt in texts:
+        ids = token_filter.ids(tokenize(txt)) if isinstance(txt, str) else []
+        row = {}
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            keys = ids if n == 1 else token_filter.ngrams(ids, n)
+            for key in keys:
+                col = features.setdefault((n, key), len(features))
+                row[col] = row.get(col, 0) + 1
+        indices.extend(row.keys())
+        data.extend(row.values())
+        indptr.append(len(indices))
+
+    X = sparse.csr_matrix((np.array(data, dtype=np.int32), np.array(indices, dtype=np.int64),
+                           np.array(indptr, dtype=np.int64)), shape=(len(indptr) - 1, len(features)))
+    names = [None] * len(features)
+    for (n, key), col in features.items():
+        names[col] = vocab.tokens[key] if n == 1 else ' '.join(vocab.decode_ngram(key, n))
+
+    if min_df > 1:
+        df = np.bincount(X.indices, minlength=X.shape[1])
+        keep = np.flatnonzero(df >= min_df)
+        X = X[:, keep]
+        names = [names[i] for i in keep]
+    return X.tocsr(), names
+
+
+def slice_indicator(labels):
+    """
+    Sparse (slices x documents) 0/1 matrix for one slice family.
+    'labels' holds one label per document (None = in no slice).
+    Returns the matrix and the slice names.
+    """
+    names = sorted({l for l in labels if l is not None}, key=str)
+    index = {l: i for i, l in enumerate(names)}
+    rows = [index[l] for l in labels if l is not None]
+    cols = [j for j, l in enumerate(labels) if l is not None]
+    S = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(names), len(labels)))
+    return S, names
+
+
+def stack_slices(families):
+    """
+    Stack several slice families {family: labels} into one indicator matrix.
+    Returns the matrix, the (family, slice) names and the (start, stop) rows of each family.
+    """
+    mats, names, spans = [], [], {}
+    for family, labels in families.items():
+        S, fam_names = slice_indicator(labels)
+        mats.append(S)
+        spans[family] = (len(names), len(names) + len(fam_names))
+        names.extend((family, n) for n in fam_names)
+    return sparse.vstack(mats).tocsr(), names, spans
+
+
+def score_families(C, spans, scorer):
+    """
+    Apply 'scorer' to each family's block of rows of C separately: every family
+    partitions the corpus on its own, so the rest of the corpus a slice is
+    compared with must not count documents again through another family.
+    """
+    C = sparse.csr_matrix(C)
+    return sparse.vstack([scorer(C[start:stop]) for start, stop in spans.values()]).tocsr()
+
+
+def tfidf_scores(C):
+    """
+    TF-IDF of every (slice, feature) with slices as documents:
+    tf = count / slice total, idf = log(n_slices / slices containing the feature).
+    """
+    C = sparse.csr_matrix(C, dtype=float)
+    totals = np.asarray(C.sum(axis=1)).ravel()
+    df = np.bincount(C.indices, minlength=C.shape[1])
+    idf = np.log(C.shape[0] / np.maximum(df, 1))
+    rows = np.repeat(np.arange(C.shape[0]), np.diff(C.indptr))
+    data = C.data / np.maximum(totals[rows], 1) * idf[C.indices]
+    return sparse.csr_matrix((data, C.indices, C.indptr), shape=C.shape)
+
+
+def log_odds_scores(C, prior_strength=PRIOR_STRENGTH):
+    """
+    Weighted log-odds ratio with an informative Dirichlet prior (Monroe, Colaresi
+    & Quinn 2008) of every slice against the rest of the corpus, as z-scores.
+    Only the nonzero (slice, feature) cells are scored, all at once.
+    """
+    C = sparse.csr_matrix(C, dtype=float)
+    feat_tot = np.asarray(C.sum(axis=0)).ravel()
+    grand = feat_tot.sum()
+    alpha = prior_strength * feat_tot / max(grand, 1)
+    slice_tot = np.asarray(C.sum(axis=1)).ravel()
+
+    rows = np.repeat(np.arange(C.shape[0]), np.diff(C.indptr))
+    cols = C.indices
+    y_s = C.data
+    y_r = feat_tot[cols] - y_s
+    n_s = slice_tot[rows]
+    n_r = grand - n_s
+    a = alpha[cols]
+    delta = (np.log((y_s + a) / (n_s + prior_strength - y_s - a))
+             - np.log((y_r + a) / (n_r + prior_strength - y_r - a)))
+    z = delta / np.sqrt(1.0 / (y_s + a) + 1.0 / (y_r + a))
+    return sparse.csr_matrix((z, C.indices, C.indptr), shape=C.shape)
+
+
+def top_terms(scores, C, slice_names, feature_names, k=10):
+    """Top-k features per slice by score, in one sort over all nonzero cells."""
+    scores = sparse.csr_matrix(scores)
+    rows = np.repeat(np.arange(scores.shape[0]), np.diff(scores.indptr))
+    order = np.lexsort((-scores.data, rows))
+    rows_sorted = rows[order]
+    starts = np.searchsorted(rows_sorted, np.arange(scores.shape[0]))
+    rank = np.arange(len(order)) - starts[rows_sorted]
+    sel = order[rank < k]
+    counts = np.asarray(sparse.csr_matrix(C)[rows[sel], scores.indices[sel]]).ravel()
+    return pd.DataFrame({
+        'Slice': [slice_names[r] for r in rows[sel]],
+        'Term': [feature_names[c] for c in scores.indices[sel]],
+        'Count': counts.astype(int),
+        'Score': scores.data[sel],
+    })
+
+
+def distinctive_terms(texts, families, method='log-odds', k=10, token_filter=None,
+                      tokenize=tokenize, ngram_range=NGRAM_RANGE):
+    """
+    Score the n-grams of 'texts' for every slice of every family in
+    {family: per-document labels} from one shared count matrix and return the
+    top-k per slice. Each family is scored against the corpus on its own.
+    """
+    if token_filter is None:
+        token_filter = TokenFilter(Vocabulary(), english_stopwords(), alpha_only=True)
+    X, features = build_doc_term_matrix(texts, token_filter, tokenize, ngram_range)
+    S, slices, spans = stack_slices(families)
+    C = (S @ X).tocsr()
+    scores = score_families(C, spans, tfidf_scores if method == 'tfidf' else log_odds_scores)
+    return top_terms(scores, C, slices, features, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distinctive terms per body and year.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--method', default='log-odds', choices=['log-odds', 'tfidf'])
+    parser.add_argument('--top', type=int, default=10, help="Terms per slice")
+    parser.add_argument('--bigrams-only', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        records = load_corpus(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    families = {
+        'body': [standardize_body(r.get('Reccomending Body', '')) for r in records],
+        'year': [r.get('Year') for r in records],
+    }
+    df = distinctive_terms([r.get('Text') for r in records], families, args.method, args.top,
+                           ngram_range=(2, 2) if args.bigrams_only else NGRAM_RANGE)
+    for slice_name, sub in df.groupby('Slice', sort=False):
+        print(f"{slice_name[0]} {slice_name[1]}: " +
+              ", ".join(f"{t} ({c})" for t, c in zip(sub['Term'], sub['Count'])))
+
+
+if __name__ == "__main__":
+    main()
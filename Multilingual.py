@@ -0,0 +1,218 @@
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from itertools import islice, repeat
+
+import numpy as np
+
+from Text_pipeline import STOPWORD_LISTS, stopwords
+
+# --- Configuration ---
+INPUT_FILE = 'Data/UHRI_Internet.json'
+LANGUAGES = ['en', 'fr', 'es']   # Detected languages (each needs a Text_pipeline.STOPWORD_LISTS entry)
+DEFAULT_LANGUAGE = 'en'          # Texts with too little evidence, and records prepared without detection
+MIN_EVIDENCE = 2.0               # Function-word score a text needs before a language is assigned
+MIXED_SHARE = 0.25               # Share of the score from which another language makes a record mixed
+BATCH_SIZE = 10_000              # Records detected and routed per batch
+LANGUAGE_FIELD = 'Language'      # Primary language of a record (added by Dataset_prep.py)
+LANGUAGES_FIELD = 'Languages'    # Every language of a record, primary first
+
+_WORD_RE = re.compile(r"\w+|\x00")
+_SEPARATOR = ' \x00 '            # Joins the texts of a batch; '\x00' marks the next text
+_PATTERNS = {}                   # tuple of keywords -> compiled alternation
+
+
+class LanguageDetector:
+    """
+    Function-word language identification over whole batches of texts. Every
+    stopword of the languages votes for each language whose list contains it
+    (1/k for a word shared by k lists, e.g. 'de' for French and Spanish); a
+    second language only counts when words exclusive to it carry its share.
+    A batch is scanned with one regex over the joined texts and scored with
+    numpy, so there is no per-record detector call.
+    """
+
+    def __init__(self, languages=LANGUAGES):
+        self.languages = list(languages)
+        words = {}
+        for j, lang in enumerate(self.languages):
+            for w in stopwords(lang):
+                words.setdefault(w, []).append(j)
+        self.lookup = {w: i for i, w in enumerate(words)}
+        self.lookup['\x00'] = -2
+        self.weights = np.zeros((len(words), len(self.languages)))
+        for i, langs in enumerate(words.values()):
+            self.weights[i, langs] = 1.0 / len(langs)
+
+    def scores(self, texts):
+        """
+        Function-word scores of every text (rows) for every language (columns):
+        all words, and only the words in a single language's list.
+        """
+        joined = _SEPARATOR.join(t.replace('\x00', ' ') if isinstance(t, str) else '' for t in texts).lower()
+        ids = np.fromiter(map(self.lookup.get, _WORD_RE.findall(joined), repeat(-1)), dtype=np.int64)
+        rows = np.cumsum(ids == -2)
+        hit = ids >= 0
+        rows, ids = rows[hit], ids[hit]
+        weights = self.weights[ids]
+        scores = np.stack([np.bincount(rows, weights=weights[:, j], minlength=len(texts))
+                           for j in range(len(self.languages))], axis=1)
+        only = weights == 1
+        exclusive = np.stack([np.bincount(rows, weights=only[:, j], minlength=len(texts))
+                              for j in range(len(self.languages))], axis=1)
+        return scores, exclusive
+
+    def detect(self, texts, default=DEFAULT_LANGUAGE, min_evidence=MIN_EVIDENCE, mixed_share=MIXED_SHARE):
+        """
+        Languages of every text as a tuple: the best-scoring language first, then
+        (in LANGUAGES order) any other language whose exclusive words reach
+        'min_evidence' and 'mixed_share' of the exclusive score. Texts scoring
+        below 'min_evidence' get (default,).
+        """
+        if not len(texts):
+            return []
+        s, excl = self.scores(texts)
+        total = s.sum(axis=1)
+        primary = s.argmax(axis=1)
+        extra = (excl >= mixed_share * excl.sum(axis=1)[:, None]) & (excl >= min_evidence)
+        extra[np.arange(len(texts)), primary] = False
+        weak = total < min_evidence
+        extra[weak] = False
+        # One code per distinct (primary, extra languages) combination
+        codes = primary * (1 << len(self.languages)) + extra @ (1 << np.arange(len(self.languages)))
+        codes[weak] = -1
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        keys = []
+        for code in distinct:
+            if code < 0:
+                keys.append((default,))
+                continue
+            p, bits = divmod(int(code), 1 << len(self.languages))
+            keys.append((self.languages[p],) + tuple(l for j, l in enumerate(self.languages) if bits >> j & 1))
+        return [keys[i] for i in inverse]
+
+
+def batches(items, size=BATCH_SIZE):
+    """Consecutive lists of up to 'size' items of an iterable (streams stay streamed)."""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def tag_languages(records, detector=None, text_field='Text'):
+    """Set LANGUAGE_FIELD and LANGUAGES_FIELD on a batch of records (in place); returns their language tuples."""
+    detector = detector or LanguageDetector()
+    langs = detector.detect([r.get(text_field) for r in records])
+    for r, key in zip(records, langs):
+        r[LANGUAGE_FIELD] = key[0]
+        r[LANGUAGES_FIELD] = list(key)
+    return langs
+
+
+def record_languages(record, default=DEFAULT_LANGUAGE):
+    """Languages of a prepared record (primary first); records prepared without detection are 'default'."""
+    langs = record.get(LANGUAGES_FIELD)
+    if isinstance(langs, (list, tuple)) and langs:
+        return tuple(langs)
+    lang = record.get(LANGUAGE_FIELD)
+    return (lang if isinstance(lang, str) and lang else default,)
+
+
+# ----------------------------------------------------------------------
+# Per-language resources and batched routing
+# ----------------------------------------------------------------------
+def lexicon(by_language, languages, default=DEFAULT_LANGUAGE):
+    """
+    Words of a {language: words} lexicon for a record in 'languages' (their union,
+    in order); a language without an entry uses the default language's words.
+    """
+    words = []
+    for lang in languages:
+        words.extend(by_language.get(lang, by_language.get(default, ())))
+    return tuple(dict.fromkeys(words))
+
+
+def language_stopwords(languages):
+    """Union of the stopwords of 'languages' (languages without a stopword list add none)."""
+    return frozenset().union(*(stopwords(lang) for lang in languages if lang in STOPWORD_LISTS))
+
+
+def keyword_pattern(words):
+    """Compiled alternation matching any of 'words' as a substring (as `any(w in text for w in words)`)."""
+    words = tuple(words)
+    pattern = _PATTERNS.get(words)
+    if pattern is None:
+        alternation = '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+        pattern = _PATTERNS[words] = re.compile(alternation or r'(?!)')
+    return pattern
+
+
+def route(keys):
+    """Indices of the items with each routing key, {key: [index, ...]} in first-seen order."""
+    groups = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(key, []).append(i)
+    return groups
+
+
+def map_routed(items, keys, fn):
+    """
+    Call fn(key, items_with_key) once per routing key (e.g. a language tuple)
+    and return the per-item results in the order of 'items'.
+    """
+    out = [None] * len(items)
+    for key, idx in route(keys).items():
+        for i, result in zip(idx, fn(key, [items[i] for i in idx])):
+            out[i] = result
+    return out
+
+
+def match_keywords(texts, keys, by_language):
+    """
+    Whether each text contains a keyword of its languages' lexicon (lowercased
+    substring match); one compiled pattern per language combination.
+    """
+    def match(languages, batch):
+        search = keyword_pattern(lexicon(by_language, languages)).search
+        return [bool(search(t.lower())) if isinstance(t, str) else False for t in batch]
+    return map_routed(texts, keys, match)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Language mix of a corpus and batched vs per-record detection speed.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--benchmark', action='store_true', help="Also time per-record detection")
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            texts = [r.get('Text') for r in json.load(f)]
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    detector = LanguageDetector()
+    start = time.perf_counter()
+    langs = [key for batch in batches(texts) for key in detector.detect(batch)]
+    batched = time.perf_counter() - start
+    print(f"{len(texts)} texts:")
+    for key, n in Counter(langs).most_common():
+        print(f"  {'+'.join(key):<10} {n:>8} {'(mixed)' if len(key) > 1 else ''}")
+    print(f"Batched detection: {len(texts) / batched:,.0f} texts/s")
+    if args.benchmark:
+        start = time.perf_counter()
+        per_record = [detector.detect([t])[0] for t in texts]
+        elapsed = time.perf_counter() - start
+        print(f"Per-record detection: {len(texts) / elapsed:,.0f} texts/s (same result: {per_record == langs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import types
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+
+# --- Configuration ---
+CACHE_DIR = 'Data/.output_cache'   # Content-addressed figures, tables and values
+CACHE_VERSION = 1                  # Bump to invalidate every cached artifact
+FIGURE_DPI = 150
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def project_module(obj):
+    """The module defining 'obj' if it is a module of this repository, else None."""
+    module = obj if isinstance(obj, types.ModuleType) else inspect.getmodule(obj)
+    path = getattr(module, '__file__', None)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if not path.startswith(PROJECT_DIR + os.sep) or 'site-packages' in path:
+        return None
+    return module
+
+
+def imported_modules(namespace):
+    """Project modules a module namespace imports (directly or through imported names), transitively."""
+    seen, todo = {namespace.get('__name__'): None}, [namespace]
+    while todo:
+        for value in list(todo.pop().values()):
+            try:
+                dep = project_module(value)
+            except Exception:
+                continue
+            if dep is not None and dep.__name__ not in seen:
+                seen[dep.__name__] = dep
+                todo.append(vars(dep))
+    return [m for m in seen.values() if m is not None]
+
+
+def called_functions(func):
+    """'func' and the functions and classes of its own module it refers to by name, transitively."""
+    seen, todo = {}, [func]
+    while todo:
+        f = todo.pop()
+        if id(f) in seen:
+            continue
+        seen[id(f)] = f
+        if not inspect.isfunction(f):
+            continue
+        codes = [f.__code__]
+        while codes:
+            code = codes.pop()
+            codes.extend(c for c in code.co_consts if isinstance(c, types.CodeType))
+            for name in code.co_names:
+                obj = f.__globals__.get(name)
+                if (inspect.isfunction(obj) or inspect.isclass(obj)) and obj.__module__ == f.__module__:
+                    todo.append(obj)
+    return list(seen.values())
+
+
+def code_version(*objects):
+    """
+    SHA-256 of the code that builds an artifact: the source of the given
+    functions (or modules), of the functions of their own module they call, and
+    of every project module their module imports, transitively. Editing a
+    helper in another module (e.g. Multilingual.lexicon) invalidates the
+    artifact; editing unrelated functions of the same script does not.
+    """
+    sources = set()
+    for obj in objects:
+        for f in called_functions(obj):
+            sources.add(inspect.getsource(f))
+        namespace = vars(obj) if isinstance(obj, types.ModuleType) else getattr(obj, '__globals__', None)
+        if namespace is None:
+            namespace = vars(sys.modules[obj.__module__])
+        for dep in imported_modules(namespace):
+            sources.add(inspect.getsource(dep))
+    h = hashlib.sha256()
+    for src in sorted(sources):
+        h.update(src.encode('utf-8'))
+    return h.hexdigest()
+
+
+def save_figure(fig, path, dpi=FIGURE_DPI):
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+class OutputCache:
+    """
+    Analysis outputs stored under a hash of everything that produced them: the
+    input dataset fingerprint, the analysis parameters, the code version (see
+    code_version) and the artifact name. A hit is read from disk without touching
+    the data; any change gives a new key, so a stale artifact is never served.
+    With enabled=False every artifact is rebuilt and nothing is written to the cache.
+    """
+
+    def __init__(self, fingerprint, cache_dir=CACHE_DIR, enabled=True):
+        self.fingerprint = fingerprint
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = self.misses = 0
+
+    def key(self, name, params, code=''):
+        src = json.dumps({'name': name, 'params': params, 'dataset': self.fingerprint, 'code': code,
+                          'version': CACHE_VERSION}, sort_keys=True, default=str)
+        return hashlib.sha256(src.encode('utf-8')).hexdigest()
+
+    def path(self, name, params, code, ext):
+        k = self.key(name, params, code)
+        return os.path.join(self.cache_dir, k[:2], k + ext)
+
+    def _lookup(self, path):
+        if os.path.exists(path):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _write(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        root, ext = os.path.splitext(path)
+        tmp = root + '.tmp' + ext
+        write(tmp)
+        os.replace(tmp, path)
+
+    def value(self, name, params, compute, code=''):
+        """JSON-serializable result of compute(), cached."""
+        if not self.enabled:
+            return compute()
+        path = self.path(name, params, code, '.json')
+        if self._lookup(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        result = compute()
+
+        def write(p):
+            with open(p, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+        self._write(path, write)
+        return result
+
+    def table(self, name, params, build, code=''):
+        """DataFrame returned by build(), cached as a pickle (index and dtypes preserved)."""
+        if not self.enabled:
+            return build()
+        path = self.path(name, params, code, '.pkl')
+        if self._lookup(path):
+            return pd.read_pickle(path)
+        df = build()
+        self._write(path, df.to_pickle)
+        return df
+
+    def export(self, name, params, write, dest, code=''):
+        """
+        Produce the file 'dest' (e.g. a figure or workbook): write(path) only runs
+        on a miss, otherwise the cached copy is copied to 'dest'.
+        """
+        if not self.enabled:
+            write(dest)
+            return dest
+        ext = os.path.splitext(dest)[1]
+        path = self.path(name, params, code, ext)
+        if not self._lookup(path):
+            self._write(path, write)
+        if os.path.dirname(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(path, dest)
+        return dest
+
+    def figure(self, name, params, render, dest, code='', dpi=FIGURE_DPI):
+        """Save the figure returned by render() to 'dest', re-rendering it only on a miss."""
+        params = {'figure': params, 'matplotlib': matplotlib.__version__, 'dpi': dpi}
+        return self.export(name, params, lambda p: save_figure(render(), p, dpi), dest, code)
+
+    def summary(self):
+        return f"Output cache: {self.hits} artifact(s) served from disk, {self.misses} rebuilt."
@@ -0,0 +1,409 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from Corpus_query import dataset_fingerprint
+from Output_cache import called_functions
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TOPIC_DIR = os.path.join(ROOT, 'Topic_Internet_access')
+
+# --- Configuration ---
+STATE_DIR = 'Data/.pipeline'              # Stage keys and artifact hashes (state.json)
+TABLE_DIR = 'Data/pipeline/tables'
+FIGURE_DIR = 'Data/pipeline/figures'
+DASHBOARD_FILE = 'Data/dashboard/index.html'
+CHARTS = ['trends', 'upr', 'esc-ccpr', 'bigrams']
+WORKERS = None                            # Process pool size (None = CPU count)
+# Data files a module reads as part of its code (paths relative to the repository root);
+# they make every stage whose imports reach the module stale, like its source
+MODULE_DATA = {
+    'Topic_Internet_access/Bodies_groups.py': ['Topic_Internet_access/filters.json'],
+}
+
+
+class Stage:
+    """
+    One pipeline stage: fn(**params) reads the 'inputs' files and the outputs
+    of the 'deps' stages and writes its 'outputs'. 'code' lists the source
+    files whose changes make the stage stale. 'fn' must be a module-level
+    function so it can run in a worker process.
+    """
+
+    def __init__(self, name, fn, deps=(), inputs=(), outputs=(), code=(), params=None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)
+        self.params = params or {}
+
+
+# ----------------------------------------------------------------------
+# Artifact hashing and state
+# ----------------------------------------------------------------------
+def artifact_hash(path, cache_dir=STATE_DIR):
+    """Content hash of a file, or of every file below a directory; None if missing."""
+    if os.path.isfile(path):
+        return dataset_fingerprint(path, cache_dir)
+    if not os.path.isdir(path):
+        return None
+    h = hashlib.sha256()
+    for base, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(base, name)
+            h.update(os.path.relpath(full, path).encode('utf-8'))
+            h.update(dataset_fingerprint(full, cache_dir).encode('ascii'))
+    return h.hexdigest()
+
+
+def stage_key(stage, state):
+    """
+    Hash of everything a stage's result depends on: its code (the source of
+    the stage function and of the functions of its module it calls, plus the
+    'code' files), parameters, input files and the artifact hashes its
+    dependencies last produced. Returns None while an input is missing.
+    """
+    src = {'fn': f"{stage.fn.__module__}.{stage.fn.__name__}", 'params': stage.params,
+           'source': [inspect.getsource(f) for f in called_functions(stage.fn)],
+           'code': {}, 'inputs': {}, 'deps': {}}
+    for path in stage.code:
+        src['code'][path] = artifact_hash(path)
+    for path in stage.inputs:
+        src['inputs'][path] = artifact_hash(path)
+        if src['inputs'][path] is None:
+            return None
+    for dep in stage.deps:
+        src['deps'][dep] = state.get(dep, {}).get('outputs')
+    return hashlib.sha256(json.dumps(src, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def is_fresh(stage, key, state):
+    """True if the stage last ran with 'key' and its outputs are unchanged since."""
+    entry = state.get(stage.name)
+    if not entry or entry.get('key') != key:
+        return False
+    return all(artifact_hash(p) == entry['outputs'].get(p) for p in stage.outputs)
+
+
+def load_state(state_dir=STATE_DIR):
+    try:
+        with open(os.path.join(state_dir, 'state.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    tmp = os.path.join(state_dir, 'state.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp, os.path.join(state_dir, 'state.json'))
+
+
+# ----------------------------------------------------------------------
+# Scheduler
+# ----------------------------------------------------------------------
+def select(stages, targets):
+    """The stages needed for 'targets' (names) and all their ancestors, in declaration order."""
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        for d in s.deps:
+            if d not in by_name:
+                raise ValueError(f"Stage '{s.name}' depends on unknown stage '{d}'")
+    if not targets:
+        return list(stages)
+    needed, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown stage '{name}'")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in stages if s.name in needed]
+
+
+def _run_stage(fn, params):
+    start = time.time()
+    fn(**params)
+    return time.time() - start
+
+
+def run_pipeline(stages, targets=(), force=(), workers=WORKERS, dry_run=False, state_dir=STATE_DIR):
+    """
+    Run the stale stages of the DAG. A stage is submitted to the process pool as
+    soon as all its dependencies are settled, so independent stages run
+    concurrently. Fresh stages are skipped; since keys include the content hash
+    of upstream artifacts, a stage whose upstream reran but produced identical
+    output is skipped too. Failed stages skip their dependents.
+    A stage whose input files are missing keeps its existing outputs, if any.
+    Returns {stage: 'fresh' | 'kept' | 'ran' | 'failed' | 'skipped' | 'stale'}.
+    """
+    stages = select(stages, targets)
+    state = load_state(state_dir)
+    status = {}
+    pending = {s.name: s for s in stages}
+    running = {}
+
+    def settle():
+        """Decide every pending stage whose dependencies are all settled."""
+        for name, s in list(pending.items()):
+            if any(d in pending or d in running.values() for d in s.deps):
+                continue
+            del pending[name]
+            if any(status[d] in ('failed', 'skipped', 'stale') for d in s.deps):
+                status[name] = 'skipped' if not dry_run else 'stale'
+                continue
+            key = stage_key(s, state)
+            if key is None:
+                # Inputs missing (e.g. the raw export is not checked out): keep existing outputs
+                if s.outputs and all(os.path.exists(p) for p in s.outputs):
+                    state[name] = {'key': None, 'outputs': {p: artifact_hash(p) for p in s.outputs}}
+                    status[name] = 'kept'
+                    save_state(state, state_dir)
+                    print(f"[kept]    {name} (inputs missing, using existing outputs)")
+                else:
+                    status[name] = 'failed'
+                    print(f"[failed]  {name}: missing inputs {[p for p in s.inputs if not os.path.exists(p)]}")
+            elif name not in force and is_fresh(s, key, state):
+                status[name] = 'fresh'
+                print(f"[fresh]   {name}")
+            elif dry_run:
+                status[name] = 'stale'
+                print(f"[stale]   {name}")
+            else:
+                print(f"[run]     {name}")
+                running[pool.submit(_run_stage, s.fn, s.params)] = name
+
+    with ProcessPoolExecutor(workers) as pool:
+        settle()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                s = next(st for st in stages if st.name == name)
+                try:
+                    elapsed = fut.result()
+                    missing = [p for p in s.outputs if not os.path.exists(p)]
+                    if missing:
+                        raise RuntimeError(f"outputs not written: {missing}")
+                except Exception as e:
+                    status[name] = 'failed'
+                    state.pop(name, None)
+                    print(f"[failed]  {name}: {e}")
+                    continue
+                status[name] = 'ran'
+                state[name] = {'key': stage_key(s, state),
+                               'outputs': {p: artifact_hash(p) for p in s.outputs}}
+                save_state(state, state_dir)
+                print(f"[done]    {name} ({elapsed:.1f}s)")
+            settle()
+    return status
+
+
+# ----------------------------------------------------------------------
+# Code dependencies of a stage, from the imports of its function
+# ----------------------------------------------------------------------
+def module_file(name):
+    """Source file of a project module (repository root or Topic_Internet_access), else None."""
+    for folder in (ROOT, TOPIC_DIR):
+        path = os.path.join(folder, name.split('.')[0] + '.py')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def imported_names(tree):
+    """Names of the modules imported anywhere in a syntax tree, including topic_module('...') calls."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module
+        elif (isinstance(node, ast.Call) and node.args and isinstance(node.args[0], ast.Constant)
+              and isinstance(node.args[0].value, str)
+              and getattr(node.func, 'id', getattr(node.func, 'attr', None)) in ('topic_module', 'import_module')):
+            yield node.args[0].value
+
+
+def code_dependencies(fn):
+    """
+    Source files (and MODULE_DATA files) of every project module a stage
+    function imports, followed through those modules' own imports, so an
+    edit anywhere in the code a stage runs makes it stale.
+    """
+    data = {os.path.join(ROOT, m): [os.path.join(ROOT, d) for d in files] for m, files in MODULE_DATA.items()}
+    files, todo = set(), [ast.parse(textwrap.dedent(inspect.getsource(fn)))]
+    while todo:
+        for name in imported_names(todo.pop()):
+            path = module_file(name)
+            if path is None or path in files:
+                continue
+            files.add(path)
+            files.update(data.get(path, ()))
+            with open(path, 'r', encoding='utf-8') as f:
+                todo.append(ast.parse(f.read(), path))
+    return sorted(files)
+
+
+# ----------------------------------------------------------------------
+# Stages of this repository (run from the repository root)
+# ----------------------------------------------------------------------
+def topic_module(name):
+    """Import a script from Topic_Internet_access (names may contain spaces)."""
+    if TOPIC_DIR not in sys.path:
+        sys.path.append(TOPIC_DIR)
+    return importlib.import_module(name)
+
+
+def prep_stage():
+    import Dataset_prep
+    Dataset_prep.main()
+
+
+def normalize_stage(source, out_dir):
+    from Corpus_query import load_corpus
+    from Corpus_mmap import build_mmap_corpus
+    build_mmap_corpus(load_corpus(source), out_dir, dataset_fingerprint(source))
+
+
+def cube_stage(mmap_dir, cube_file):
+    from Corpus_mmap import MappedCorpus
+    from Trend_engine import build_cube, save_cube
+    cube, meta = build_cube(MappedCorpus(mmap_dir))
+    save_cube(cube, meta, cube_file)
+
+
+def emerging_stage(cube_file, out_file):
+    from Trend_engine import load_cube, scan_emerging
+    cube, meta = load_cube(cube_file)
+    scan_emerging(cube, meta).to_csv(out_file, index=False)
+
+
+def countries_stage(source, agg_file):
+    from Corpus_query import load_corpus
+    from Country_profiles import build_country_aggregates, save_aggregates
+    M, meta = build_country_aggregates(load_corpus(source))
+    meta['source_fingerprint'] = dataset_fingerprint(source)
+    save_aggregates(M, meta, agg_file)
+
+
+def tables_stage(source, out_dir):
+    """Aggregate every chart's data and the Annex I tables from one load of the corpus."""
+    from Corpus_query import load_corpus
+    from Corpus_view import CorpusView
+    import pandas as pd
+    records = load_corpus(source)
+    service = topic_module('Analytics_service')
+    corpus = service.WarmCorpus(records)
+    os.makedirs(out_dir, exist_ok=True)
+    tables = {
+        'trends': corpus.trends(2006, 2024),
+        'upr': corpus.upr(service.UPR_analysis.theme, 2010, 2024),
+        'esc-ccpr': corpus.esc_ccpr(2007, 2024),
+        'bigrams': corpus.bigrams(10),
+    }
+    for name, data in tables.items():
+        with open(os.path.join(out_dir, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+
+    annex = topic_module('Table_Annex I')
+    data = CorpusView(records).derive("Reccomending Body", annex.standardize_body)
+    with pd.ExcelWriter(os.path.join(out_dir, annex.OUTPUT_EXCEL_FILE), engine='openpyxl') as writer:
+        annex.generate_body_distribution_table(data, 2006, 2024).to_excel(writer, sheet_name="Body Distribution")
+        annex.generate_internet_share_table(data, 2006, 2024).to_excel(writer, sheet_name="Internet Share")
+
+
+def dashboard_stage(mmap_dir, out_file):
+    from Corpus_mmap import MappedCorpus
+    dashboard = topic_module('Dashboard')
+    dashboard.write_dashboard(dashboard.build_tiles(MappedCorpus(mmap_dir)), out_file)
+
+
+def figure_stage(name, table_file, out_file):
+    service = topic_module('Analytics_service')
+    with open(table_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    with open(out_file, 'wb') as f:
+        f.write(service.render_chart(name, data))
+
+
+def default_stages():
+    import Dataset_prep
+    from Corpus_mmap import OUTPUT_DIR as MMAP_DIR
+    from Trend_engine import CUBE_FILE
+    from Country_profiles import AGG_FILE
+
+    corpus = Dataset_prep.OUTPUT_FILE
+    emerging = os.path.join(TABLE_DIR, 'emerging_topics.csv')
+    table_outputs = [os.path.join(TABLE_DIR, c + '.json') for c in CHARTS]
+    table_outputs.append(os.path.join(TABLE_DIR, 'Internet_Distribution.xlsx'))
+
+    stages = [
+        Stage('prep', prep_stage, inputs=[Dataset_prep.INPUT_FILE], outputs=[corpus],
+              code=code_dependencies(prep_stage)),
+        Stage('normalize', normalize_stage, deps=['prep'], outputs=[MMAP_DIR],
+              code=code_dependencies(normalize_stage),
+              params={'source': corpus, 'out_dir': MMAP_DIR}),
+        Stage('cube', cube_stage, deps=['normalize'], outputs=[CUBE_FILE], code=code_dependencies(cube_stage),
+              params={'mmap_dir': MMAP_DIR, 'cube_file': CUBE_FILE}),
+        Stage('emerging', emerging_stage, deps=['cube'], outputs=[emerging], code=code_dependencies(emerging_stage),
+              params={'cube_file': CUBE_FILE, 'out_file': emerging}),
+        Stage('dashboard', dashboard_stage, deps=['normalize'], outputs=[DASHBOARD_FILE],
+              code=code_dependencies(dashboard_stage),
+              params={'mmap_dir': MMAP_DIR, 'out_file': DASHBOARD_FILE}),
+        Stage('countries', countries_stage, deps=['prep'], outputs=[AGG_FILE, AGG_FILE + '.json'],
+              code=code_dependencies(countries_stage),
+              params={'source': corpus, 'agg_file': AGG_FILE}),
+        Stage('tables', tables_stage, deps=['prep'], outputs=table_outputs, code=code_dependencies(tables_stage),
+              params={'source': corpus, 'out_dir': TABLE_DIR}),
+    ]
+    figure_code = code_dependencies(figure_stage)
+    for chart in CHARTS:
+        stages.append(Stage(
+            'figure-' + chart, figure_stage, deps=['tables'],
+            outputs=[os.path.join(FIGURE_DIR, chart + '.png')],
+            code=figure_code,
+            params={'name': chart, 'table_file': os.path.join(TABLE_DIR, chart + '.json'),
+                    'out_file': os.path.join(FIGURE_DIR, chart + '.png')}))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale stages of the analysis pipeline.")
+    parser.add_argument('targets', nargs='*', help="Stages to bring up to date (default: all)")
+    parser.add_argument('--force', nargs='*', default=[], help="Stages to rerun even if fresh")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="Worker processes")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages are stale")
+    parser.add_argument('--list', action='store_true', help="List the stages and their dependencies")
+    args = parser.parse_args()
+
+    stages = default_stages()
+    if args.list:
+        for s in stages:
+            print(f"{s.name}: {', '.join(s.deps) or '-'}")
+        return
+    try:
+        status = run_pipeline(stages, args.targets, args.force, args.workers, args.dry_run)
+    except ValueError as e:
+        print(e)
+        return
+    counts = {v: sum(1 for s in status.values() if s == v) for v in sorted(set(status.values()))}
+    print(", ".join(f"{n} {v}" for v, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
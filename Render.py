@@ -0,0 +1,197 @@
+import argparse
+import io
+import random
+import time
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import IdentityTransform
+
+# --- Configuration ---
+BENCH_YEARS = range(2006, 2025)
+BENCH_MECHANISMS = 80       # Mechanisms in the active-mechanisms benchmark (every SR/IE/WG mandate, TBs)
+BENCH_CATEGORIES = 10       # Categories in the dot plot benchmark (as ESC_CCPR_analysis.py)
+BENCH_REPEAT = 3
+
+
+def scatter_points(ax, x, y, colors, size=36, **kwargs):
+    """All points of a series as one PathCollection; 'colors' is one color or one per point."""
+    colors = to_rgba_array(colors)
+    return ax.scatter(np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                      c=colors if len(colors) > 1 else colors[0:1], s=size, **kwargs)
+
+
+def glyph_markers(ax, x, y, labels, color='white', fontsize=8, bold=True, **kwargs):
+    """
+    Short labels (e.g. '1'..'10') centred on the points (x, y), drawn as mathtext
+    markers: one collection per distinct label instead of one Text artist per point.
+    """
+    x, y, labels = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(labels, dtype=str)
+    collections = []
+    for lab in dict.fromkeys(labels.tolist()):
+        m = labels == lab
+        glyph = rf'$\mathbf{{{lab}}}$' if bold else f'${lab}$'
+        # A glyph is scaled until its larger side fills the marker: the digit height
+        # (~0.7 em) for one character, the label width (~0.55 em per digit) beyond
+        size = (fontsize * max(0.7, 0.55 * len(lab))) ** 2
+        collections.append(ax.scatter(x[m], y[m], marker=glyph, s=size, c=[color], linewidths=0, **kwargs))
+    return collections
+
+
+def annotate(ax, x, y, labels, ha='left', va='baseline', fontsize=None, color=None, fontweight='normal', **kwargs):
+    """
+    Text labels at (x, y) drawn as one PathCollection of glyph outlines instead of
+    one Text artist per label; empty labels are skipped. Alignment follows Text
+    (the line box of the font for 'va'). The labels sit inside the axes, so they
+    are left out of tight_layout's bounding-box pass and of autoscaling.
+    """
+    prop = FontProperties(size=fontsize if fontsize is not None else plt.rcParams['font.size'], weight=fontweight)
+    _, line_h, line_d = text_to_path.get_text_width_height_descent('lp', prop, ismath=False)
+    paths, offsets = [], []
+    for xi, yi, lab in zip(x, y, labels):
+        if not lab:
+            continue
+        w, h, d = text_to_path.get_text_width_height_descent(lab, prop, ismath=False)
+        h, d = max(h, line_h), max(d, line_d)
+        dx = {'left': 0, 'center': -w / 2, 'right': -w}[ha]
+        dy = {'baseline': 0, 'bottom': d, 'center': d - h / 2, 'top': d - h}[va]
+        paths.append(TextPath((dx, dy), lab, prop=prop))
+        offsets.append((xi, yi))
+    kwargs.setdefault('zorder', 3)   # as Text
+    # Paths are in points; sizes=[1] scales them by dpi / 72 at draw time, like scatter markers
+    labels_ = PathCollection(paths, sizes=[1], offsets=np.asarray(offsets, dtype=float).reshape(-1, 2),
+                             offset_transform=ax.transData, transform=IdentityTransform(), linewidths=0,
+                             facecolors=color if color is not None else plt.rcParams['text.color'], **kwargs)
+    labels_.set_in_layout(False)
+    ax.add_collection(labels_, autolim=False)
+    return labels_
+
+
+def legend_handles(labels, colors, marker='o', markersize=8, **kwargs):
+    """Proxy handles for a legend over batched collections (one entry per label)."""
+    return [Line2D([0], [0], marker=marker, color=c, label=l, markersize=markersize, linestyle='', **kwargs)
+            for l, c in zip(labels, colors)]
+
+
+def count_artists(fig):
+    return sum(1 for _ in fig.findobj(lambda a: a is not fig))
+
+
+def benchmark(make_fig, repeat=BENCH_REPEAT):
+    """Best build+layout, draw and PNG save time (seconds) and the artist count of make_fig()."""
+    best = {'build': np.inf, 'draw': np.inf, 'save': np.inf}
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fig = make_fig()
+        best['build'] = min(best['build'], time.perf_counter() - t)
+        t = time.perf_counter()
+        fig.canvas.draw()
+        best['draw'] = min(best['draw'], time.perf_counter() - t)
+        t = time.perf_counter()
+        fig.savefig(io.BytesIO(), format='png')
+        best['save'] = min(best['save'], time.perf_counter() - t)
+        artists = count_artists(fig)
+        plt.close(fig)
+    best['artists'] = artists
+    return best
+
+
+# ----------------------------------------------------------------------
+# Benchmark charts: per-artist reference vs batched
+# ----------------------------------------------------------------------
+def _dot_data(n_categories, years, seed=42):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 500, size=(n_categories, len(years)))
+
+
+def _dots(counts, years, batched):
+    random.seed(42)
+    fig, ax = plt.subplots(figsize=(12, 8))
+    x_vals = np.arange(len(years)) + 0.5
+    for k, row in enumerate(counts):
+        color, label = ('red' if k < len(counts) // 2 else 'blue'), str(k + 1)
+        jx = [x + random.uniform(-0.3, 0.3) for x in x_vals]
+        if batched:
+            scatter_points(ax, jx, row, color, size=144, alpha=0.6)
+            glyph_markers(ax, jx, row, [label] * len(jx))
+        else:
+            for x, c in zip(jx, row):
+                ax.plot(x, c, marker='o', color=color, markersize=12, linestyle='', alpha=0.6)
+                ax.text(x, c, label, color='white', ha='center', va='center', fontsize=8, fontweight='bold')
+    plt.tight_layout()
+    return fig
+
+
+def _mechanisms(n_mechanisms, years, batched, seed=42):
+    rng = np.random.default_rng(seed)
+    points = [(f'- Mechanism {b}', y, int(c)) for b in range(n_mechanisms)
+              for y, c in zip(years, rng.integers(10, 200, size=len(years)))]
+    cmap = matplotlib.colormaps['nipy_spectral'].resampled(len(points))
+    random.seed(42)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ys = [c + random.uniform(-0.5, 0.5) for _, _, c in points]
+    if batched:
+        colors = cmap(np.arange(len(points)))
+        scatter_points(ax, [p[1] for p in points], ys, colors, alpha=0.7)
+        first = {}
+        for i, (b, _, _) in enumerate(points):
+            first.setdefault(b, colors[i])
+        ax.legend(handles=legend_handles(first.keys(), first.values(), alpha=0.7), fontsize=6, ncol=4)
+    else:
+        seen = set()
+        for i, ((b, y, _), yj) in enumerate(zip(points, ys)):
+            ax.scatter(y, yj, color=cmap(i), marker='o', alpha=0.7, label=None if b in seen else b)
+            seen.add(b)
+        ax.legend(fontsize=6, ncol=4)
+    plt.tight_layout()
+    return fig
+
+
+def _stacked(years, batched, seed=42):
+    rng = np.random.default_rng(seed)
+    low, high = rng.integers(50, 500, size=len(years)), rng.integers(50, 500, size=len(years))
+    fig, ax = plt.subplots(figsize=(14, 7))
+    b1 = ax.bar(years, low)
+    b2 = ax.bar(years, high, bottom=low)
+    xs = [b.get_x() + b.get_width() / 2 for b in b1] * 2
+    ys = [l / 2 for l in low] + [l + h / 2 for l, h in zip(low, high)]
+    labels = [f"{100 * v / (l + h):.1f}%" for v, l, h in zip(list(low) + list(high), list(low) * 2, list(high) * 2)]
+    if batched:
+        annotate(ax, xs, ys, labels, ha='center', va='center', fontsize=9, color='white')
+    else:
+        for x, y, lab in zip(xs, ys, labels):
+            ax.text(x, y, lab, ha='center', va='center', fontsize=9, color='white')
+    plt.tight_layout()
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-artist vs batched rendering of the analysis charts.")
+    parser.add_argument('--mechanisms', type=int, default=BENCH_MECHANISMS)
+    parser.add_argument('--categories', type=int, default=BENCH_CATEGORIES)
+    parser.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    args = parser.parse_args()
+
+    matplotlib.use('Agg')
+    years = list(BENCH_YEARS)
+    counts = _dot_data(args.categories, years)
+    charts = {
+        f'ESC/CCPR dots ({args.categories} categories x {len(years)} years)': lambda b: _dots(counts, years, b),
+        f'Active mechanisms ({args.mechanisms} x {len(years)} years)': lambda b: _mechanisms(args.mechanisms, years, b),
+        f'Stacked bars ({len(years)} years, 2 segments)': lambda b: _stacked(years, b),
+    }
+    print(f"{'Chart':<45} {'mode':<10} {'artists':>8} {'build':>8} {'draw':>8} {'save':>8}")
+    for name, make in charts.items():
+        for mode, batched in (('per-point', False), ('batched', True)):
+            r = benchmark(lambda: make(batched), args.repeat)
+            print(f"{name:<45} {mode:<10} {r['artists']:>8} {r['build']:>8.3f} {r['draw']:>8.3f} {r['save']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+from Corpus_query import standardize_body
+
+# --- Configuration ---
+# Cumulative share of every stratum evaluated per refinement round. The preview stops short of 1.0:
+# the scripts follow it with the exact run over every record, which is the final plot
+FRACTIONS = (0.02, 0.1, 0.3)
+MIN_PER_STRATUM = 2            # Smallest sample per stratum (two records give a variance estimate)
+Z = 1.96                       # Normal quantile of the confidence intervals (95%)
+SEED = 42
+
+
+def stratum_key(record):
+    """Year x (standardized) recommending body of a record."""
+    return record.get('Year'), standardize_body(record.get('Reccomending Body', ''))
+
+
+def stratified_estimates(records, values, strata=stratum_key, fractions=FRACTIONS, z=Z, seed=SEED):
+    """
+    Estimate the totals of values(record), a {cell: number} dict such as
+    {(year, 'theme'): 1}, over 'records' from a stratified random sample.
+
+    Each round grows the sample of every stratum to the next fraction (at
+    least MIN_PER_STRATUM records), evaluating only the newly drawn records,
+    and yields (share of records evaluated, {cell: estimate}, {cell: margin}),
+    estimate +- margin being the confidence interval of the stratified
+    expansion estimator. A fraction of 1.0 gives the exact totals (margin 0);
+    the default FRACTIONS leave that to the exact run the scripts draw last.
+    Totals of cells fixed by the strata (e.g. records per year) are exact in
+    every round.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(strata(r), len(index)) for r in records), dtype=np.int64, count=len(records))
+    # A random order within each stratum: shuffle, then stable-sort by stratum
+    perm = np.random.default_rng(seed).permutation(len(codes))
+    order = perm[np.argsort(codes[perm], kind='stable')]
+    sizes = np.bincount(codes, minlength=len(index))
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+    taken = np.zeros(len(sizes), dtype=np.int64)
+    sums = [Counter() for _ in sizes]
+    squares = [Counter() for _ in sizes]
+
+    for f in fractions:
+        target = np.minimum(sizes, np.maximum(np.ceil(f * sizes).astype(np.int64), MIN_PER_STRATUM))
+        for h in np.flatnonzero(target > taken):
+            for i in order[starts[h] + taken[h]:starts[h] + target[h]]:
+                for cell, v in values(records[i]).items():
+                    sums[h][cell] += v
+                    squares[h][cell] += v * v
+        taken = np.maximum(taken, target)
+
+        est, var = Counter(), Counter()
+        for h, (N, n) in enumerate(zip(sizes.tolist(), taken.tolist())):
+            for cell, s in sums[h].items():
+                est[cell] += N * s / n
+                if 1 < n < N:
+                    s2 = max(squares[h][cell] - s * s / n, 0.0) / (n - 1)
+                    var[cell] += N * N * (1 - n / N) * s2 / n
+        yield taken.sum() / max(len(codes), 1), dict(est), {c: z * math.sqrt(var[c]) for c in est}
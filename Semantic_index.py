@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from Corpus_query import INPUT_FILE, load_corpus, dataset_fingerprint
+from Corpus_mmap import OUTPUT_DIR as MMAP_DIR, MappedCorpus, build_mmap_corpus, is_current
+
+# --- Configuration ---
+INDEX_DIR = 'Data/UHRI_Internet.emb'   # Embeddings, progress marker and ANN index
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'   # Any local sentence-transformers model path/name
+BATCH_SIZE = 256          # Texts embedded (and flushed to disk) per batch
+N_PROBE = 8               # Inverted lists scanned per query
+KMEANS_ITER = 20
+KMEANS_SAMPLE = 50000     # Vectors used to train the coarse quantizer
+SEED = 42
+
+# Layout of INDEX_DIR:
+#   embeddings.f16   float16[n, dim] memmap of L2-normalized sentence embeddings
+#   progress.json    model, dim, record count, source fingerprint, rows done
+#   centroids.npy    float32[nlist, dim] coarse quantizer (IVF)
+#   list_ids.npy     int64[n] record ids grouped by inverted list
+#   list_offsets.npy int64[nlist + 1] start of each list in list_ids
+#   index.json       embeddings the index was built from (written last)
+
+
+def load_model(model_name=MODEL_NAME):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("Semantic indexing needs the 'sentence-transformers' package "
+                          "(pip install sentence-transformers).")
+    return SentenceTransformer(model_name, device='cpu')
+
+
+def encode(model, texts):
+    texts = list(texts)
+    return model.encode(texts, batch_size=len(texts), normalize_embeddings=True,
+                        show_progress_bar=False, convert_to_numpy=True).astype(np.float32)
+
+
+def read_progress(index_dir=INDEX_DIR):
+    try:
+        with open(os.path.join(index_dir, 'progress.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_progress(progress, index_dir=INDEX_DIR, name='progress.json'):
+    tmp = os.path.join(index_dir, name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(progress, f, indent=4)
+    os.replace(tmp, os.path.join(index_dir, name))
+
+
+def embeddings_id(progress):
+    """What identifies a finished embedding matrix: its model, size and source dataset."""
+    return {k: progress[k] for k in ['model', 'dim', 'n_records', 'source_fingerprint']}
+
+
+def embed_corpus(corpus, fingerprint, index_dir=INDEX_DIR, model_name=MODEL_NAME, batch_size=BATCH_SIZE):
+    """
+    Embed every record text into a float16 memmap, batch by batch.
+    Progress is recorded after each flushed batch, so an interrupted run
+    resumes where it stopped; a changed corpus or model starts over.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    model = load_model(model_name)
+    dim = model.get_sentence_embedding_dimension()
+    n = len(corpus)
+    path = os.path.join(index_dir, 'embeddings.f16')
+
+    progress = read_progress(index_dir)
+    fresh = {'model': model_name, 'dim': dim, 'n_records': n, 'source_fingerprint': fingerprint, 'done': 0}
+    if not progress or embeddings_id(progress) != embeddings_id(fresh):
+        progress = fresh
+        # The index of the previous embeddings no longer applies
+        if os.path.exists(os.path.join(index_dir, 'index.json')):
+            os.remove(os.path.join(index_dir, 'index.json'))
+        np.memmap(path, dtype=np.float16, mode='w+', shape=(max(n, 1), dim)).flush()
+        write_progress(progress, index_dir)
+
+    emb = np.memmap(path, dtype=np.float16, mode='r+', shape=(max(n, 1), dim))
+    start = progress['done']
+    if start:
+        print(f"Resuming at record {start} of {n}.")
+    for a in range(start, n, batch_size):
+        b = min(a + batch_size, n)
+        emb[a:b] = encode(model, corpus.texts(a, b))
+        emb.flush()
+        progress['done'] = b
+        write_progress(progress, index_dir)
+        print(f"Embedded {b}/{n}", end='\r')
+    print()
+    return progress
+
+
+def open_embeddings(index_dir=INDEX_DIR):
+    """Map the finished embedding matrix read-only."""
+    progress = read_progress(index_dir)
+    if not progress or progress['done'] < progress['n_records']:
+        raise RuntimeError(f"Embeddings in '{index_dir}' are incomplete; run the 'embed' step first.")
+    return np.memmap(os.path.join(index_dir, 'embeddings.f16'), dtype=np.float16, mode='r',
+                     shape=(max(progress['n_records'], 1), progress['dim']))[:progress['n_records']]
+
+
+def assign(vectors, centroids, chunk=65536):
+    """Index of the nearest (highest dot product) centroid for every vector."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for a in range(0, len(vectors), chunk):
+        out[a:a + chunk] = (np.asarray(vectors[a:a + chunk], dtype=np.float32) @ centroids.T).argmax(axis=1)
+    return out
+
+
+def train_centroids(emb, nlist, n_iter=KMEANS_ITER, sample=KMEANS_SAMPLE, seed=SEED):
+    """Spherical k-means on a sample of the embeddings."""
+    rng = np.random.RandomState(seed)
+    idx = rng.choice(len(emb), size=min(sample, len(emb)), replace=False)
+    x = np.asarray(emb[np.sort(idx)], dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=nlist, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = (x @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def build_index(index_dir=INDEX_DIR, nlist=None):
+    """
+    Build the IVF index (coarse centroids + inverted lists) over the embeddings;
+    index.json records which embeddings it was built from.
+    """
+    emb = open_embeddings(index_dir)
+    built_from = embeddings_id(read_progress(index_dir))
+    if os.path.exists(os.path.join(index_dir, 'index.json')):
+        os.remove(os.path.join(index_dir, 'index.json'))
+    nlist = nlist or max(1, int(np.sqrt(len(emb))))
+    centroids = train_centroids(emb, min(nlist, len(emb)))
+    labels = assign(emb, centroids)
+    order = np.argsort(labels, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centroids)))])
+    np.save(os.path.join(index_dir, 'centroids.npy'), centroids)
+    np.save(os.path.join(index_dir, 'list_ids.npy'), order)
+    np.save(os.path.join(index_dir, 'list_offsets.npy'), offsets)
+    write_progress(dict(built_from, nlist=len(centroids)), index_dir, 'index.json')
+    return len(centroids)
+
+
+class SemanticIndex:
+    """Approximate nearest-neighbour search over the memory-mapped embeddings."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.emb = open_embeddings(index_dir)
+        progress = read_progress(index_dir)
+        try:
+            with open(os.path.join(index_dir, 'index.json'), 'r', encoding='utf-8') as f:
+                built_from = json.load(f)
+        except FileNotFoundError:
+            raise RuntimeError(f"No index in '{index_dir}'; run the 'index' step first.")
+        if {k: built_from.get(k) for k in embeddings_id(progress)} != embeddings_id(progress):
+            raise RuntimeError(f"The index in '{index_dir}' was built from other embeddings "
+                               f"({built_from.get('n_records')} records); run the 'index' step again.")
+        self.centroids = np.load(os.path.join(index_dir, 'centroids.npy'))
+        self.list_ids = np.load(os.path.join(index_dir, 'list_ids.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(index_dir, 'list_offsets.npy'))
+        self.model_name = progress['model']
+        self._model = None
+
+    def embed_texts(self, texts):
+        if self._model is None:
+            self._model = load_model(self.model_name)
+        return encode(self._model, texts)
+
+    def search(self, query, k=20, n_probe=N_PROBE, exclude=()):
+        """Top-k (record id, cosine similarity) for one normalized query vector."""
+        query = np.asarray(query, dtype=np.float32)
+        lists = np.argsort(-(self.centroids @ query))[:n_probe]
+        cand = np.concatenate([self.list_ids[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        if len(exclude):
+            cand = cand[~np.isin(cand, list(exclude))]
+        cand = np.sort(cand)   # ascending ids read the memmap sequentially
+        sims = np.asarray(self.emb[cand], dtype=np.float32) @ query
+        top = np.argsort(-sims)[:k]
+        return list(zip(cand[top].tolist(), sims[top].tolist()))
+
+    def similar_to_seeds(self, seed_ids=(), seed_texts=(), k=20, n_probe=N_PROBE):
+        """
+        Records most similar to a set of seed examples (record ids and/or free
+        texts), searched with the normalized mean of the seed embeddings.
+        Seed records themselves are excluded from the results.
+        """
+        vecs = [np.asarray(self.emb[i], dtype=np.float32) for i in seed_ids]
+        if seed_texts:
+            vecs.extend(self.embed_texts(seed_texts))
+        if not vecs:
+            raise ValueError("At least one seed id or seed text is required.")
+        q = np.mean(vecs, axis=0)
+        q /= max(np.linalg.norm(q), 1e-12)
+        return self.search(q, k, n_probe, exclude=seed_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic embedding index over the prepared corpus.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_embed = sub.add_parser('embed', help="Compute (or resume) embeddings")
+    p_embed.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    p_embed.add_argument('--model', default=MODEL_NAME)
+    p_index = sub.add_parser('index', help="Build the ANN index")
+    p_index.add_argument('--nlist', type=int, help="Number of inverted lists (default sqrt(n))")
+    p_search = sub.add_parser('search', help="Find records similar to seed examples")
+    p_search.add_argument('--seed-ids', type=int, nargs='*', default=[])
+    p_search.add_argument('--seed-text', nargs='*', default=[])
+    p_search.add_argument('--top', type=int, default=20)
+    p_search.add_argument('--n-probe', type=int, default=N_PROBE)
+    args = parser.parse_args()
+
+    if args.command == 'embed':
+        try:
+            fingerprint = dataset_fingerprint(args.input)
+        except FileNotFoundError:
+            print(f"File not found: {args.input}")
+            return
+        if not is_current(MMAP_DIR, args.input):
+            build_mmap_corpus(load_corpus(args.input), MMAP_DIR, fingerprint)
+        progress = embed_corpus(MappedCorpus(MMAP_DIR), fingerprint, model_name=args.model)
+        print(f"Embeddings complete: {progress['done']} x {progress['dim']} ({progress['model']}).")
+    elif args.command == 'index':
+        try:
+            nlist = build_index(nlist=args.nlist)
+        except RuntimeError as e:
+            print(e)
+            return
+        print(f"Index built with {nlist} inverted lists.")
+    else:
+        try:
+            index = SemanticIndex()
+        except RuntimeError as e:
+            print(e)
+            return
+        corpus = MappedCorpus(MMAP_DIR)
+        if corpus.meta.get('source_fingerprint') != read_progress()['source_fingerprint']:
+            print("The embeddings are for another version of the corpus; run the 'embed' and 'index' steps again.")
+            return
+        for rid, sim in index.similar_to_seeds(args.seed_ids, args.seed_text, args.top, args.n_probe):
+            print(f"{sim:.3f}\t{rid}\t{corpus.bodies[corpus.body[rid]]}\t{corpus.year[rid]}\t{corpus.text(rid)[:120]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from collections import Counter
+
+import pandas as pd
+
+from Corpus_query import INPUT_FILE, CACHE_DIR, load_corpus, dataset_fingerprint, standardize_body, record_themes, \
+    record_countries
+from Dataset_prep import normalize_text, text_hash, assign_clusters
+
+# --- Configuration ---
+STORE_FILE = 'Data/UHRI_snapshots.sqlite'   # All stored snapshots of the prepared corpus
+# Source ID columns of the UHRI export, used as the record key when present (first present wins);
+# otherwise a record is keyed by its normalized text, publication date and affected countries
+KEY_FIELDS = ['Id', 'ID', 'Recommendation Id', 'RecommendationId', 'Annotation Id', 'AnnotationId']
+# Fields the diff reports on separately; other changes are reported as 'edited'
+THEMES_FIELD = 'Themes'
+BODY_FIELD = 'Reccomending Body'
+# Fields derived from the record by Dataset_prep.py; excluded from the stored objects' content hash
+DERIVED_FIELDS = ['Text Hash', 'Cluster ID', 'Cluster Size']
+
+SCHEMA = """
+CREATE TABLE snapshots (
+    id INTEGER PRIMARY KEY,            -- ingestion order; snapshots are appended chronologically
+    label TEXT NOT NULL UNIQUE,        -- e.g. '2025-01-01'
+    source TEXT,
+    fingerprint TEXT,                  -- Corpus_query.dataset_fingerprint of the source file
+    n_records INTEGER
+);
+CREATE TABLE objects (
+    hash TEXT PRIMARY KEY,             -- SHA-1 of the record's canonical JSON
+    base TEXT REFERENCES objects(hash),-- NULL: 'data' is the full record; else a field delta on 'base'
+    data BLOB NOT NULL                 -- zlib-compressed JSON
+) WITHOUT ROWID;
+CREATE TABLE versions (
+    record_key TEXT NOT NULL,
+    object TEXT NOT NULL REFERENCES objects(hash),
+    first_snapshot INTEGER NOT NULL REFERENCES snapshots(id),
+    last_snapshot INTEGER REFERENCES snapshots(id)    -- NULL while the version is in the latest snapshot
+);
+CREATE INDEX versions_key ON versions(record_key, first_snapshot);
+CREATE INDEX versions_live ON versions(last_snapshot);
+"""
+# Added after the first stores were created, so it is also created on connecting to an existing store
+ORDER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS record_order (
+    snapshot INTEGER PRIMARY KEY REFERENCES snapshots(id),
+    keys BLOB NOT NULL                 -- zlib-compressed JSON list of the record keys in corpus order
+);
+"""
+
+
+# ----------------------------------------------------------------------
+# Record keys and objects
+# ----------------------------------------------------------------------
+def natural_key(record):
+    """Key of a record without a source ID: its normalized text, publication date and countries."""
+    parts = [text_hash(normalize_text(record.get('Text', ''))), str(record.get('Document Publication Date') or ''),
+             '|'.join(sorted(record_countries(record)))]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def record_keys(records, key_fields=KEY_FIELDS):
+    """
+    Stable key of every record: the first source ID field present, else the
+    natural key; repeats of a key are numbered in corpus order.
+    """
+    seen = Counter()
+    keys = []
+    for r in records:
+        source_id = next((r[f] for f in key_fields if r.get(f) not in (None, '')), None)
+        k = f'id:{source_id}' if source_id is not None else natural_key(r)
+        keys.append(f'{k}#{seen[k]}')
+        seen[k] += 1
+    return keys
+
+
+def canonical(record):
+    content = {k: v for k, v in record.items() if k not in DERIVED_FIELDS}
+    return json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def object_hash(record):
+    return hashlib.sha1(canonical(record).encode('utf-8')).hexdigest()
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+
+def field_delta(base, record):
+    """Fields of 'record' that differ from 'base' ('set') and fields it drops ('unset')."""
+    return {'set': {k: v for k, v in record.items() if k not in base or base[k] != v},
+            'unset': [k for k in base if k not in record]}
+
+
+def apply_delta(base, delta):
+    record = {k: v for k, v in base.items() if k not in delta['unset']}
+    record.update(delta['set'])
+    return record
+
+
+# ----------------------------------------------------------------------
+# Store
+# ----------------------------------------------------------------------
+def connect(path=STORE_FILE, create=False):
+    """Connection to the snapshot store; with create=True a missing store is initialized."""
+    if not os.path.exists(path):
+        if not create:
+            raise FileNotFoundError(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+    else:
+        conn = sqlite3.connect(path)
+    conn.executescript(ORDER_SCHEMA)
+    return conn
+
+
+def snapshots(conn):
+    """Stored snapshots in ingestion order."""
+    return pd.read_sql_query("SELECT id, label, source, n_records FROM snapshots ORDER BY id", conn)
+
+
+def snapshot_id(conn, label):
+    row = conn.execute("SELECT id FROM snapshots WHERE label = ?", (label,)).fetchone()
+    if row is None:
+        raise KeyError(f"No snapshot '{label}'")
+    return row[0]
+
+
+def add_snapshot(conn, records, label, source=None, fingerprint=None):
+    """
+    Append 'records' as snapshot 'label'. Records whose content is unchanged
+    since the previous snapshot only keep their open version row (nothing is
+    written); a changed record closes its version and opens a new one whose
+    object is stored once per content hash, as a field delta on the record's
+    first full object when that is smaller. The record keys are stored in
+    corpus order so the snapshot can be exported as ingested. Returns a
+    Counter of unchanged / changed / added / removed records.
+    """
+    if fingerprint is not None:
+        row = conn.execute("SELECT label FROM snapshots WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row:
+            raise ValueError(f"This dataset is already stored as snapshot '{row[0]}'")
+    prev = conn.execute("SELECT MAX(id) FROM snapshots").fetchone()[0]
+    sid = (prev or 0) + 1
+    # Open versions of the previous snapshot: key -> (rowid, object, full base object)
+    live = {k: (rowid, obj, base) for rowid, k, obj, base in conn.execute("""
+        SELECT v.rowid, v.record_key, v.object, COALESCE(o.base, o.hash)
+        FROM versions v JOIN objects o ON o.hash = v.object WHERE v.last_snapshot IS NULL""")}
+
+    keys = record_keys(records)
+    stats = Counter()
+    new_versions, new_objects, closed = [], {}, []
+    for key, r in zip(keys, records):
+        h = object_hash(r)
+        old = live.pop(key, None)
+        if old is not None and old[1] == h:
+            stats['unchanged'] += 1
+            continue
+        if old is not None:
+            closed.append(old[0])
+            stats['changed'] += 1
+        else:
+            stats['added'] += 1
+        new_versions.append((key, h, sid))
+        if h in new_objects or conn.execute("SELECT 1 FROM objects WHERE hash = ?", (h,)).fetchone():
+            continue
+        content = json.loads(canonical(r))
+        full = _pack(content)
+        if old is not None:
+            base_hash = old[2]
+            delta = _pack(field_delta(load_object(conn, base_hash), content))
+            if len(delta) < len(full):
+                new_objects[h] = (h, base_hash, delta)
+                continue
+        new_objects[h] = (h, None, full)
+    closed.extend(rowid for rowid, _, _ in live.values())
+    stats['removed'] = len(live)
+
+    with conn:
+        conn.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)", (sid, label, source, fingerprint, len(records)))
+        conn.execute("INSERT INTO record_order VALUES (?, ?)", (sid, _pack(keys)))
+        conn.executemany("INSERT INTO objects VALUES (?, ?, ?)", new_objects.values())
+        conn.executemany("UPDATE versions SET last_snapshot = ? WHERE rowid = ?", [(prev, rowid) for rowid in closed])
+        conn.executemany("INSERT INTO versions VALUES (?, ?, ?, NULL)", new_versions)
+    return stats
+
+
+def load_object(conn, h):
+    """The record stored under content hash 'h' (derived fields excluded)."""
+    base, data = conn.execute("SELECT base, data FROM objects WHERE hash = ?", (h,)).fetchone()
+    if base is None:
+        return _unpack(data)
+    return apply_delta(load_object(conn, base), _unpack(data))
+
+
+def _live(sid):
+    """Versions in snapshot 'sid' (record_key, object)."""
+    return ("SELECT record_key, object FROM versions WHERE first_snapshot <= ? "
+            "AND (last_snapshot IS NULL OR last_snapshot >= ?)", (sid, sid))
+
+
+def snapshot_records(conn, label):
+    """
+    Records of snapshot 'label' in the order they were ingested (objects shared
+    by several records are decoded once); snapshots stored before the order was
+    recorded list unchanged records first. The derived DERIVED_FIELDS are not stored.
+    """
+    sid = snapshot_id(conn, label)
+    sql, params = _live(sid)
+    versions = conn.execute(sql + " ORDER BY rowid", params).fetchall()
+    row = conn.execute("SELECT keys FROM record_order WHERE snapshot = ?", (sid,)).fetchone()
+    if row is not None:
+        objects = dict(versions)
+        versions = [(k, objects[k]) for k in _unpack(row[0])]
+    cache = {}
+    for _, h in versions:
+        if h not in cache:
+            cache[h] = load_object(conn, h)
+        yield dict(cache[h])
+
+
+# ----------------------------------------------------------------------
+# Diffs
+# ----------------------------------------------------------------------
+def changed_keys(conn, old, new):
+    """
+    Key joins between the versions of two snapshots: (key, object) of the added
+    and removed records and (key, old object, new object) of the changed ones.
+    """
+    a, b = snapshot_id(conn, old), snapshot_id(conn, new)
+    sql_a, params_a = _live(a)
+    sql_b, params_b = _live(b)
+    with_sql = f"WITH va AS ({sql_a}), vb AS ({sql_b}) "
+    params = params_a + params_b
+    added = conn.execute(with_sql + """
+        SELECT vb.record_key, vb.object FROM vb LEFT JOIN va ON va.record_key = vb.record_key
+        WHERE va.record_key IS NULL""", params).fetchall()
+    removed = conn.execute(with_sql + """
+        SELECT va.record_key, va.object FROM va LEFT JOIN vb ON vb.record_key = va.record_key
+        WHERE vb.record_key IS NULL""", params).fetchall()
+    changed = conn.execute(with_sql + """
+        SELECT va.record_key, va.object, vb.object FROM va JOIN vb ON vb.record_key = va.record_key
+        WHERE va.object <> vb.object""", params).fetchall()
+    return added, removed, changed
+
+
+def diff(conn, old, new):
+    """
+    What changed between snapshots 'old' and 'new' (labels):
+      - 'added' / 'removed': records only in one of them,
+      - 'reclassified': records whose theme set changed (themes added / removed),
+      - 're-attributed': records whose recommending body changed,
+      - 'edited': records with other changed fields.
+    Only records that differ are decoded. Returns a dict of DataFrames.
+    """
+    added, removed, changed = changed_keys(conn, old, new)
+
+    def rows_for(pairs):
+        rows = []
+        for k, h in pairs:
+            r = load_object(conn, h)
+            rows.append({'record_key': k, 'Year': r.get('Year'), BODY_FIELD: r.get(BODY_FIELD),
+                         THEMES_FIELD: r.get(THEMES_FIELD), 'Text': r.get('Text')})
+        return pd.DataFrame(rows, columns=['record_key', 'Year', BODY_FIELD, THEMES_FIELD, 'Text'])
+
+    reclassified, reattributed, edited = [], [], []
+    for k, h_old, h_new in changed:
+        r_old, r_new = load_object(conn, h_old), load_object(conn, h_new)
+        t_old, t_new = set(record_themes(r_old)), set(record_themes(r_new))
+        if t_old != t_new:
+            reclassified.append({'record_key': k, 'Year': r_new.get('Year'),
+                                 'themes added': '\n'.join(sorted(t_new - t_old)),
+                                 'themes removed': '\n'.join(sorted(t_old - t_new))})
+        if r_old.get(BODY_FIELD) != r_new.get(BODY_FIELD):
+            reattributed.append({'record_key': k, 'Year': r_new.get('Year'),
+                                 'old body': r_old.get(BODY_FIELD), 'new body': r_new.get(BODY_FIELD),
+                                 'old standard': standardize_body(r_old.get(BODY_FIELD)),
+                                 'new standard': standardize_body(r_new.get(BODY_FIELD))})
+        other = sorted(f for f in set(r_old) | set(r_new)
+                       if f not in (THEMES_FIELD, BODY_FIELD) and r_old.get(f) != r_new.get(f))
+        if other:
+            edited.append({'record_key': k, 'Year': r_new.get('Year'), 'fields': ', '.join(other)})
+
+    return {
+        'added': rows_for(added),
+        'removed': rows_for(removed),
+        'reclassified': pd.DataFrame(reclassified, columns=['record_key', 'Year', 'themes added', 'themes removed']),
+        're-attributed': pd.DataFrame(reattributed, columns=['record_key', 'Year', 'old body', 'new body',
+                                                             'old standard', 'new standard']),
+        'edited': pd.DataFrame(edited, columns=['record_key', 'Year', 'fields']),
+    }
+
+
+def storage_stats(conn):
+    """Stored objects (full / delta), their compressed size and the total records over all snapshots."""
+    full, delta, size = conn.execute("""
+        SELECT SUM(base IS NULL), SUM(base IS NOT NULL), SUM(LENGTH(data)) FROM objects""").fetchone()
+    total = conn.execute("SELECT COALESCE(SUM(n_records), 0) FROM snapshots").fetchone()[0]
+    versions = conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+    return {'snapshots': len(snapshots(conn)), 'records (all snapshots)': total, 'versions': versions,
+            'full objects': full or 0, 'delta objects': delta or 0, 'compressed bytes': size or 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned store of corpus snapshots with diff queries.")
+    parser.add_argument('--store', default=STORE_FILE, help="Snapshot store file")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_add = sub.add_parser('add', help="Append a prepared JSON corpus as a new snapshot")
+    p_add.add_argument('label', help="Snapshot label, e.g. 2025-01-01")
+    p_add.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    sub.add_parser('list', help="List stored snapshots and storage use")
+    p_diff = sub.add_parser('diff', help="What changed between two snapshots")
+    p_diff.add_argument('old')
+    p_diff.add_argument('new')
+    p_diff.add_argument('--show', type=int, default=10, help="Rows shown per change type")
+    p_diff.add_argument('--excel', help="Write every change table to this Excel file")
+    p_export = sub.add_parser('export', help="Write a snapshot back out as a prepared JSON corpus")
+    p_export.add_argument('label')
+    p_export.add_argument('output')
+    args = parser.parse_args()
+
+    try:
+        conn = connect(args.store, create=args.command == 'add')
+    except FileNotFoundError:
+        print(f"File not found: {args.store}")
+        return
+
+    if args.command == 'add':
+        try:
+            records = load_corpus(args.input)
+            fingerprint = dataset_fingerprint(args.input, CACHE_DIR)
+            stats = add_snapshot(conn, records, args.label, args.input, fingerprint)
+        except FileNotFoundError:
+            print(f"File not found: {args.input}")
+            return
+        except json.JSONDecodeError:
+            print("JSON decode error.")
+            return
+        except (ValueError, sqlite3.IntegrityError) as e:
+            print(f"Snapshot not added: {e}")
+            return
+        print(f"Snapshot '{args.label}': " + ", ".join(f"{n} {k}" for k, n in stats.items()))
+    elif args.command == 'list':
+        print(snapshots(conn).to_string(index=False))
+        for k, v in storage_stats(conn).items():
+            print(f"{k}: {v}")
+    elif args.command == 'diff':
+        try:
+            changes = diff(conn, args.old, args.new)
+        except KeyError as e:
+            print(e.args[0])
+            return
+        with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.max_colwidth', 60):
+            for kind, df in changes.items():
+                print(f"\n{kind}: {len(df)}")
+                if len(df):
+                    print(df.drop(columns=['Text'], errors='ignore').head(args.show).to_string(index=False))
+        if args.excel:
+            with pd.ExcelWriter(args.excel, engine="openpyxl") as writer:
+                for kind, df in changes.items():
+                    df.to_excel(writer, sheet_name=kind, index=False)
+            print(f"\nChanges saved to '{args.excel}'.")
+    elif args.command == 'export':
+        try:
+            records = list(snapshot_records(conn, args.label))
+        except KeyError as e:
+            print(e.args[0])
+            return
+        assign_clusters(records)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=4)
+        print(f"{len(records)} records saved to '{args.output}'.")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
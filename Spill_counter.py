@@ -0,0 +1,159 @@
+import heapq
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+# --- Configuration ---
+MAX_ENTRIES = 1_000_000   # Distinct (partition, key) entries held in memory before spilling
+CHUNK = 65536             # Rows read from a spilled run at a time while merging
+
+KEY_MASK = (1 << 64) - 1
+# Keys are non-negative ints below 2**128 (e.g. n-grams up to order 4 from Text_pipeline.encode_ngram);
+# 'seq' orders a partition's keys by when they were first counted
+RUN_DTYPE = np.dtype([('part', '<u4'), ('hi', '<u8'), ('lo', '<u8'), ('count', '<i8'), ('seq', '<u8')])
+
+
+class SpillCounter:
+    """
+    A set of Counters (one per partition, e.g. per treaty body) with bounded
+    memory. Counts accumulate in memory until 'max_entries' distinct entries
+    are held; they are then written to disk as a run sorted by (partition, key)
+    and memory is cleared. Results stream a k-way merge of the runs, so the
+    final top-k needs memory for k entries per partition, not for the corpus.
+    Keys keep their first-seen order, so ties rank as in Counter.most_common.
+    Use as a context manager so the runs are deleted afterwards.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, spill_dir=None):
+        self.max_entries = max_entries
+        self.spill_dir = spill_dir
+        self.parts = []          # partition labels, indexed by partition id
+        self._part_index = {}
+        self._mem = {}           # partition id -> Counter
+        self._size = 0
+        self._base = 0           # first-seen sequence number of the current in-memory window
+        self._runs = []
+        self._tmp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Delete the spilled runs."""
+        if self._tmp:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+        self._tmp = None
+        self._runs = []
+
+    @property
+    def n_runs(self):
+        return len(self._runs)
+
+    def update(self, part, keys):
+        """Count every key in 'keys' (iterable of ints) for partition 'part'."""
+        p = self._part_index.get(part)
+        if p is None:
+            p = self._part_index[part] = len(self.parts)
+            self.parts.append(part)
+        ctr = self._mem.get(p)
+        if ctr is None:
+            ctr = self._mem[p] = Counter()
+        before = len(ctr)
+        ctr.update(keys)
+        self._size += len(ctr) - before
+        if self._size >= self.max_entries:
+            self.spill()
+
+    def spill(self):
+        """Write the in-memory counts as one sorted run and clear them."""
+        if not self._size:
+            return
+        run = np.empty(self._size, dtype=RUN_DTYPE)
+        a = 0
+        for p, ctr in self._mem.items():
+            b = a + len(ctr)
+            run['part'][a:b] = p
+            run['hi'][a:b] = np.fromiter((k >> 64 for k in ctr), dtype=np.uint64, count=len(ctr))
+            run['lo'][a:b] = np.fromiter((k & KEY_MASK for k in ctr), dtype=np.uint64, count=len(ctr))
+            run['count'][a:b] = np.fromiter(ctr.values(), dtype=np.int64, count=len(ctr))
+            # A Counter iterates in insertion order, i.e. first-seen order within this window
+            run['seq'][a:b] = self._base + np.arange(len(ctr), dtype=np.uint64)
+            a = b
+        run.sort(order=['part', 'hi', 'lo'])
+        if self._tmp is None:
+            self._tmp = tempfile.mkdtemp(prefix='spill_counter_', dir=self.spill_dir)
+        path = os.path.join(self._tmp, f'run_{len(self._runs):05d}.npy')
+        np.save(path, run)
+        self._runs.append(path)
+        self._base += self._size
+        self._mem = {}
+        self._size = 0
+
+    def _iter_run(self, path):
+        run = np.load(path, mmap_mode='r')
+        for a in range(0, len(run), CHUNK):
+            block = run[a:a + CHUNK]
+            for p, hi, lo, cnt, seq in zip(block['part'].tolist(), block['hi'].tolist(), block['lo'].tolist(),
+                                           block['count'].tolist(), block['seq'].tolist()):
+                yield p, (hi << 64) | lo, cnt, seq
+
+    def _iter_memory(self):
+        for p in sorted(self._mem):
+            ctr = self._mem[p]
+            seq = {key: self._base + i for i, key in enumerate(ctr)}
+            for key in sorted(ctr):
+                yield p, key, ctr[key], seq[key]
+
+    def _merged(self):
+        """(partition id, key, count, first-seen seq) over all runs and memory, sorted by partition id then key."""
+        streams = [self._iter_run(path) for path in self._runs] + [self._iter_memory()]
+        cur = None
+        for p, key, cnt, seq in heapq.merge(*streams):
+            if cur is not None and cur[0] == p and cur[1] == key:
+                cur[2] += cnt
+                cur[3] = min(cur[3], seq)
+                continue
+            if cur is not None:
+                yield cur
+            cur = [p, key, cnt, seq]
+        if cur is not None:
+            yield cur
+
+    def items(self):
+        """Yield (partition, key, count) over all runs and memory, sorted by partition id then key."""
+        for p, key, cnt, _ in self._merged():
+            yield self.parts[p], key, cnt
+
+    def most_common(self, k):
+        """
+        {partition: Counter of its k most frequent keys, most frequent first}; ties
+        are broken by first-seen order as in Counter.most_common, whenever runs
+        were spilled.
+        """
+        if not self._runs:
+            return {self.parts[p]: Counter(dict(ctr.most_common(k))) for p, ctr in self._mem.items()}
+        heaps = {}
+        for p, key, cnt, seq in self._merged():
+            heap = heaps.setdefault(p, [])
+            if len(heap) < k:
+                heapq.heappush(heap, (cnt, -seq, key))
+            elif (cnt, -seq) > heap[0][:2]:
+                heapq.heapreplace(heap, (cnt, -seq, key))
+        return {self.parts[p]: Counter({key: cnt for cnt, _, key in sorted(heap, reverse=True)})
+                for p, heap in sorted(heaps.items())}
+
+    def counters(self):
+        """{partition: full Counter} in first-seen key order. Unbounded; use most_common() for large inputs."""
+        if not self._runs:
+            return {self.parts[p]: ctr for p, ctr in self._mem.items()}
+        entries = {}
+        for p, key, cnt, seq in self._merged():
+            entries.setdefault(p, []).append((seq, key, cnt))
+        return {self.parts[p]: Counter({key: cnt for _, key, cnt in sorted(rows)})
+                for p, rows in sorted(entries.items())}
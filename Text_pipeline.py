@@ -0,0 +1,435 @@
+import argparse
+import json
+import os
+import re
+import string
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+ID_BITS = 32                       # Bits per token ID inside an encoded n-gram key
+ID_MASK = (1 << ID_BITS) - 1
+# 'nltk' is word_tokenize (needs the punkt models); 'regex' is the built-in tokenizer (no NLTK data
+# needed), which splits sentences at every '. ' where Punkt knows abbreviations
+TOKENIZER = 'nltk'
+SHARDS_PER_WORKER = 4              # Shards handed to each worker process by count_bigrams_parallel
+
+_STOPWORDS = {}
+_WORKER_FILTERS = {}               # filter spec -> TokenFilter, rebuilt once per worker process
+
+
+# NLTK's English stopword list, used when the NLTK stopwords corpus is not installed
+ENGLISH_STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves
+he him his himself she she's her hers herself it it's its itself they them their theirs themselves
+what which who whom this that that'll these those am is are was were be been being have has had having
+do does did doing a an the and but if or because as until while of at by for with about against between
+into through during before after above below to from up down in out on off over under again further then
+once here there when where why how all any both each few more most other some such no nor not only own
+same so than too very s t can will just don don't should should've now d ll m o re ve y ain aren aren't
+couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't ma mightn
+mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't weren weren't won won't
+wouldn wouldn't
+""".split())
+
+# NLTK's French and Spanish stopword lists
+FRENCH_STOPWORDS = frozenset("""
+au aux avec ce ces dans de des du elle en et eux il ils je la le les leur lui ma mais me même mes moi mon ne
+nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous c d j
+l à m n s t y été étée étées étés étant étante étants étantes suis es est sommes êtes sont serai seras sera
+serons serez seront serais serait serions seriez seraient étais était étions étiez étaient fus fut fûmes
+fûtes furent sois soit soyons soyez soient fusse fusses fût fussions fussiez fussent ayant ayante ayantes
+ayants eu eue eues eus ai as avons avez ont aurai auras aura aurons aurez auront aurais aurait aurions auriez
+auraient avais avait avions aviez avaient eut eûmes eûtes eurent aie aies ait ayons ayez aient eusse eusses
+eût eussions eussiez eussent
+""".split())
+
+SPANISH_STOPWORDS = frozenset("""
+de la que el en y a los del se las por un para con no una su al lo como más pero sus le ya o este sí porque
+esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos durante todos uno les ni
+contra otros ese eso ante ellos e esto mí antes algunos qué unos yo otro otras otra él tanto esa estos mucho
+quienes nada muchos cual poco ella estar estas algunas algo nosotros mi mis tú te ti tu tus ellas nosotras
+vosotros vosotras os mío mía míos mías tuyo tuya tuyos tuyas suyo suya suyos suyas nuestro nuestra nuestros
+nuestras vuestro vuestra vuestros vuestras esos esas estoy estás está estamos estáis están esté estés
+estemos estéis estén estaré estarás estará estaremos estaréis estarán estaría estarías estaríamos
+estaríais estarían estaba estabas estábamos estabais estaban estuve estuviste estuvo estuvimos
+estuvisteis estuvieron estuviera estuvieras estuviéramos estuvierais estuvieran estuviese estuvieses
+estuviésemos estuvieseis estuviesen estando estado estada estados estadas estad he has ha hemos habéis han
+haya hayas hayamos hayáis hayan habré habrás habrá habremos habréis habrán habría habrías habríamos
+habríais habrían había habías habíamos habíais habían hube hubiste hubo hubimos hubisteis hubieron hubiera
+hubieras hubiéramos hubierais hubieran hubiese hubieses hubiésemos hubieseis hubiesen habiendo habido
+habida habidos habidas soy eres es somos sois son sea seas seamos seáis sean seré serás será seremos
+seréis serán sería serías seríamos seríais serían era eras éramos erais eran fui fuiste fue fuimos
+fuisteis fueron fuera fueras fuéramos fuerais fueran fuese fueses fuésemos fueseis fuesen sintiendo
+sentido sentida sentidos sentidas siente sentid tengo tienes tiene tenemos tenéis tienen tenga tengas
+tengamos tengáis tengan tendré tendrás tendrá tendremos tendréis tendrán tendría tendrías tendríamos
+tendríais tendrían tenía tenías teníamos teníais tenían tuve tuviste tuvo tuvimos tuvisteis tuvieron
+tuviera tuvieras tuviéramos tuvierais tuvieran tuviese tuvieses tuviésemos tuvieseis tuviesen teniendo
+tenido tenida tenidos tenidas tened
+""".split())
+
+# Language code -> (NLTK stopwords corpus name, bundled copy)
+STOPWORD_LISTS = {
+    'en': ('english', ENGLISH_STOPWORDS),
+    'fr': ('french', FRENCH_STOPWORDS),
+    'es': ('spanish', SPANISH_STOPWORDS),
+}
+
+
+def stopwords(language='en'):
+    """NLTK stopwords of a language (or the bundled copy if NLTK's data is missing), loaded once per process."""
+    name, bundled = STOPWORD_LISTS[language]
+    if name not in _STOPWORDS:
+        try:
+            from nltk.corpus import stopwords as nltk_stopwords
+            _STOPWORDS[name] = frozenset(nltk_stopwords.words(name))
+        except (ImportError, LookupError):
+            _STOPWORDS[name] = bundled
+    return _STOPWORDS[name]
+
+
+def english_stopwords():
+    """NLTK English stopwords (or the bundled copy if NLTK's data is missing), loaded once per process."""
+    return stopwords('en')
+
+
+# ----------------------------------------------------------------------
+# Tokenizers: lowercased text -> tokens
+# ----------------------------------------------------------------------
+# One compiled regex reproducing NLTK's word_tokenize (Treebank rules) on
+# lowercased text: brackets, quotes and most symbols are split off, commas and
+# colons unless a digit follows, clitics ('s, n't, ...) and contractions
+# (cannot, gonna, ...) are separated, and hyphens and inner periods stay in
+# the word. A period followed by a space is taken as a sentence end, where
+# NLTK's Punkt model also knows abbreviations ('etc.' stays one token there).
+_SPLIT = ";@#$%&?!*()\\[\\]{}<>«»“”‘’„`\"\u2012-\u2015"
+_END = rf"(?=[\s{_SPLIT}]|[,:](?!\d)|\.(?:[.\s)\]}}'»”’]|$)|--|''|$)"
+_CLITIC = rf"(?:n't|'(?:s|m|d|ll|re|ve)?){_END}"
+_TOKEN_RE = re.compile(rf"""
+    \.{{2,}}                                   # ellipses
+  | --                                         # double dashes
+  | `+ | ''                                    # opening / closing double quotes
+  | [{_SPLIT}]
+  | [,:](?!\d)
+  | (?<!\w)'(?=\w)(?!(?:re|ve|ll|m|t|s|d|n)\b) # opening single quote
+  | {_CLITIC}
+  | \b(?:can(?=not\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)|more(?='n\b)|d(?='ye\b)|wan(?=na\s))
+  | (?:(?!{_CLITIC})(?:[^\s{_SPLIT},:.'-]|[,:](?=\d)|\.(?![.\s)\]}}'»”’]|$)|(?<!')'(?!')|-(?!-)))+
+  | \.                                         # sentence-final period
+""", re.VERBOSE)
+# Double quotes become `` when opening (after a space or bracket, or '"' at a
+# sentence start) and '' otherwise
+_DOUBLE_QUOTE = re.compile(r"""(^|[.?!][)\]}'»”’]*\s+|[ (\[{<])?("|'')""")
+
+
+def _double_quote(m):
+    lead, quote = m.group(1), m.group(2)
+    if lead is None:
+        return " '' "
+    if lead[:1] in ('', '.', '?', '!'):
+        return lead + (' `` ' if quote == '"' else " '' ")
+    return lead + ' `` '
+
+
+def regex_tokenize(text):
+    """Lowercase and tokenize 'text' like nltk_tokenize(), with a single regex scan."""
+    text = text.lower()
+    if '"' in text or "''" in text:
+        text = _DOUBLE_QUOTE.sub(_double_quote, text)
+    return _TOKEN_RE.findall(text)
+
+
+def nltk_tokenize(text):
+    """Lowercase and tokenize 'text' with NLTK's word_tokenize."""
+    from nltk.tokenize import word_tokenize
+    return word_tokenize(text.lower())
+
+
+TOKENIZERS = {'regex': regex_tokenize, 'nltk': nltk_tokenize}
+
+# French / Spanish: elided articles and pronouns (l', d', qu', jusqu', ...) become
+# their own token without the apostrophe, as in NLTK's stopword lists; hyphenated
+# words stay one token and any other symbol is split off
+_ROMANCE_RE = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu|quoiqu)(?=['’]\w)|\w+(?:-\w+)*|[^\w\s'’]")
+
+
+def romance_tokenize(text):
+    """Lowercase and tokenize French or Spanish 'text' with a single regex scan."""
+    return _ROMANCE_RE.findall(text.lower())
+
+
+# Tokenizers of the languages not handled by the TOKENIZER backend (see Multilingual.py)
+LANGUAGE_TOKENIZERS = {'fr': romance_tokenize, 'es': romance_tokenize}
+
+
+def tokenize(text, language=None):
+    """Lowercased tokens of 'text' from the TOKENIZER backend, or from the tokenizer of 'language'."""
+    fn = LANGUAGE_TOKENIZERS.get(language)
+    return fn(text) if fn is not None else TOKENIZERS[TOKENIZER](text)
+
+
+def compare_tokenizers(texts, reference='nltk', candidate='regex', keep=str.isalpha, max_examples=5):
+    """
+    Tokenize 'texts' with two backends and compare the tokens each keeps
+    ('keep' defaults to the alphabetic ones, all the n-gram analyses use;
+    None compares every token). Returns the number of texts and reference
+    tokens, the indices of texts whose tokens differ, up to 'max_examples'
+    (index, reference tokens, candidate tokens) and tokens/second per backend.
+    """
+    texts = [t for t in texts if isinstance(t, str)]
+    outputs, speed = {}, {}
+    for name in (reference, candidate):
+        fn = TOKENIZERS[name]
+        start = time.perf_counter()
+        outputs[name] = [fn(t) for t in texts]
+        elapsed = time.perf_counter() - start
+        speed[name] = sum(len(toks) for toks in outputs[name]) / elapsed if elapsed else float('inf')
+    mismatches, examples = [], []
+    for i, (a, b) in enumerate(zip(outputs[reference], outputs[candidate])):
+        if keep is not None:
+            a, b = [t for t in a if keep(t)], [t for t in b if keep(t)]
+        if a != b:
+            mismatches.append(i)
+            if len(examples) < max_examples:
+                examples.append((i, a, b))
+    return {'texts': len(texts), 'tokens': sum(len(toks) for toks in outputs[reference]),
+            'mismatches': mismatches, 'examples': examples, 'tokens_per_second': speed}
+
+
+def load_filter_config(path):
+    """
+    Load a topic's filter configuration (JSON) with the optional keys
+    'custom_stop' (list of tokens), 'target_keywords' (list of tokens),
+    'bigrams_to_ignore' (list of [token, token] pairs) and 'languages'
+    ({language code: the same keys}, added for records in that language).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        cfg = json.load(f)
+
+    def lists(c):
+        return {
+            'custom_stop': list(c.get('custom_stop', [])),
+            'target_keywords': list(c.get('target_keywords', [])),
+            'bigrams_to_ignore': [tuple(bg) for bg in c.get('bigrams_to_ignore', [])],
+        }
+    config = lists(cfg)
+    config['languages'] = {lang: lists(c) for lang, c in cfg.get('languages', {}).items()}
+    return config
+
+
+def language_filter_config(config, languages):
+    """The lists of a filter configuration plus the additions of each of 'languages'."""
+    merged = {k: list(config[k]) for k in ('custom_stop', 'target_keywords', 'bigrams_to_ignore')}
+    for lang in languages:
+        for k, values in config.get('languages', {}).get(lang, {}).items():
+            merged[k].extend(v for v in values if v not in merged[k])
+    return merged
+
+
+class Vocabulary:
+    """
+    Token <-> integer ID mapping shared by one or more TokenFilters.
+    Every filter registered on the vocabulary classifies a token exactly once,
+    when the token is first added.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.tokens = []
+        self.filters = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def add(self, token):
+        i = self.index.get(token)
+        if i is None:
+            i = len(self.tokens)
+            self.index[token] = i
+            self.tokens.append(token)
+            for f in self.filters:
+                f.classify(i, token)
+        return i
+
+    def encode(self, tokens):
+        """Map tokens to IDs, adding unseen tokens."""
+        index = self.index
+        return [index[t] if t in index else self.add(t) for t in tokens]
+
+    def decode_ngram(self, key, n=2):
+        """Turn an encoded n-gram key back into a tuple of tokens."""
+        return tuple(self.tokens[(key >> (ID_BITS * (n - 1 - k))) & ID_MASK] for k in range(n))
+
+    def decode_counter(self, ctr, n=2):
+        """Turn a Counter of encoded n-gram keys into a Counter of token tuples."""
+        return Counter({self.decode_ngram(key, n): cnt for key, cnt in ctr.items()})
+
+
+def encode_ngram(ids):
+    key = 0
+    for i in ids:
+        key = (key << ID_BITS) | i
+    return key
+
+
+class TokenFilter:
+    """
+    Stopword / punctuation / ignore-list filtering compiled into integer ID sets.
+    Each token is classified once against the vocabulary; the hot loops then only
+    do indexed lookups and integer set membership tests.
+
+    'drop_punctuation' reproduces the historical `t not in string.punctuation`
+    test (any substring of string.punctuation is dropped); 'alpha_only' keeps
+    tokens with `str.isalpha()`.
+    """
+
+    def __init__(self, vocab, stop_words=(), ignore_bigrams=(), target_words=(),
+                 alpha_only=False, drop_punctuation=False):
+        self.vocab = vocab
+        self.stop_words = frozenset(stop_words)
+        self.ignore_bigrams = tuple(tuple(bg) for bg in ignore_bigrams)
+        self.target_words = frozenset(target_words)
+        self.alpha_only = alpha_only
+        self.drop_punctuation = drop_punctuation
+        self.drop = bytearray()      # drop[id] == 1 if the token is filtered out
+        self.target = bytearray()    # target[id] == 1 if the token is a target keyword
+        vocab.filters.append(self)
+        for i, t in enumerate(vocab.tokens):
+            self.classify(i, t)
+        self.ignore_pairs = frozenset(encode_ngram(vocab.encode(bg)) for bg in ignore_bigrams)
+
+    def spec(self):
+        """Picklable settings from which an equivalent filter can be rebuilt in another process."""
+        return (tuple(sorted(self.stop_words)), self.ignore_bigrams, tuple(sorted(self.target_words)),
+                self.alpha_only, self.drop_punctuation)
+
+    def classify(self, i, token):
+        dropped = (token in self.stop_words
+                   or (self.alpha_only and not token.isalpha())
+                   or (self.drop_punctuation and token in string.punctuation))
+        self.drop.append(1 if dropped else 0)
+        self.target.append(1 if token in self.target_words else 0)
+
+    def ids(self, tokens):
+        """Encode tokens and return the IDs of those that pass the filter."""
+        drop = self.drop
+        return [i for i in self.vocab.encode(tokens) if not drop[i]]
+
+    def tokens(self, tokens):
+        """Filter tokens and return them as strings."""
+        vocab_tokens = self.vocab.tokens
+        return [vocab_tokens[i] for i in self.ids(tokens)]
+
+    def bigrams(self, ids):
+        """Encoded bigram keys of consecutive IDs, minus the ignore list."""
+        ignore = self.ignore_pairs
+        pairs = [(a << ID_BITS) | b for a, b in zip(ids, ids[1:])]
+        return [p for p in pairs if p not in ignore] if ignore else pairs
+
+    def target_bigrams(self, ids):
+        """Encoded bigram keys in which at least one token is a target keyword."""
+        target = self.target
+        return [(a << ID_BITS) | b for a, b in zip(ids, ids[1:]) if target[a] or target[b]]
+
+    def ngrams(self, ids, n=2):
+        """Encoded n-gram keys of consecutive IDs (the ignore list applies to bigrams)."""
+        if n == 2:
+            return self.bigrams(ids)
+        return [encode_ngram(ids[k:k + n]) for k in range(len(ids) - n + 1)]
+
+
+# ----------------------------------------------------------------------
+# Map-reduce bigram counting
+# ----------------------------------------------------------------------
+def _count_shard(spec, method, tokenize, shard):
+    """
+    Worker side: count the bigrams of one shard of (partitions, text) items.
+    Token IDs are private to the worker's vocabulary, so its tokens are
+    returned with the counts for the parent to translate.
+    """
+    token_filter = _WORKER_FILTERS.get(spec)
+    if token_filter is None:
+        stop_words, ignore_bigrams, target_words, alpha_only, drop_punctuation = spec
+        token_filter = _WORKER_FILTERS[spec] = TokenFilter(
+            Vocabulary(), stop_words, ignore_bigrams, target_words, alpha_only, drop_punctuation)
+    extract = getattr(token_filter, method)
+    counts = {}
+    for parts, text in shard:
+        keys = extract(token_filter.ids(tokenize(text)))
+        for part in parts:
+            ctr = counts.get(part)
+            if ctr is None:
+                ctr = counts[part] = Counter()
+            ctr.update(keys)
+    return token_filter.vocab.tokens, counts
+
+
+def _translate_counts(vocab, tokens, counts):
+    """Re-key a worker's bigram counts to the IDs of 'vocab' (first-seen order is kept)."""
+    ids = vocab.encode(tokens)
+    return {part: Counter({(ids[key >> ID_BITS] << ID_BITS) | ids[key & ID_MASK]: cnt
+                           for key, cnt in ctr.items()})
+            for part, ctr in counts.items()}
+
+
+def count_bigrams_parallel(token_filter, items, tokenize, method='bigrams', n_workers=None, n_shards=None):
+    """
+    Map-reduce bigram counting. 'items' is a sequence of (partitions, text)
+    pairs; every bigram of a text counts once for each of its partitions.
+    The items are cut into contiguous shards that worker processes tokenize,
+    filter with a copy of 'token_filter' and count ('method' is 'bigrams' or
+    'target_bigrams'). Yields one {partition: Counter} per shard, in shard
+    order and keyed by token_filter.vocab IDs, so merging them in sequence
+    gives the same counts, in the same first-seen order, as the serial loop.
+    'tokenize' must be picklable (a module-level function).
+    """
+    items = list(items)
+    n_workers = n_workers or os.cpu_count() or 1
+    n_shards = max(1, min(len(items), n_shards or n_workers * SHARDS_PER_WORKER))
+    bounds = [len(items) * k // n_shards for k in range(n_shards + 1)]
+    shards = [items[a:b] for a, b in zip(bounds, bounds[1:])]
+    spec = token_filter.spec()
+    with ProcessPoolExecutor(n_workers) as pool:
+        for tokens, counts in pool.map(_count_shard, [spec] * len(shards), [method] * len(shards),
+                                       [tokenize] * len(shards), shards):
+            yield _translate_counts(token_filter.vocab, tokens, counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two tokenizer backends on the corpus texts.")
+    parser.add_argument('--input', default='Data/UHRI_Internet.json', help="Prepared JSON corpus")
+    parser.add_argument('--reference', default='nltk', choices=sorted(TOKENIZERS))
+    parser.add_argument('--candidate', default='regex', choices=sorted(TOKENIZERS))
+    parser.add_argument('--all-tokens', action='store_true', help="Compare every token, not only alphabetic ones")
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            texts = [r.get('Text') for r in json.load(f)]
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+    try:
+        result = compare_tokenizers(texts, args.reference, args.candidate, None if args.all_tokens else str.isalpha)
+    except LookupError as e:
+        print(f"NLTK data missing: {e}")
+        return
+
+    speed = result['tokens_per_second']
+    print(f"{result['texts']} texts, {result['tokens']} tokens")
+    for name in (args.reference, args.candidate):
+        print(f"  {name:>6}: {speed[name]:,.0f} tokens/s")
+    print(f"Speed-up: {speed[args.candidate] / speed[args.reference]:.1f}x")
+    print(f"Texts with different {'tokens' if args.all_tokens else 'alphabetic tokens'}: "
+          f"{len(result['mismatches'])} ({len(result['mismatches']) / max(result['texts'], 1):.2%})")
+    for i, a, b in result['examples']:
+        diff = next((k for k, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+        print(f"  text {i}: {args.reference} {a[max(diff - 3, 0):diff + 4]} vs {args.candidate} {b[max(diff - 3, 0):diff + 4]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from Corpus_query import INPUT_FILE, load_corpus, dataset_fingerprint, parse_years
+from Corpus_mmap import OUTPUT_DIR as MMAP_DIR, MappedCorpus, build_mmap_corpus, is_current
+from Trend_engine import theme_matrix, safe_divide, START_YR, END_YR
+
+# --- Configuration ---
+SLICE_FIELDS = ['year', 'body']
+MIN_COUNT = 5     # Minimum co-occurrences for a pair to be listed
+
+
+def slice_codes(corpus, by=('body', 'year'), start_yr=START_YR, end_yr=END_YR):
+    """
+    Slice code of every record for the fields in 'by' (-1 for records outside
+    the year range) and the label tuple of every slice code.
+    """
+    for f in by:
+        if f not in SLICE_FIELDS:
+            raise ValueError(f"Unknown slice field '{f}', expected one of {SLICE_FIELDS}")
+    year = np.asarray(corpus.year, dtype=np.int64)
+    keep = (year >= start_yr) & (year <= end_yr)
+    values = {'year': list(range(start_yr, end_yr + 1)), 'body': list(corpus.bodies)}
+    digits = {'year': year - start_yr, 'body': np.asarray(corpus.body, dtype=np.int64)}
+
+    code = np.zeros(len(year), dtype=np.int64)
+    for f in by:
+        code = code * len(values[f]) + digits[f]
+    code[~keep] = -1
+    shape = [len(values[f]) for f in by]
+    grids = np.unravel_index(np.arange(int(np.prod(shape))), shape) if by else ()
+    labels = list(zip(*[[values[f][k] for k in g] for f, g in zip(by, grids)])) if by else [()]
+    return code, labels
+
+
+def cooccurrence(corpus, by=('body', 'year'), start_yr=START_YR, end_yr=END_YR):
+    """
+    Theme co-occurrence counts of every slice in one sparse product.
+    Each tagged theme of a record is placed in its slice's block of columns
+    (Y = records x slices*themes), so Y.T @ X stacks the (themes x themes)
+    matrices of all slices. C[s, a, b] is the number of records of slice s
+    tagged with both a and b; the diagonal holds the records per theme.
+    Returns (C, records per slice, slice labels).
+    """
+    code, labels = slice_codes(corpus, by, start_yr, end_yr)
+    n_slices, n_themes = len(labels), len(corpus.themes)
+    keep = np.flatnonzero(code >= 0)
+    X = sparse.csr_matrix(theme_matrix(corpus)[keep], dtype=np.int64)
+    code = code[keep]
+
+    Xc = X.tocoo()
+    Y = sparse.csr_matrix((Xc.data, (Xc.row, code[Xc.row] * n_themes + Xc.col)),
+                          shape=(X.shape[0], n_slices * n_themes))
+    C = (Y.T @ X).toarray().reshape(n_slices, n_themes, n_themes)
+    n = np.bincount(code, minlength=n_slices)
+    return C, n, labels
+
+
+def lift(C, n):
+    """P(a, b) / (P(a) P(b)) per slice; NaN where a theme does not occur."""
+    d = np.diagonal(C, axis1=1, axis2=2).astype(float)
+    return safe_divide(C * n[:, None, None].astype(float), d[:, :, None] * d[:, None, :])
+
+
+def pmi(C, n, normalized=False):
+    """
+    Pointwise mutual information log2(lift) per slice, or with normalized=True
+    NPMI = PMI / -log2 P(a, b) in [-1, 1]. NaN where the pair never co-occurs.
+    """
+    L = lift(C, n)
+    out = np.full(L.shape, np.nan)
+    np.log2(L, out=out, where=C > 0)
+    if normalized:
+        p_ab = safe_divide(C, n[:, None, None])
+        out = safe_divide(out, -np.log2(np.where(C > 0, p_ab, np.nan)))
+        out[(C > 0) & (C == n[:, None, None])] = 1.0   # P(a, b) = 1: perfect co-occurrence
+        out = np.clip(out, -1.0, 1.0)
+    return out
+
+
+def pair_table(C, n, labels, themes, by=('body', 'year'), min_count=MIN_COUNT, theme=None):
+    """
+    One row per slice and theme pair (a < b) co-occurring at least 'min_count'
+    times, with its count, lift, PMI and NPMI. 'theme' keeps the pairs of one theme.
+    """
+    L, P, NP = lift(C, n), pmi(C, n), pmi(C, n, normalized=True)
+    n_themes = len(themes)
+    upper = np.triu(np.ones((n_themes, n_themes), dtype=bool), k=1)
+    sel = (C >= max(min_count, 1)) & upper[None, :, :]
+    if theme is not None:
+        k = themes.index(theme) if theme in themes else -1
+        pair_mask = np.zeros((n_themes, n_themes), dtype=bool)
+        if k >= 0:
+            pair_mask[k, :] = pair_mask[:, k] = True
+        sel &= pair_mask[None, :, :]
+    s, a, b = np.nonzero(sel)
+    df = pd.DataFrame({f.capitalize(): [labels[i][j] for i in s] for j, f in enumerate(by)})
+    df['Theme A'] = [themes[i] for i in a]
+    df['Theme B'] = [themes[i] for i in b]
+    df['Count'] = C[s, a, b]
+    df['Records'] = n[s]
+    df['Lift'] = L[s, a, b].round(2)
+    df['PMI'] = P[s, a, b].round(3)
+    df['NPMI'] = NP[s, a, b].round(3)
+    return df.sort_values(['NPMI', 'Count'], ascending=False).reset_index(drop=True)
+
+
+def pair_series(C, n, labels, themes, theme_a, theme_b, by=('body', 'year')):
+    """Count, records, lift and NPMI of one theme pair in every slice (slices without records dropped)."""
+    a, b = themes.index(theme_a), themes.index(theme_b)
+    df = pd.DataFrame(labels, columns=[f.capitalize() for f in by])
+    df['Count'] = C[:, a, b]
+    df['Records'] = n
+    df['Lift'] = lift(C, n)[:, a, b].round(2)
+    df['NPMI'] = pmi(C, n, normalized=True)[:, a, b].round(3)
+    return df[df['Records'] > 0].reset_index(drop=True)
+
+
+def get_corpus(input_file=INPUT_FILE, mmap_dir=MMAP_DIR):
+    """Mapped corpus for 'input_file', rebuilt when the source changed."""
+    if not is_current(mmap_dir, input_file):
+        build_mmap_corpus(load_corpus(input_file), mmap_dir, dataset_fingerprint(input_file))
+    return MappedCorpus(mmap_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Theme co-occurrence (counts, lift, PMI) per body and/or year.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--by', nargs='*', default=['body', 'year'], choices=SLICE_FIELDS,
+                        help="Slice fields (none = whole corpus)")
+    parser.add_argument('--years', type=parse_years, default=(START_YR, END_YR), help="Year range, e.g. 2010-2024")
+    parser.add_argument('--theme', help="Only pairs with this theme")
+    parser.add_argument('--with', dest='other', help="With --theme: the series of one pair over all slices")
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT, help="Minimum co-occurrences per pair")
+    parser.add_argument('--top', type=int, default=30, help="Rows to print")
+    args = parser.parse_args()
+
+    try:
+        corpus = get_corpus(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+
+    by = tuple(args.by)
+    C, n, labels = cooccurrence(corpus, by, args.years[0], args.years[1])
+    themes = list(corpus.themes)
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.max_colwidth', 60):
+        if args.theme and args.other:
+            missing = [t for t in (args.theme, args.other) if t not in themes]
+            if missing:
+                print(f"Unknown theme(s): {missing}")
+                return
+            print(pair_series(C, n, labels, themes, args.theme, args.other, by).to_string())
+            return
+        df = pair_table(C, n, labels, themes, by, args.min_count, args.theme)
+        print(f"{len(df)} slice x theme pairs with at least {args.min_count} co-occurrences.")
+        print(df.head(args.top).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import matplotlib
+matplotlib.use("Agg")  # Charts are only ever rendered to PNG
+import General_trends
+import UPR_analysis
+import ESC_CCPR_analysis
+import Bodies_groups
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Corpus_query
+from Corpus_view import CorpusView
+
+# --- Configuration ---
+INPUT_FILE = "../Data/UHRI_Internet.json"
+HOST = "127.0.0.1"
+PORT = 8050
+MAX_INFLIGHT = 16        # Requests computed at the same time; the rest wait for a slot
+QUEUE_TIMEOUT = 2.0      # Seconds a request may wait for a slot before it gets 503
+REQUEST_TIMEOUT = 30.0   # Seconds a computation may take before the request gets 504
+COMPUTE_THREADS = 4      # Threads running aggregations off the event loop
+CHART_WORKERS = 2        # Processes rendering charts
+MAX_CACHED_RESULTS = 256 # Memoized aggregations kept (least recently used are dropped)
+MAX_YEAR_SPAN = 100      # Longest start..end range a request may ask for
+CHARTS = ["trends", "upr", "esc-ccpr", "bigrams"]
+
+
+class BadRequest(Exception):
+    pass
+
+
+def int_param(params, name, default):
+    try:
+        return int(params.get(name, [default])[0])
+    except ValueError:
+        raise BadRequest(f"Parameter '{name}' must be an integer")
+
+
+def year_params(params, start, end):
+    """(start, end) years of a request, checked to form a non-empty range of at most MAX_YEAR_SPAN years."""
+    start, end = int_param(params, "start", start), int_param(params, "end", end)
+    if start > end:
+        raise BadRequest("Parameter 'start' must not be after 'end'")
+    if end - start >= MAX_YEAR_SPAN:
+        raise BadRequest(f"At most {MAX_YEAR_SPAN} years can be requested")
+    return start, end
+
+
+class WarmCorpus:
+    """
+    The prepared corpus loaded once, with the per-script record subsets
+    precomputed and the last 'max_results' aggregations memoized by their parameters.
+    """
+
+    def __init__(self, records, max_results=MAX_CACHED_RESULTS):
+        self.records = records
+        view = CorpusView(records)
+        self.upr_records = view.where(lambda r: r.get("Reccomending Body", "").strip() == "- UPR")
+        self.non_upr_records = view.exclude(lambda r: r.get("Reccomending Body", "") == "- UPR")
+        self.bg_records = view.derive("Reccomending Body", Bodies_groups.mechanism_body)
+        self._results = OrderedDict()
+        self.max_results = max_results
+        # Full bigram counters are shared by every 'top' value
+        self._tb_bigrams = None
+        self._tb_lock = threading.Lock()
+
+    async def get(self, loop, executor, key, fn, *args):
+        """Return a memoized result; concurrent identical requests share one computation."""
+        fut = self._results.get(key)
+        if fut is None:
+            fut = self._results[key] = loop.run_in_executor(executor, fn, *args)
+            # Dropping an entry only forgets it; requests awaiting it still get the result
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+        try:
+            return await asyncio.shield(fut)
+        except Exception:
+            # Forget the failure, unless the entry was evicted and recomputed since
+            if self._results.get(key) is fut:
+                del self._results[key]
+            raise
+
+    def trends(self, start_yr, end_yr):
+        tgt, tot = General_trends.count_frequencies(self.records, start_yr, end_yr)
+        yrs = list(range(start_yr, end_yr + 1))
+        return {
+            "years": yrs,
+            "target": [tgt.get(y, 0) for y in yrs],
+            "total": [tot.get(y, 0) for y in yrs],
+            "share": [round(tgt.get(y, 0) / tot[y] * 100, 1) if tot.get(y) else 0 for y in yrs],
+        }
+
+    def upr(self, theme, start_yr, end_yr):
+        counts = UPR_analysis.count_theme_by_year(self.upr_records, theme, range(start_yr, end_yr + 1))
+        yrs = list(counts)
+        return {
+            "theme": theme,
+            "years": yrs,
+            "theme_count": [counts[y]["theme"] for y in yrs],
+            "total": [counts[y]["total"] for y in yrs],
+            "share": [round(counts[y]["theme"] / counts[y]["total"] * 100, 1) if counts[y]["total"] else 0
+                      for y in yrs],
+        }
+
+    def esc_ccpr(self, start_yr, end_yr):
+        yearly = ESC_CCPR_analysis.count_esc_ccpr_by_year(self.non_upr_records, range(start_yr, end_yr + 1))
+        yrs = list(yearly)
+        return {
+            "years": yrs,
+            "categories": {cat: [yearly[y][cat] for y in yrs] for cat in ESC_CCPR_analysis.esc_ccpr_subthemes},
+        }
+
+    def bigrams(self, top_n):
+        with self._tb_lock:
+            if self._tb_bigrams is None:
+                self._tb_bigrams = Bodies_groups.count_treaty_body_bigrams(self.bg_records)
+        return {tb: [[" ".join(bg), cnt] for bg, cnt in ctr.most_common(top_n)]
+                for tb, ctr in self._tb_bigrams.items()}
+
+    def query(self, spec):
+        return Corpus_query.execute_query(spec, self.records)
+
+
+# ----------------------------------------------------------------------
+# Chart rendering (runs in worker processes)
+# ----------------------------------------------------------------------
+def render_chart(name, data):
+    """Draw chart 'name' from already aggregated 'data' and return PNG bytes."""
+    import matplotlib.pyplot as plt
+    if name in ("trends", "upr", "esc-ccpr") and not data["years"]:
+        raise BadRequest("No data available for plotting.")
+    if name == "trends":
+        yrs = data["years"]
+        fig = General_trends.plot_stacked_bar(Counter(dict(zip(yrs, data["target"]))),
+                                              Counter(dict(zip(yrs, data["total"]))), yrs[0], yrs[-1])
+    elif name == "upr":
+        counts = {y: {"theme": t, "total": n} for y, t, n in zip(data["years"], data["theme_count"], data["total"])}
+        fig = UPR_analysis.plot_theme_share(counts)
+    elif name == "esc-ccpr":
+        yrs = data["years"]
+        yearly = {y: {cat: vals[i] for cat, vals in data["categories"].items()} for i, y in enumerate(yrs)}
+        fig = ESC_CCPR_analysis.plot_esc_ccpr_stacked_bar(yearly, range(yrs[0], yrs[-1] + 1))
+    elif name == "bigrams":
+        tb_bigrams = {tb: Counter({tuple(bg.split(" ")): cnt for bg, cnt in top}) for tb, top in data.items()}
+        top_n = max((len(top) for top in data.values()), default=10)
+        fig = Bodies_groups.plot_treaty_body_bigrams(
+            Bodies_groups.treaty_body_bigrams_dataframe(tb_bigrams, top_n), top_n=top_n)
+    else:
+        raise BadRequest(f"Unknown chart '{name}'")
+    if fig is None:
+        raise BadRequest("No data available for plotting.")
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+# ----------------------------------------------------------------------
+# HTTP handling
+# ----------------------------------------------------------------------
+class AnalyticsService:
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.compute_pool = ThreadPoolExecutor(COMPUTE_THREADS)
+        self.chart_pool = ProcessPoolExecutor(CHART_WORKERS)
+        self.slots = asyncio.Semaphore(MAX_INFLIGHT)
+
+    async def aggregate(self, name, params):
+        """Dispatch an aggregation endpoint; returns a JSON-serializable result."""
+        loop = asyncio.get_running_loop()
+        c = self.corpus
+        if name == "trends":
+            args = year_params(params, 2006, 2024)
+            return await c.get(loop, self.compute_pool, ("trends",) + args, c.trends, *args)
+        if name == "upr":
+            args = (params.get("theme", [UPR_analysis.theme])[0],) + year_params(params, 2010, 2024)
+            return await c.get(loop, self.compute_pool, ("upr",) + args, c.upr, *args)
+        if name == "esc-ccpr":
+            args = year_params(params, 2007, 2024)
+            return await c.get(loop, self.compute_pool, ("esc-ccpr",) + args, c.esc_ccpr, *args)
+        if name == "bigrams":
+            top_n = int_param(params, "top", 10)
+            return await c.get(loop, self.compute_pool, ("bigrams", top_n), c.bigrams, top_n)
+        if name == "query":
+            try:
+                spec = Corpus_query.make_query(
+                    years=Corpus_query.parse_years(params["years"][0]) if "years" in params else None,
+                    bodies=params.get("bodies"), themes=params.get("themes"),
+                    keywords=params.get("keywords", [None])[0], group_by=params.get("group_by"),
+                    metric=params.get("metric", ["counts"])[0],
+                    n=int_param(params, "n", 2), top=int_param(params, "top", 10),
+                    unique=params.get("unique", ["0"])[0].lower() in ("1", "true"))
+            except ValueError as e:
+                raise BadRequest(str(e))
+            key = ("query", json.dumps(spec, sort_keys=True))
+            return await c.get(loop, self.compute_pool, key, c.query, spec)
+        return None
+
+    async def dispatch(self, path, params):
+        """Return (status, content type, body bytes) for a GET request."""
+        if path == "/health":
+            return 200, "application/json", b'{"status": "ok"}'
+        if path.startswith("/charts/") and path.endswith(".png"):
+            name = path[len("/charts/"):-len(".png")]
+            if name not in CHARTS:
+                return 404, "text/plain", b"Unknown chart"
+            data = await self.aggregate(name, params)
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self.chart_pool, render_chart, name, data)
+            return 200, "image/png", png
+        data = await self.aggregate(path.strip("/"), params)
+        if data is None:
+            return 404, "text/plain", b"Not found"
+        return 200, "application/json", json.dumps(data).encode("utf-8")
+
+    async def handle_client(self, reader, writer):
+        status, ctype, body = 400, "text/plain", b"Bad request"
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), QUEUE_TIMEOUT)
+            # Drain headers; requests have no body
+            while (await asyncio.wait_for(reader.readline(), QUEUE_TIMEOUT)) not in (b"\r\n", b"\n", b""):
+                pass
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            if method != "GET":
+                status, body = 405, b"Method not allowed"
+            else:
+                url = urlsplit(target)
+                try:
+                    await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    status, body = 503, b"Server busy, retry later"
+                else:
+                    try:
+                        status, ctype, body = await asyncio.wait_for(
+                            self.dispatch(url.path, parse_qs(url.query)), REQUEST_TIMEOUT)
+                    finally:
+                        self.slots.release()
+        except BadRequest as e:
+            status, ctype, body = 400, "text/plain", str(e).encode("utf-8")
+        except asyncio.TimeoutError:
+            status, ctype, body = 504, "text/plain", b"Request timed out"
+        except ValueError:
+            status, ctype, body = 400, "text/plain", b"Bad request"
+        except Exception as e:
+            status, ctype, body = 500, "text/plain", f"Error: {e}".encode("utf-8")
+
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}[status]
+        head = (f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        try:
+            writer.write(head.encode("latin-1") + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def warm_up(self):
+        """Compute the default aggregations so the first requests are served from memory."""
+        for name in CHARTS:
+            await self.aggregate(name, {})
+
+    def shutdown(self):
+        self.compute_pool.shutdown(wait=False)
+        self.chart_pool.shutdown(wait=False)
+
+
+async def serve(corpus, host=HOST, port=PORT):
+    service = AnalyticsService(corpus)
+    server = await asyncio.start_server(service.handle_client, host, port)
+    try:
+        await service.warm_up()
+        print(f"Serving on http://{host}:{port} "
+              f"(/trends, /upr, /esc-ccpr, /bigrams, /query, /charts/<name>.png)")
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+
+
+def main():
+    try:
+        with open(INPUT_FILE, "r", encoding="utf-8") as f:
+            corpus = WarmCorpus(json.load(f))
+    except FileNotFoundError:
+        print(f"File not found: {INPUT_FILE}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+    print(f"Loaded {len(corpus.records)} records.")
+    try:
+        asyncio.run(serve(corpus))
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,55 @@
-import string
+import os
+import sys
 import random
 import seaborn as sns
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-from nltk.util import bigrams
+import matplotlib
+import numpy as np
 from collections import Counter
-from nltk.corpus import stopwords
-import nltk
 import pandas as pd
-from nltk.tokenize import word_tokenize
 import json
-
-# Load JSON data
-with open('../Data/UHRI_Internet.json', 'r', encoding='utf-8') as f:
-    data_records = json.load(f)
+from functools import partial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Text_pipeline import (Vocabulary, TokenFilter, english_stopwords, load_filter_config, language_filter_config,
+                           count_bigrams_parallel, tokenize)
+from Multilingual import record_languages, lexicon, language_stopwords, route
+from Distinctive_terms import distinctive_terms
+from Spill_counter import SpillCounter
+from Corpus_view import CorpusView
+from Concordance import get_index, kwic_line
+from Render import scatter_points, legend_handles
+
+INPUT_FILE = '../Data/UHRI_Internet.json'
+# Stopwords, target keywords and ignored bigrams for this topic
+FILTER_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'filters.json')
+COUNT_UNIQUE = False  # Count bigrams once per recommendation cluster (see Dataset_prep.py)
+# 'frequency' ranks treaty-body bigrams by raw counts (minus bigrams_to_ignore);
+# 'log-odds' ranks them by how distinctive they are against the other mechanisms
+BIGRAM_RANKING = 'frequency'
+# Distinct bigram counts held in memory per aggregation before spilling sorted runs to disk
+MAX_COUNTER_ENTRIES = 1_000_000
+# Worker processes tokenizing and counting bigram shards (0 = count serially in this process)
+BIGRAM_WORKERS = 0
+# Example contexts printed for each top group bigram, served from the concordance index (0 = none)
+CONTEXT_EXAMPLES = 0
+MMAP_DIR = '../Data/UHRI_Internet.mmap'
+KWIC_DIR = '../Data/UHRI_Internet.kwic'
 
 # Minimal processing: normalize "Reccomending Body" for special procedures
-def process_record(item):
-    comm = item.get('Reccomending Body', '')
+def mechanism_body(record):
+    comm = record.get('Reccomending Body', '')
     if any(comm.startswith(pref) for pref in ['- IE', '- WG', '- SR']):
-        item['Reccomending Body'] = '- Special Procedures'
-    return item
+        return '- Special Procedures'
+    return comm
 
-data_records = [process_record(r) for r in data_records]
+# Load JSON data as lazy views (the records themselves are never modified)
+def load_records(path=INPUT_FILE):
+    data_records = CorpusView.from_json(path).derive('Reccomending Body', mechanism_body)
 
-# Filter out UPR
-data_records_small = [r for r in data_records if r.get("Reccomending Body", "") != "- UPR"]
+    # Filter out UPR
+    data_records_small = data_records.exclude(lambda r: r.get("Reccomending Body", "") == "- UPR")
+    return data_records, data_records_small
 
 # ----------------------------------------------------------------------
 # Count frequency of concerned groups per year
@@ -40,17 +64,52 @@ related_words = [
     ("older","elderly")
 ]
 
-yearly_word_counts = {y: Counter() for y in range(2006, 2025)}
-for r in data_records:
-    y = r.get("Year")
-    txt = r.get("Text","").lower()
-    if y and txt:
-        toks = word_tokenize(txt)
-        for grp in related_words:
-            yearly_word_counts[y][grp] += sum(toks.count(word) for word in grp)
+# The groups' words in the corpus' other languages, keyed by the English tuple that
+# identifies the group; records are matched with the words of their 'Languages'
+related_words_by_language = {
+    "fr": dict(zip(related_words, [
+        ("enfant","enfants","adolescent","adolescents","adolescente","adolescentes","mineur","mineurs"),
+        ("migrant","migrants","migrante","migrantes","asile","réfugié","réfugiés","réfugiée","réfugiées",
+         "apatride","apatrides"),
+        ("femmes","femme","fille","filles"),
+        ("handicap","handicapées","handicapés"),
+        ("autochtone","autochtones","minorité","minorités","ethnique","ethniques","racial","raciale","raciales"),
+        ("reculées","isolées","rural","rurale","rurales","ruraux","pauvre","pauvres"),
+        ("âgées","âgés","aînés")
+    ])),
+    "es": dict(zip(related_words, [
+        ("niño","niños","infancia","adolescente","adolescentes","menores"),
+        ("migrante","migrantes","asilo","refugiado","refugiados","refugiada","refugiadas","apátrida","apátridas"),
+        ("mujeres","mujer","niña","niñas"),
+        ("discapacidad","discapacidades"),
+        ("indígena","indígenas","minoría","minorías","étnica","étnicas","étnico","étnicos","racial","raciales"),
+        ("remotas","remotos","rural","rurales","pobre","pobres"),
+        ("mayores","ancianos","ancianas")
+    ])),
+}
+_group_words = {}
+
+def group_words(grp, languages=("en",)):
+    """Words of a concerned group for a record in 'languages' (see Multilingual.record_languages)."""
+    words = _group_words.get((grp, languages))
+    if words is None:
+        by_language = {"en": grp, **{lang: groups[grp] for lang, groups in related_words_by_language.items()}}
+        words = _group_words[(grp, languages)] = lexicon(by_language, languages)
+    return words
 
 years_2006_2024 = range(2006, 2025)
-plot_data = {grp: [yearly_word_counts[yr][grp] for yr in years_2006_2024] for grp in related_words}
+
+def count_concerned_groups(data_records, years=years_2006_2024):
+    yearly_word_counts = {y: Counter() for y in years}
+    for r in data_records:
+        y = r.get("Year")
+        txt = r.get("Text","").lower()
+        if y in yearly_word_counts and txt:
+            langs = record_languages(r)
+            toks = tokenize(txt, langs[0])
+            for grp in related_words:
+                yearly_word_counts[y][grp] += sum(toks.count(word) for word in group_words(grp, langs))
+    return yearly_word_counts
 
 short_labels = {
     ("child","children","adolescent","adolescents","juvenile","juveniles"): "Children",
@@ -62,157 +121,241 @@ short_labels = {
     ("older","elderly"): "Older/Elderly"
 }
 
-# Broken-axis plot setup
-fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(15, 8))
-break_point = 200
-upper_limit = max((max(val) for val in plot_data.values()), default=0)
-
-# First (upper) subplot
-for grp, counts in plot_data.items():
-    ax1.plot(years_2006_2024, counts, marker='o', linestyle='', label=short_labels[grp])
-ax1.set_ylim(break_point, upper_limit + 200)
-ax1.spines['bottom'].set_visible(False)
-ax1.xaxis.tick_top()
-ax1.tick_params(labeltop=False)
-ax1.yaxis.tick_right()
-
-# Second (lower) subplot
-for grp, counts in plot_data.items():
-    ax2.plot(years_2006_2024, counts, marker='o', linestyle='', label=short_labels[grp])
-ax2.set_ylim(0, break_point)
-ax2.spines['top'].set_visible(False)
-ax2.xaxis.tick_bottom()
-ax2.yaxis.tick_right()
-
-# Diagonal breaks
-d = .015
-kwargs = dict(transform=ax1.transAxes, color='k', clip_on=False)
-ax1.plot((-d,+d), (-d,+d), **kwargs)
-ax1.plot((1-d,1+d), (-d,+d), **kwargs)
-kwargs.update(transform=ax2.transAxes)
-ax2.plot((-d,+d),(1-d,1+d),**kwargs)
-ax2.plot((1-d,1+d),(1-d,1+d),**kwargs)
-
-# Customize x-axis (tick every 2 years)
-xticks_ = list(range(2006, 2025, 2))
-ax1.set_xticks(xticks_)
-ax2.set_xticks(xticks_)
-ax1.set_xticklabels(xticks_)
-ax2.set_xticklabels(xticks_)
-
-ax1.legend(loc='upper left', bbox_to_anchor=(0,1))
-fig.suptitle('Frequency of Concerned Groups Mentions (2006–2024)', fontsize=16)
-plt.xlabel('Year')
-plt.ylabel('Number of mentions')
-plt.show()
+def plot_concerned_groups(yearly_word_counts, years=years_2006_2024):
+    plot_data = {grp: [yearly_word_counts[yr][grp] for yr in years] for grp in related_words}
+
+    # Broken-axis plot setup
+    fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True, figsize=(15, 8))
+    break_point = 200
+    upper_limit = max((max(val) for val in plot_data.values()), default=0)
+
+    # First (upper) subplot
+    for grp, counts in plot_data.items():
+        ax1.plot(years, counts, marker='o', linestyle='', label=short_labels[grp])
+    ax1.set_ylim(break_point, upper_limit + 200)
+    ax1.spines['bottom'].set_visible(False)
+    ax1.xaxis.tick_top()
+    ax1.tick_params(labeltop=False)
+    ax1.yaxis.tick_right()
+
+    # Second (lower) subplot
+    for grp, counts in plot_data.items():
+        ax2.plot(years, counts, marker='o', linestyle='', label=short_labels[grp])
+    ax2.set_ylim(0, break_point)
+    ax2.spines['top'].set_visible(False)
+    ax2.xaxis.tick_bottom()
+    ax2.yaxis.tick_right()
+
+    # Diagonal breaks
+    d = .015
+    kwargs = dict(transform=ax1.transAxes, color='k', clip_on=False)
+    ax1.plot((-d,+d), (-d,+d), **kwargs)
+    ax1.plot((1-d,1+d), (-d,+d), **kwargs)
+    kwargs.update(transform=ax2.transAxes)
+    ax2.plot((-d,+d),(1-d,1+d),**kwargs)
+    ax2.plot((1-d,1+d),(1-d,1+d),**kwargs)
+
+    # Customize x-axis (tick every 2 years)
+    xticks_ = list(range(years[0], years[-1] + 1, 2))
+    ax1.set_xticks(xticks_)
+    ax2.set_xticks(xticks_)
+    ax1.set_xticklabels(xticks_)
+    ax2.set_xticklabels(xticks_)
+
+    ax1.legend(loc='upper left', bbox_to_anchor=(0,1))
+    fig.suptitle(f'Frequency of Concerned Groups Mentions ({years[0]}–{years[-1]})', fontsize=16)
+    plt.xlabel('Year')
+    plt.ylabel('Number of mentions')
+    return fig
 
 # ----------------------------------------------------------------------
 # Count documents by body/year (2007–2024)
 # ----------------------------------------------------------------------
 years_2007_2024 = range(2007, 2025)
-bodies_small = [d.get("Reccomending Body", "Unknown") for d in data_records_small]
-unique_bodies = set(bodies_small)
-doc_counts_by_body = {body: [0]*len(years_2007_2024) for body in unique_bodies}
 
-for r in data_records_small:
-    y = r.get("Year")
-    b = r.get("Reccomending Body","Unknown")
-    if y in years_2007_2024:
-        doc_counts_by_body[b][y - 2007] += 1
+def count_docs_by_body(data_records_small, years=years_2007_2024):
+    bodies_small = [d.get("Reccomending Body", "Unknown") for d in data_records_small]
+    unique_bodies = set(bodies_small)
+    doc_counts_by_body = {body: [0]*len(years) for body in unique_bodies}
+
+    for r in data_records_small:
+        y = r.get("Year")
+        b = r.get("Reccomending Body","Unknown")
+        if y in years:
+            doc_counts_by_body[b][y - years[0]] += 1
 
-# Calculate total docs each year
-yearly_counts = [sum(vals) for vals in zip(*doc_counts_by_body.values())]
+    # Calculate total docs each year
+    yearly_counts = [sum(vals) for vals in zip(*doc_counts_by_body.values())]
+    return doc_counts_by_body, yearly_counts
 
 # ----------------------------------------------------------------------
 # Scatterplot: each recommending body vs. total
 # ----------------------------------------------------------------------
 
-fig, ax1 = plt.subplots(figsize=(10, 6))
-ax2 = ax1.twinx()
-
-# 1) Gather all points we'll plot (count >= 10)
-all_points = []
-for body, counts in doc_counts_by_body.items():
-    if body != "UPR":
-        for i, c in enumerate(counts):
-            if c >= 10:
-                x_val = years_2007_2024[i]
-                all_points.append((body, x_val, c))
-
-# 2) Create a colormap with as many distinct colors as there are points
-cmap = cm.get_cmap("nipy_spectral", len(all_points))
-
-# 3) For the legend, we'll track the first time each body is plotted
-legend_assigned = set()
-
-for idx, (body, x_val, count_val) in enumerate(all_points):
-    # Small y-jitter
-    y_jitter = count_val + random.uniform(-0.5, 0.5)
-    # Label for legend only once per body
-    label_ = body if body not in legend_assigned else None
-    if label_:
-        legend_assigned.add(body)
-    # Plot each point with a unique color from the colormap
-    ax1.scatter(
-        x_val,
-        y_jitter,
-        color=cmap(idx),  # each point gets a different color
-        marker="o",
-        alpha=0.7,
-        label=label_
-    )
-
-# 4) Secondary axis: total counts
-ax2.plot(years_2007_2024, yearly_counts, color="black", linewidth=2, label="Total Recs")
-ax2.tick_params(axis="y", labelcolor="black")
-ax2.set_ylabel("Total number of Internet-related Recommendations (excl. UPR)", fontsize=11)
-
-# 5) Configure axes
-ax1.set_xlim(2006, 2025)
-x_ticks = range(2006, 2026, 2)
-ax1.set_xticks(x_ticks)
-ax1.set_xticklabels(x_ticks, fontsize=10)
-ax1.set_xlabel("Year", fontsize=12)
-ax1.set_ylabel("Counts (>= 10)", fontsize=11)
-ax1.set_title("The Most Active UN Mechanisms in Adopting Internet-related Recommendations  (2007–2024)", fontsize=14)
-
-# 6) Combine legend handles from both axes
-handles1, labels1 = ax1.get_legend_handles_labels()
-handles2, labels2 = ax2.get_legend_handles_labels()
-# Only keep unique legend entries (in case of duplicates)
-combined = dict(zip(labels1, handles1))
-combined.update(dict(zip(labels2, handles2)))
-ax1.legend(combined.values(), combined.keys(), loc="upper left", fontsize=9)
-
-plt.tight_layout()
-plt.show()
+def plot_active_mechanisms(doc_counts_by_body, yearly_counts, years=years_2007_2024, threshold=10):
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+    ax2 = ax1.twinx()
+
+    # 1) Gather all points we'll plot (count >= threshold)
+    all_points = []
+    for body, counts in doc_counts_by_body.items():
+        if body != "UPR":
+            for i, c in enumerate(counts):
+                if c >= threshold:
+                    x_val = years[i]
+                    all_points.append((body, x_val, c))
+
+    # 2) Create a colormap with as many distinct colors as there are points
+    cmap = matplotlib.colormaps["nipy_spectral"].resampled(max(len(all_points), 1))
+    colors = cmap(np.arange(len(all_points)))
+
+    # 3) All points in one collection (each with its own color), with a small y-jitter
+    y_jitter = [count_val + random.uniform(-0.5, 0.5) for _, _, count_val in all_points]
+    scatter_points(ax1, [x_val for _, x_val, _ in all_points], y_jitter, colors, marker="o", alpha=0.7)
+
+    # The legend shows each body once, in the color of its first point
+    first_color = {}
+    for (body, _, _), c in zip(all_points, colors):
+        first_color.setdefault(body, c)
+
+    # 4) Secondary axis: total counts
+    ax2.plot(years, yearly_counts, color="black", linewidth=2, label="Total Recs")
+    ax2.tick_params(axis="y", labelcolor="black")
+    ax2.set_ylabel("Total number of Internet-related Recommendations (excl. UPR)", fontsize=11)
+
+    # 5) Configure axes
+    ax1.set_xlim(years[0] - 1, years[-1] + 1)
+    x_ticks = range(years[0] - 1, years[-1] + 2, 2)
+    ax1.set_xticks(x_ticks)
+    ax1.set_xticklabels(x_ticks, fontsize=10)
+    ax1.set_xlabel("Year", fontsize=12)
+    ax1.set_ylabel(f"Counts (>= {threshold})", fontsize=11)
+    ax1.set_title(f"The Most Active UN Mechanisms in Adopting Internet-related Recommendations  ({years[0]}–{years[-1]})", fontsize=14)
+
+    # 6) Combine legend handles from both axes
+    handles1 = legend_handles(first_color.keys(), first_color.values(), markersize=6, alpha=0.7)
+    labels1 = list(first_color)
+    handles2, labels2 = ax2.get_legend_handles_labels()
+    # Only keep unique legend entries (in case of duplicates)
+    combined = dict(zip(labels1, handles1))
+    combined.update(dict(zip(labels2, handles2)))
+    ax1.legend(combined.values(), combined.keys(), loc="upper left", fontsize=9)
+
+    plt.tight_layout()
+    return fig
 
 # ----------------------------------------------------------------------
 # Bigram Analysis by Concerned Group
 # ----------------------------------------------------------------------
-target_keywords = ["internet","digital","online"]
-custom_stop = ['including','exclusively']
-stop_words = set(stopwords.words('english'))
+filter_config = load_filter_config(FILTER_CONFIG)
+target_keywords = filter_config['target_keywords']
+custom_stop = filter_config['custom_stop']
+bigrams_to_ignore = filter_config['bigrams_to_ignore']
+stop_words = set(english_stopwords())
 stop_words.update(custom_stop)
 
-def clean_and_tokenize(text):
-    return [t for t in nltk.word_tokenize(text.lower())
-            if t not in stop_words and t not in string.punctuation]
-
-group_target_bigrams = {g: Counter() for g in related_words}
-for r in data_records_small:
-    txt = r.get("Text","")
-    if not txt: continue
-    toks = clean_and_tokenize(txt)
-    bgs = list(bigrams(toks))
-    for grp in related_words:
-        if any(w in txt.lower() for w in grp):
-            for bg in bgs:
-                if any(k in bg for k in target_keywords):
-                    group_target_bigrams[grp][bg] += 1
-
-for grp, ctr in group_target_bigrams.items():
-    print(f"Group '{'/'.join(grp)}': {ctr.most_common(10)}")
+# Filters compiled once against a shared vocabulary; bigrams are counted as
+# integer keys and decoded back to (word, word) tuples after counting.
+vocab = Vocabulary()
+punct_filter = TokenFilter(vocab, stop_words, target_words=target_keywords, drop_punctuation=True)
+alpha_filter = TokenFilter(vocab, stop_words, ignore_bigrams=bigrams_to_ignore,
+                           target_words=target_keywords, alpha_only=True)
+
+_language_filters = {("en",): (punct_filter, alpha_filter)}
+
+def language_filters(languages):
+    """
+    (punct_filter, alpha_filter) for records in 'languages': their stopwords and the
+    topic lists with the additions for those languages (filters.json), compiled once
+    against the shared vocabulary. English records use the two filters above.
+    """
+    filters = _language_filters.get(languages)
+    if filters is None:
+        cfg = language_filter_config(filter_config, languages)
+        words = set(language_stopwords(languages)) | set(cfg['custom_stop'])
+        filters = _language_filters[languages] = (
+            TokenFilter(vocab, words, target_words=cfg['target_keywords'], drop_punctuation=True),
+            TokenFilter(vocab, words, ignore_bigrams=cfg['bigrams_to_ignore'],
+                        target_words=cfg['target_keywords'], alpha_only=True))
+    return filters
+
+_plain_filters = {}
+
+def plain_filter(languages):
+    """
+    Stopword-only alpha filter (no ignore list) with the stopwords of every
+    language in 'languages', compiled once per language set against the shared
+    vocabulary: every filter stays registered on the vocabulary for good.
+    """
+    key = tuple(sorted(languages))
+    token_filter = _plain_filters.get(key)
+    if token_filter is None:
+        token_filter = _plain_filters[key] = TokenFilter(vocab, stop_words | language_stopwords(key), alpha_only=True)
+    return token_filter
+
+def clean_and_tokenize(text, languages=("en",)):
+    return language_filters(languages)[0].tokens(tokenize(text, languages[0]))
+
+def first_in_cluster(records):
+    """Keep the first record of every near-duplicate cluster."""
+    seen = set()
+    for i, r in enumerate(records):
+        key = r.get("Cluster ID", i)
+        if key not in seen:
+            seen.add(key)
+            yield r
+
+def partition_bigrams(items, token_filter, method, n_workers=0, language=None):
+    """
+    (partition, bigram keys) for every (partitions, text) item. With n_workers
+    the texts are tokenized and counted in worker processes and each shard's
+    merged Counter comes back instead; both add up to the same counts.
+    """
+    tok = partial(tokenize, language=language)
+    if n_workers:
+        for shard in count_bigrams_parallel(token_filter, items, tok, method, n_workers):
+            yield from shard.items()
+        return
+    extract = getattr(token_filter, method)
+    for parts, txt in items:
+        keys = extract(token_filter.ids(tok(txt)))
+        for part in parts:
+            yield part, keys
+
+def routed_bigrams(items, languages, which, method, n_workers=0):
+    """
+    partition_bigrams() with the items routed by language: the items of each
+    language combination are counted in one batch with that combination's
+    tokenizer and filter ('which': 0 = punct_filter, 1 = alpha_filter).
+    """
+    for langs, idx in route(languages).items():
+        yield from partition_bigrams([items[i] for i in idx], language_filters(langs)[which], method, n_workers,
+                                     langs[0])
+
+def count_group_target_bigrams(data_records_small, unique=False, n_workers=BIGRAM_WORKERS):
+    group_target_bigrams = {g: Counter() for g in related_words}
+    items, languages = [], []
+    for r in (first_in_cluster(data_records_small) if unique else data_records_small):
+        txt = r.get("Text","")
+        if not txt: continue
+        langs = record_languages(r)
+        items.append(([grp for grp in related_words if any(w in txt.lower() for w in group_words(grp, langs))], txt))
+        languages.append(langs)
+    for grp, bgs in routed_bigrams(items, languages, 0, 'target_bigrams', n_workers):
+        group_target_bigrams[grp].update(bgs)
+    return {grp: vocab.decode_counter(ctr) for grp, ctr in group_target_bigrams.items()}
+
+def print_group_contexts(group_target_bigrams, n_examples, top_n=3):
+    """Print the first contexts of each group's top bigrams (non-UPR records mentioning the group)."""
+    index = get_index(INPUT_FILE, MMAP_DIR, KWIC_DIR)
+    bodies = [b for b in index.corpus.bodies if b != "- UPR"]
+    for grp, ctr in group_target_bigrams.items():
+        for bigram, _ in ctr.most_common(top_n):
+            phrase = " ".join(bigram)
+            total, df = index.page(phrase, 0, n_examples, bodies=bodies, group=grp)
+            print(f"\n'{phrase}' ({'/'.join(grp)}): {total} hits")
+            for _, row in df.iterrows():
+                print(kwic_line(row))
 
 # ----------------------------------------------------------------------
 # Color-coded Grid Plots of Bigrams by (Group, Committee)
@@ -227,40 +370,47 @@ grp_map = {
     ("older","elderly"): "Older Persons"
 }
 
-def determine_group(text):
+def determine_group(text, languages=("en",)):
     t = text.lower()
     for words_, gname in grp_map.items():
-        if any(w in t for w in words_):
+        if any(w in t for w in group_words(words_, languages)):
             return gname
     return "Other"
 
-def relevant_bigrams(txt):
-    wds = [w for w in word_tokenize(txt.lower()) if w.isalpha() and w not in stop_words]
-    bg = list(bigrams(wds))
-    return [b for b in bg if any(k in b for k in target_keywords)]
-
-group_committee_bigrams = {}
-for r in data_records_small:
-    t = r.get('Text','')
-    c = r.get('Reccomending Body','Unknown Committee')
-    if c.startswith(('- IE','- SR','- WG')):
-        c = 'Special Procedures'
-    g = determine_group(t)
-    if t:
-        bgs = relevant_bigrams(t)
-        group_committee_bigrams.setdefault((g,c), Counter()).update(bgs)
-
-top_bigrams_gc = {gc: ctr.most_common(10) for gc, ctr in group_committee_bigrams.items()}
-df_list = []
-for (g,c), bgctr in top_bigrams_gc.items():
-    for bg, cnt in bgctr:
-        df_list.append({'Group': g, 'Committee': c, 'Bigram': ' '.join(bg), 'Count': cnt})
-df = pd.DataFrame(df_list)
+def count_group_committee_bigrams(data_records_small, unique=False, top_n=None, max_entries=MAX_COUNTER_ENTRIES,
+                                  n_workers=BIGRAM_WORKERS):
+    """
+    Bigram counts per (group, committee). With 'top_n' only the top_n bigrams
+    of each pair are kept, and memory stays bounded by 'max_entries'.
+    """
+    items, languages = [], []
+    for r in (first_in_cluster(data_records_small) if unique else data_records_small):
+        t = r.get('Text','')
+        c = r.get('Reccomending Body','Unknown Committee')
+        if c.startswith(('- IE','- SR','- WG')):
+            c = 'Special Procedures'
+        if t:
+            langs = record_languages(r)
+            items.append(([(determine_group(t, langs), c)], t))
+            languages.append(langs)
+    with SpillCounter(max_entries) as counts:
+        for gc, bgs in routed_bigrams(items, languages, 1, 'target_bigrams', n_workers):
+            counts.update(gc, bgs)
+        group_committee_bigrams = counts.most_common(top_n) if top_n else counts.counters()
+    return {gc: vocab.decode_counter(ctr) for gc, ctr in group_committee_bigrams.items()}
+
+def group_bigrams_dataframe(group_committee_bigrams, top_n=10):
+    top_bigrams_gc = {gc: ctr.most_common(top_n) for gc, ctr in group_committee_bigrams.items()}
+    df_list = []
+    for (g,c), bgctr in top_bigrams_gc.items():
+        for bg, cnt in bgctr:
+            df_list.append({'Group': g, 'Committee': c, 'Bigram': ' '.join(bg), 'Count': cnt})
+    return pd.DataFrame(df_list)
 
 def plot_bigrams_by_group(df, grp_map, top_n=7):
     if df.empty:
         print("No data available for plotting.")
-        return
+        return None
 
     groups = df["Group"].unique()
     num_g = len(groups)
@@ -292,47 +442,61 @@ def plot_bigrams_by_group(df, grp_map, top_n=7):
 
     for j in range(num_g,len(axs)): axs[j].axis("off")
     plt.suptitle("Top Bigrams by Concerned Group", fontsize=18, fontweight="bold", y=1.02)
-    plt.show()
-
-plot_bigrams_by_group(df, grp_map, top_n=7)
+    return fig
 
 # ----------------------------------------------------------------------
 #  Plot of Bigrams by Mechanism
 # ----------------------------------------------------------------------
 treaty_bodies = ["- CCPR","- CESCR","- CEDAW","- CRC","- CRPD","- CERD","- CRC-OP-AC","- CRC-OP-SC","- Special Procedures","- UPR"]
-bigrams_to_ignore = [
-    ("state","party"), ("committee","concerned"), ("also","concerned"), ("concluding","observations"),
-    ("true","table"), ("committee","recommends"), ("recommends","state"), ("false","true"), ("true","true"),
-    ("notes","concern"), ("art","committee"), ("article","convention"), ("concerned","reports"),
-    ("committee","also"), ("table","colorful"), ("accent","w"), ("colorful","accent"), ("true","list"),
-    ("w","lsdexception"), ("committe","notes"), ("children","including"), ("order","generate"), ("widely","available"),
-    ("per","cent"), ("nbsp","nbsp"), ("including","internet"), ("grid","table"), ("expression","including"),
-    ("report","written"), ("written","replies"), ("article","covenant"), ("list","table"), ("groups","children"),
-    ("list","table"), ("state","submitted")
-]
-
-def filter_bigrams(txt):
-    wds = [w for w in word_tokenize(txt.lower()) if w.isalpha() and w not in stop_words]
-    return [b for b in bigrams(wds) if b not in bigrams_to_ignore]
-
-tb_bigrams = {tb: Counter() for tb in treaty_bodies}
-for r in data_records:
-    t = r.get("Text","").strip()
-    b = r.get("Reccomending Body","").strip()
-    if b in treaty_bodies and t:
-        tb_bigrams[b].update(filter_bigrams(t))
+def filter_bigrams(txt, languages=("en",)):
+    """Encoded keys of the bigrams not in the topic's ignore list."""
+    token_filter = language_filters(languages)[1]
+    return token_filter.bigrams(token_filter.ids(tokenize(txt, languages[0])))
+
+def count_treaty_body_bigrams(data_records, unique=False, top_n=None, max_entries=MAX_COUNTER_ENTRIES,
+                              n_workers=BIGRAM_WORKERS):
+    """
+    Bigram counts per treaty body. With 'top_n' only the top_n bigrams of each
+    body are kept, and memory stays bounded by 'max_entries'.
+    """
+    items, languages = [], []
+    for r in (first_in_cluster(data_records) if unique else data_records):
+        t = r.get("Text","").strip()
+        b = r.get("Reccomending Body","").strip()
+        if b in treaty_bodies and t:
+            items.append(([b], t))
+            languages.append(record_languages(r))
+    with SpillCounter(max_entries) as counts:
+        for b, bgs in routed_bigrams(items, languages, 1, 'bigrams', n_workers):
+            counts.update(b, bgs)
+        tb_bigrams = counts.most_common(top_n) if top_n else counts.counters()
+    return {tb: vocab.decode_counter(tb_bigrams.get(tb, Counter())) for tb in treaty_bodies}
+
+def treaty_body_distinctive_bigrams(data_records, top_n=10):
+    """Top bigrams per treaty body by log-odds z-score against all other mechanisms."""
+    records = [r for r in data_records
+               if r.get("Reccomending Body","").strip() in treaty_bodies and r.get("Text","").strip()]
+    # No ignore list: boilerplate shared by all mechanisms scores low on its own.
+    # One document-term matrix for all records, so the stopwords of every language present apply
+    languages = set().union(*(record_languages(r) for r in records))
+    df = distinctive_terms([r["Text"] for r in records],
+                           {"Treaty Body": [r["Reccomending Body"].strip() for r in records]},
+                           k=top_n, token_filter=plain_filter(languages), ngram_range=(2, 2))
+    df["Treaty Body"] = [s[1] for s in df["Slice"]]
+    return df.rename(columns={"Term": "Bigram"})[["Treaty Body", "Bigram", "Count", "Score"]]
 
 # Build DataFrame of top bigrams per treaty body
-rows = []
-for tb, ctr in tb_bigrams.items():
-    for bg, cnt in ctr.most_common(10):
-        rows.append({"Treaty Body": tb, "Bigram": " ".join(bg), "Count": cnt})
-df = pd.DataFrame(rows)
-
-def plot_treaty_body_bigrams(df, top_n=10):
+def treaty_body_bigrams_dataframe(tb_bigrams, top_n=10):
+    rows = []
+    for tb, ctr in tb_bigrams.items():
+        for bg, cnt in ctr.most_common(top_n):
+            rows.append({"Treaty Body": tb, "Bigram": " ".join(bg), "Count": cnt})
+    return pd.DataFrame(rows)
+
+def plot_treaty_body_bigrams(df, top_n=10, value="Count"):
     if df.empty:
         print("No data available for plotting.")
-        return
+        return None
 
     df["Treaty Body"] = df["Treaty Body"].replace({"- Special Procedures": "Special Procedures"})
     df["Treaty Body"] = df["Treaty Body"].str.replace("^- ","",regex=True)
@@ -348,9 +512,9 @@ def plot_treaty_body_bigrams(df, top_n=10):
 
     for i,b in enumerate(unique_bodies):
         ax = axs[i]
-        sub_df = df[df["Treaty Body"]==b].nlargest(top_n,"Count")
+        sub_df = df[df["Treaty Body"]==b].nlargest(top_n,value)
         if not sub_df.empty:
-            ax.barh(sub_df["Bigram"], sub_df["Count"], color=body_colors[b], edgecolor="black")
+            ax.barh(sub_df["Bigram"], sub_df[value], color=body_colors[b], edgecolor="black")
             ax.set_title(b, fontsize=14, fontweight="bold")
             ax.invert_yaxis()
         else:
@@ -362,6 +526,35 @@ def plot_treaty_body_bigrams(df, top_n=10):
     fig.legend(handles, body_colors.keys(), title="Treaty Body", loc="lower center",
                bbox_to_anchor=(0.5,-0.05), ncol=cols, fancybox=True, shadow=True)
     plt.suptitle("Top Bigrams by Treaty Body", fontsize=18, fontweight="bold", y=1.02)
+    return fig
+
+def main():
+    data_records, data_records_small = load_records(INPUT_FILE)
+
+    yearly_word_counts = count_concerned_groups(data_records, years_2006_2024)
+    plot_concerned_groups(yearly_word_counts, years_2006_2024)
+    plt.show()
+
+    doc_counts_by_body, yearly_counts = count_docs_by_body(data_records_small, years_2007_2024)
+    plot_active_mechanisms(doc_counts_by_body, yearly_counts, years_2007_2024)
+    plt.show()
+
+    group_target_bigrams = count_group_target_bigrams(data_records_small, unique=COUNT_UNIQUE)
+    for grp, ctr in group_target_bigrams.items():
+        print(f"Group '{'/'.join(grp)}': {ctr.most_common(10)}")
+    if CONTEXT_EXAMPLES:
+        print_group_contexts(group_target_bigrams, CONTEXT_EXAMPLES)
+
+    group_committee_bigrams = count_group_committee_bigrams(data_records_small, unique=COUNT_UNIQUE, top_n=10)
+    plot_bigrams_by_group(group_bigrams_dataframe(group_committee_bigrams), grp_map, top_n=7)
+    plt.show()
+
+    if BIGRAM_RANKING == 'log-odds':
+        plot_treaty_body_bigrams(treaty_body_distinctive_bigrams(data_records), top_n=10, value="Score")
+    else:
+        tb_bigrams = count_treaty_body_bigrams(data_records, unique=COUNT_UNIQUE, top_n=10)
+        plot_treaty_body_bigrams(treaty_body_bigrams_dataframe(tb_bigrams), top_n=10)
     plt.show()
 
-plot_treaty_body_bigrams(df, top_n=10)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import Bodies_groups
+from General_trends import TARGET_WORDS
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Corpus_query import load_corpus, dataset_fingerprint
+from Corpus_mmap import MappedCorpus, build_mmap_corpus, is_current
+from Trend_engine import build_cube, theme_matrix
+from Spill_counter import SpillCounter
+from Text_pipeline import tokenize
+
+# --- Configuration ---
+INPUT_FILE = "../Data/UHRI_Internet.json"
+MMAP_DIR = "../Data/UHRI_Internet.mmap"
+CACHE_DIR = "../Data/.query_cache"
+OUTPUT_FILE = "../Data/dashboard/index.html"   # Self-contained page (tiles and code inline)
+START_YR, END_YR = 2006, 2024
+# Keyword sets selectable in the dashboard (substring match on the lowercased text)
+KEYWORD_SETS = {
+    "Internet access": TARGET_WORDS,
+    "Online safety": ["online safety", "cyberbullying", "online abuse", "online violence", "online sexual"],
+    "Privacy & surveillance": ["privacy", "surveillance", "data protection"],
+    "Digital literacy": ["digital literacy", "digital skills", "digital education", "media literacy"],
+}
+BIGRAM_TILE_TOP = 100   # Bigrams kept per (year, treaty body) tile
+
+
+# ----------------------------------------------------------------------
+# Tiles
+# ----------------------------------------------------------------------
+def sparse_entries(arr):
+    """Nonzero cells of a count array as [i, j, ..., value] rows."""
+    idx = np.nonzero(arr)
+    return np.column_stack(idx + (arr[idx],)).astype(int).tolist()
+
+
+def group_mention_cube(corpus, start_yr=START_YR, end_yr=END_YR):
+    """
+    Mentions of each concerned group (Bodies_groups.related_words, counted as
+    in count_concerned_groups) per (year, body, theme, group); the last theme
+    slot counts every record once.
+    """
+    groups = Bodies_groups.related_words
+    n_themes = len(corpus.themes) + 1
+    cube = np.zeros((end_yr - start_yr + 1, len(corpus.bodies), n_themes, len(groups)), dtype=np.int64)
+    tm = theme_matrix(corpus)
+    for i, txt in enumerate(corpus.texts()):
+        y = int(corpus.year[i])
+        if not (start_yr <= y <= end_yr) or not txt:
+            continue
+        toks = tokenize(txt)
+        mentions = np.array([sum(toks.count(w) for w in grp) for grp in groups])
+        if not mentions.any():
+            continue
+        yi, bi = y - start_yr, int(corpus.body[i])
+        cube[yi, bi, np.flatnonzero(tm[i])] += mentions
+        cube[yi, bi, n_themes - 1] += mentions
+    return cube
+
+
+def bigram_tiles(corpus, start_yr=START_YR, end_yr=END_YR, top=BIGRAM_TILE_TOP):
+    """Top bigrams (Bodies_groups.filter_bigrams) per (year, treaty body)."""
+    tb_codes = {i for i, b in enumerate(corpus.bodies) if b.strip() in Bodies_groups.treaty_bodies}
+    with SpillCounter() as counts:
+        for i, txt in enumerate(corpus.texts()):
+            y, b = int(corpus.year[i]), int(corpus.body[i])
+            if start_yr <= y <= end_yr and b in tb_codes and txt.strip():
+                counts.update((y - start_yr, b), Bodies_groups.filter_bigrams(txt.strip()))
+        tiles = counts.most_common(top)
+    vocab, index, cells = [], {}, []
+    for (yi, b), ctr in sorted(tiles.items()):
+        row = []
+        for bg, cnt in Bodies_groups.vocab.decode_counter(ctr).items():
+            bg = " ".join(bg)
+            if bg not in index:
+                index[bg] = len(vocab)
+                vocab.append(bg)
+            row.append([index[bg], cnt])
+        cells.append([yi, b, row])
+    return {"vocab": vocab, "cells": cells}
+
+
+def build_tiles(corpus, start_yr=START_YR, end_yr=END_YR, keyword_sets=KEYWORD_SETS):
+    """All aggregates the dashboard needs; no record text is included."""
+    keyword, records = {}, None
+    for name, words in keyword_sets.items():
+        cube, _ = build_cube(corpus, words, start_yr, end_yr)
+        keyword[name] = sparse_entries(cube[..., 1])
+        if records is None:
+            records = sparse_entries(cube.sum(axis=-1))
+    return {
+        "years": list(range(start_yr, end_yr + 1)),
+        "bodies": list(corpus.bodies),
+        "themes": list(corpus.themes),
+        "groups": [Bodies_groups.short_labels[g] for g in Bodies_groups.related_words],
+        "keyword_sets": {name: list(words) for name, words in keyword_sets.items()},
+        "records": records,
+        "keyword": keyword,
+        "group_mentions": sparse_entries(group_mention_cube(corpus, start_yr, end_yr)),
+        "bigrams": bigram_tiles(corpus, start_yr, end_yr),
+    }
+
+
+def write_dashboard(tiles, path=OUTPUT_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = json.dumps(tiles, separators=(",", ":")).replace("</", "<\\/")   # keep "</script>" out of the page
+    html = HTML_TEMPLATE.replace("/*TILES*/null", data)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+HTML_TEMPLATE = r"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>UN recommendations – Internet access dashboard</title>
+<style>
+  body { font-family: sans-serif; margin: 0; display: flex; color: #222; }
+  #filters { width: 260px; padding: 12px; background: #f4f4f4; height: 100vh; overflow-y: auto; box-sizing: border-box; }
+  #filters label { display: block; margin-top: 10px; font-weight: bold; font-size: 13px; }
+  #filters select, #filters input[type=number] { width: 100%; }
+  #bodies div { font-size: 12px; }
+  #charts { flex: 1; padding: 12px; display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }
+  .chart h3 { margin: 4px 0; font-size: 14px; }
+  .chart .note { font-size: 11px; color: #666; }
+  svg text { font-size: 10px; }
+</style>
+</head>
+<body>
+<div id="filters">
+  <label>Years</label>
+  <input type="number" id="y0"> – <input type="number" id="y1">
+  <label>Theme</label>
+  <select id="theme"></select>
+  <label>Keyword set</label>
+  <select id="kwset"></select>
+  <div><input type="checkbox" id="restrict"> only records matching the keyword set</div>
+  <label>Active mechanisms threshold (count ≥)</label>
+  <input type="number" id="threshold" value="10" min="0">
+  <label>Bodies <a href="#" id="all">all</a> / <a href="#" id="none">none</a></label>
+  <div id="bodies"></div>
+  <p id="timing" class="note"></p>
+</div>
+<div id="charts">
+  <div class="chart"><h3>Keyword-set share of recommendations per year</h3><div id="c_share"></div></div>
+  <div class="chart"><h3>Most active mechanisms</h3><div id="c_active"></div>
+    <div class="note">Points: body × year counts ≥ threshold. Line: total of selected bodies.</div></div>
+  <div class="chart"><h3>Rights addressed (theme mentions)</h3><div id="c_rights"></div></div>
+  <div class="chart"><h3>Concerned groups (word mentions)</h3><div id="c_groups"></div></div>
+  <div class="chart"><h3>Top bigrams of the selected treaty bodies</h3><div id="c_bigrams"></div>
+    <div class="note">Summed from the top bigrams of every year × body tile; not filtered by theme or keyword set.</div></div>
+</div>
+<script>
+const T = /*TILES*/null;
+const NT = T.themes.length;            // index of the "all records" theme slot
+const COLORS = ["#1f77b4","#ff7f0e","#2ca02c","#d62728","#9467bd","#8c564b","#e377c2","#7f7f7f",
+                "#bcbd22","#17becf","#393b79","#637939","#8c6d31","#843c39","#7b4173","#3182bd"];
+const $ = id => document.getElementById(id);
+const NS = "http://www.w3.org/2000/svg";
+
+function el(tag, attrs, text) {
+  const e = document.createElementNS(NS, tag);
+  for (const k in attrs) e.setAttribute(k, attrs[k]);
+  if (text !== undefined) e.textContent = text;
+  return e;
+}
+function svg(w, h) { return el("svg", {width: w, height: h, viewBox: `0 0 ${w} ${h}`}); }
+function nice(v) { return v <= 0 ? 1 : Math.pow(10, Math.floor(Math.log10(v))) * Math.ceil(v / Math.pow(10, Math.floor(Math.log10(v)))); }
+
+function state() {
+  const y0 = +$("y0").value, y1 = +$("y1").value;
+  const bodies = T.bodies.map((_, i) => $("b" + i).checked);
+  return {yi0: y0 - T.years[0], yi1: y1 - T.years[0], bodies, theme: +$("theme").value,
+          kwset: $("kwset").value, restrict: $("restrict").checked, threshold: +$("threshold").value};
+}
+
+// Sum sparse [y, b, t, ..., v] entries passing the year/body/theme filters into acc(entry, value)
+function scan(entries, s, theme, acc) {
+  for (const e of entries) {
+    if (e[0] < s.yi0 || e[0] > s.yi1 || !s.bodies[e[1]] || e[2] !== theme) continue;
+    acc(e, e[e.length - 1]);
+  }
+}
+
+function axes(g, x0, y0, w, h, ymax, years) {
+  g.appendChild(el("line", {x1: x0, y1: y0 + h, x2: x0 + w, y2: y0 + h, stroke: "#333"}));
+  g.appendChild(el("line", {x1: x0, y1: y0, x2: x0, y2: y0 + h, stroke: "#333"}));
+  for (let k = 0; k <= 4; k++) {
+    const v = ymax * k / 4, y = y0 + h - h * k / 4;
+    g.appendChild(el("text", {x: x0 - 4, y: y + 3, "text-anchor": "end"}, Math.round(v)));
+    g.appendChild(el("line", {x1: x0, y1: y, x2: x0 + w, y2: y, stroke: "#eee"}));
+  }
+  years.forEach((yr, i) => {
+    if (years.length > 12 && i % 2) return;
+    g.appendChild(el("text", {x: x0 + (i + 0.5) * w / years.length, y: y0 + h + 12, "text-anchor": "middle"}, yr));
+  });
+}
+
+function drawShare(s, years) {
+  const n = years.length, tgt = new Array(n).fill(0), tot = new Array(n).fill(0);
+  const theme = s.theme < 0 ? NT : s.theme;
+  scan(T.records, s, theme, (e, v) => tot[e[0] - s.yi0] += v);
+  scan(T.keyword[s.kwset], s, theme, (e, v) => tgt[e[0] - s.yi0] += v);
+  const W = 520, H = 260, ymax = nice(Math.max(1, ...tot)), g = svg(W, H);
+  axes(g, 40, 10, W - 50, H - 40, ymax, years);
+  const bw = (W - 50) / n, sy = (H - 40) / ymax;
+  years.forEach((_, i) => {
+    const x = 40 + i * bw + 2;
+    g.appendChild(el("rect", {x, y: 10 + H - 40 - tot[i] * sy, width: bw - 4, height: (tot[i] - tgt[i]) * sy, fill: "#c7c7c7"}));
+    g.appendChild(el("rect", {x, y: 10 + H - 40 - tgt[i] * sy, width: bw - 4, height: tgt[i] * sy, fill: "#1f77b4"}));
+    if (tot[i]) g.appendChild(el("text", {x: x + bw / 2 - 2, y: 10 + H - 40 - tot[i] * sy - 3, "text-anchor": "middle"},
+                                 (100 * tgt[i] / tot[i]).toFixed(0) + "%"));
+  });
+  $("c_share").replaceChildren(g);
+}
+
+function drawActive(s, years) {
+  const n = years.length, src = s.restrict ? T.keyword[s.kwset] : T.records;
+  const theme = s.theme < 0 ? NT : s.theme, per = {}, total = new Array(n).fill(0);
+  scan(src, s, theme, (e, v) => {
+    (per[e[1]] = per[e[1]] || new Array(n).fill(0))[e[0] - s.yi0] += v;
+    total[e[0] - s.yi0] += v;
+  });
+  const W = 520, H = 260, g = svg(W, H), pw = W - 200;
+  const ymax = nice(Math.max(1, ...Object.values(per).flat())), tmax = nice(Math.max(1, ...total));
+  axes(g, 40, 10, pw, H - 40, ymax, years);
+  const bw = pw / n, sy = (H - 40) / ymax;
+  let row = 0;
+  Object.keys(per).forEach((b, k) => {
+    const pts = per[b].map((c, i) => [i, c]).filter(p => p[1] >= s.threshold);
+    if (!pts.length) return;
+    const col = COLORS[k % COLORS.length];
+    for (const [i, c] of pts)
+      g.appendChild(el("circle", {cx: 40 + (i + 0.5) * bw, cy: 10 + H - 40 - c * sy, r: 4, fill: col, "fill-opacity": 0.75}));
+    g.appendChild(el("circle", {cx: pw + 60, cy: 14 + row * 13, r: 4, fill: col}));
+    g.appendChild(el("text", {x: pw + 68, y: 17 + row++ * 13}, T.bodies[b]));
+  });
+  const line = total.map((c, i) => `${40 + (i + 0.5) * bw},${10 + H - 40 - c * (H - 40) / tmax}`).join(" ");
+  g.appendChild(el("polyline", {points: line, fill: "none", stroke: "#000", "stroke-width": 2}));
+  g.appendChild(el("text", {x: 40 + pw, y: 8, "text-anchor": "end"}, `total (max ${tmax})`));
+  $("c_active").replaceChildren(g);
+}
+
+function hbars(target, items, color) {
+  const W = 520, H = Math.max(60, 16 * items.length + 10), g = svg(W, H), lw = 260;
+  const vmax = Math.max(1, ...items.map(it => it[1]));
+  items.forEach(([label, v], i) => {
+    g.appendChild(el("text", {x: lw - 4, y: 14 + i * 16, "text-anchor": "end"}, label.length > 48 ? label.slice(0, 46) + "…" : label));
+    g.appendChild(el("rect", {x: lw, y: 4 + i * 16, width: (W - lw - 40) * v / vmax, height: 12, fill: color}));
+    g.appendChild(el("text", {x: lw + (W - lw - 40) * v / vmax + 3, y: 14 + i * 16}, v));
+  });
+  $(target).replaceChildren(g);
+}
+
+function drawRights(s) {
+  const src = s.restrict ? T.keyword[s.kwset] : T.records, counts = new Array(NT).fill(0);
+  for (const e of src)
+    if (e[0] >= s.yi0 && e[0] <= s.yi1 && s.bodies[e[1]] && e[2] < NT) counts[e[2]] += e[3];
+  const items = counts.map((v, t) => [T.themes[t], v]).filter(it => it[1] > 0).sort((a, b) => b[1] - a[1]).slice(0, 15);
+  hbars("c_rights", items, "#8c564b");
+}
+
+function drawGroups(s, years) {
+  const n = years.length, G = T.groups.length, series = T.groups.map(() => new Array(n).fill(0));
+  const theme = s.theme < 0 ? NT : s.theme;
+  scan(T.group_mentions, s, theme, (e, v) => series[e[3]][e[0] - s.yi0] += v);
+  const W = 520, H = 260, g = svg(W, H), pw = W - 170;
+  const ymax = nice(Math.max(1, ...series.flat()));
+  axes(g, 40, 10, pw, H - 40, ymax, years);
+  const bw = pw / n, sy = (H - 40) / ymax;
+  series.forEach((vals, k) => {
+    const col = COLORS[k % COLORS.length];
+    g.appendChild(el("polyline", {points: vals.map((c, i) => `${40 + (i + 0.5) * bw},${10 + H - 40 - c * sy}`).join(" "),
+                                  fill: "none", stroke: col, "stroke-width": 1.5}));
+    vals.forEach((c, i) => g.appendChild(el("circle", {cx: 40 + (i + 0.5) * bw, cy: 10 + H - 40 - c * sy, r: 2.5, fill: col})));
+    g.appendChild(el("circle", {cx: pw + 60, cy: 14 + k * 13, r: 4, fill: col}));
+    g.appendChild(el("text", {x: pw + 68, y: 17 + k * 13}, T.groups[k]));
+  });
+  $("c_groups").replaceChildren(g);
+}
+
+function drawBigrams(s) {
+  const sum = {};
+  for (const [yi, b, row] of T.bigrams.cells) {
+    if (yi < s.yi0 || yi > s.yi1 || !s.bodies[b]) continue;
+    for (const [k, c] of row) sum[k] = (sum[k] || 0) + c;
+  }
+  const items = Object.entries(sum).sort((a, b) => b[1] - a[1]).slice(0, 12).map(([k, c]) => [T.bigrams.vocab[k], c]);
+  hbars("c_bigrams", items, "#2ca02c");
+}
+
+function render() {
+  const t0 = performance.now(), s = state();
+  if (s.yi1 < s.yi0) return;
+  const years = T.years.slice(s.yi0, s.yi1 + 1);
+  drawShare(s, years); drawActive(s, years); drawRights(s); drawGroups(s, years); drawBigrams(s);
+  $("timing").textContent = `Rendered in ${(performance.now() - t0).toFixed(1)} ms`;
+}
+
+function init() {
+  $("y0").value = T.years[0]; $("y1").value = T.years[T.years.length - 1];
+  for (const id of ["y0", "y1"]) { $(id).min = T.years[0]; $(id).max = T.years[T.years.length - 1]; }
+  $("theme").appendChild(new Option("(all themes)", -1));
+  T.themes.forEach((t, i) => $("theme").appendChild(new Option(t, i)));
+  Object.keys(T.keyword_sets).forEach(k => $("kwset").appendChild(new Option(k, k)));
+  T.bodies.forEach((b, i) => {
+    const d = document.createElement("div");
+    d.innerHTML = `<input type="checkbox" id="b${i}" checked> `;
+    d.appendChild(document.createTextNode(b));
+    $("bodies").appendChild(d);
+  });
+  $("all").onclick = e => { e.preventDefault(); T.bodies.forEach((_, i) => $("b" + i).checked = true); render(); };
+  $("none").onclick = e => { e.preventDefault(); T.bodies.forEach((_, i) => $("b" + i).checked = false); render(); };
+  $("filters").addEventListener("input", render);
+  render();
+}
+init();
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline dashboard from precomputed tiles.")
+    parser.add_argument("--input", default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="HTML file to write")
+    args = parser.parse_args()
+
+    try:
+        fingerprint = dataset_fingerprint(args.input, CACHE_DIR)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    if not is_current(MMAP_DIR, args.input, CACHE_DIR):
+        try:
+            build_mmap_corpus(load_corpus(args.input), MMAP_DIR, fingerprint)
+        except json.JSONDecodeError:
+            print("JSON decode error.")
+            return
+
+    tiles = build_tiles(MappedCorpus(MMAP_DIR))
+    write_dashboard(tiles, args.output)
+    print(f"Dashboard written to '{args.output}' "
+          f"({os.path.getsize(args.output) // 1024} KB); open it in a browser, no server needed.")
+
+
+if __name__ == "__main__":
+    main()
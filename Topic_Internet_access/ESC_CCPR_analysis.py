@@ -1,21 +1,26 @@
-import json
+import os
+import sys
 import matplotlib.pyplot as plt
 from dateutil.parser import parse
 import random
 import numpy as np
 from matplotlib.lines import Line2D
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Corpus_view import CorpusView
+from Sample_preview import FRACTIONS, stratified_estimates
+from Render import scatter_points, glyph_markers, annotate
+
 # ----------------------------------------------------------------------
 # 1) Load JSON data, remove UPR records
 # ----------------------------------------------------------------------
 file_path = "../Data/UHRI_Internet.json"
-with open(file_path, "r", encoding="utf-8") as f:
-    data_records = json.load(f)
+PREVIEW = False  # First plot estimates from growing year x body samples, with 95% error bars (see Sample_preview.py)
+
+
+def load_records(path=file_path):
+    return CorpusView.from_json(path).exclude(lambda r: r.get("Reccomending Body", "") == "- UPR")
 
-data_records = [
-    r for r in data_records
-    if r.get("Reccomending Body", "") != "- UPR"
-]
 
 # ----------------------------------------------------------------------
 # 2) Define subthemes, color map, numeric labels
@@ -75,68 +80,104 @@ esc_ccpr_numeric_label = {
 # 3) Count mentions for each subtheme by year (2007–2024)
 # ----------------------------------------------------------------------
 all_years_range = range(2007, 2025)
-yearly_esc_ccpr_counts = {yr: {cat: 0 for cat in esc_ccpr_subthemes} for yr in all_years_range}
 
-for r in data_records:
+
+def publication_year(r):
     pub_date = (r.get("Document Publication Date") or "").strip()
     if not pub_date:
-        continue
+        return None
     try:
         y = parse(pub_date, fuzzy=True).year
         if y < 100: y += 2000
     except:
-        continue
-    if 2007 <= y <= 2024:
-        splitted = str(r.get("Themes", "")).split("\n")
-        for cat, subs in esc_ccpr_subthemes.items():
-            for st in subs:
-                if st in splitted:
-                    yearly_esc_ccpr_counts[y][cat] += 1
+        return None
+    return y
+
+
+def record_mentions(r):
+    """Mentions per subtheme category of one record (one per matching theme label)."""
+    splitted = str(r.get("Themes", "")).split("\n")
+    return {cat: sum(st in splitted for st in subs) for cat, subs in esc_ccpr_subthemes.items()}
+
+
+def count_esc_ccpr_by_year(data_records, years=all_years_range):
+    yearly_esc_ccpr_counts = {yr: {cat: 0 for cat in esc_ccpr_subthemes} for yr in years}
+
+    for r in data_records:
+        y = publication_year(r)
+        if y in yearly_esc_ccpr_counts:
+            for cat, n in record_mentions(r).items():
+                yearly_esc_ccpr_counts[y][cat] += n
+    return yearly_esc_ccpr_counts
+
+
+def preview_esc_ccpr_by_year(data_records, years=all_years_range, fractions=FRACTIONS):
+    """
+    Estimates of count_esc_ccpr_by_year() from a year x body stratified sample
+    that grows each round: yields (share of records evaluated, counts, 95% margins),
+    both shaped {year: {category: value}}.
+    """
+    def values(r):
+        y = publication_year(r)
+        if y in years:
+            return {(y, cat): n for cat, n in record_mentions(r).items() if n}
+        return {}
+
+    for frac, est, margin in stratified_estimates(data_records, values, fractions=fractions):
+        counts = {yr: {cat: est.get((yr, cat), 0) for cat in esc_ccpr_subthemes} for yr in years}
+        margins = {yr: {cat: margin.get((yr, cat), 0) for cat in esc_ccpr_subthemes} for yr in years}
+        yield frac, counts, margins
 
 # ----------------------------------------------------------------------
 # 4) Dot Plot (2014–2024)
 # ----------------------------------------------------------------------
 years_range = range(2014, 2025)
-plot_data = {
-    cat: [yearly_esc_ccpr_counts[yr][cat] for yr in years_range]
-    for cat in esc_ccpr_subthemes
-}
 
-fig, ax = plt.subplots(figsize=(12, 8))
-x_vals = np.arange(len(years_range)) + 0.5
-ax.set_xticks(x_vals)
-ax.set_xticklabels(years_range, rotation=45)
-ax.set_xlim(0, len(years_range))
-for i in range(len(years_range) + 1):
-    ax.axvline(x=i, color='lightgrey', linestyle='--', linewidth=1, alpha=0.7)
-
-random.seed(42)
-markersize_ = 12
-fontsize_ = 8
-
-for cat in esc_ccpr_subthemes:
-    color_ = esc_ccpr_color_map[cat]
-    label_ = esc_ccpr_numeric_label[cat]
-    counts_ = plot_data[cat]
-    for i, count in enumerate(counts_):
-        jx = x_vals[i] + random.uniform(-0.3, 0.3)
-        ax.plot(jx, count, marker='o', color=color_, markersize=markersize_, linestyle='', alpha=0.6)
-        ax.text(jx, count, label_, color='white', ha='center', va='center', fontsize=fontsize_, fontweight='bold')
-
-ax.set_xlabel("Year")
-ax.set_ylabel("Number of Mentions")
-ax.set_title("Frequency of ESC/CCPR Rights Mentions (2014–2024)")
-
-legend_elements = []
-for cat in esc_ccpr_subthemes:
-    legend_elements.append(
-        Line2D([0], [0], marker='o', color=esc_ccpr_color_map[cat],
-               label=f"{esc_ccpr_numeric_label[cat]} - {cat[3:]}", markersize=markersize_, linestyle='')
-    )
-ax.legend(handles=legend_elements, title="Human Rights", loc="upper left", fontsize=9)
-
-plt.tight_layout()
-plt.show()
+
+def plot_esc_ccpr_dots(yearly_esc_ccpr_counts, years_range=years_range, margins=None):
+    plot_data = {
+        cat: [yearly_esc_ccpr_counts[yr][cat] for yr in years_range]
+        for cat in esc_ccpr_subthemes
+    }
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    x_vals = np.arange(len(years_range)) + 0.5
+    ax.set_xticks(x_vals)
+    ax.set_xticklabels(years_range, rotation=45)
+    ax.set_xlim(0, len(years_range))
+    for i in range(len(years_range) + 1):
+        ax.axvline(x=i, color='lightgrey', linestyle='--', linewidth=1, alpha=0.7)
+
+    random.seed(42)
+    markersize_ = 12
+    fontsize_ = 8
+
+    for cat in esc_ccpr_subthemes:
+        color_ = esc_ccpr_color_map[cat]
+        label_ = esc_ccpr_numeric_label[cat]
+        counts_ = plot_data[cat]
+        jx = [x + random.uniform(-0.3, 0.3) for x in x_vals]
+        if margins is not None:
+            ax.errorbar(jx, counts_, yerr=[margins[yr][cat] for yr in years_range], fmt='none',
+                        ecolor=color_, alpha=0.4, capsize=2)
+        # One collection for the category's dots and one for their number labels
+        scatter_points(ax, jx, counts_, color_, size=markersize_ ** 2, alpha=0.6)
+        glyph_markers(ax, jx, counts_, [label_] * len(jx), fontsize=fontsize_)
+
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Mentions")
+    ax.set_title(f"Frequency of ESC/CCPR Rights Mentions ({years_range[0]}–{years_range[-1]})")
+
+    legend_elements = []
+    for cat in esc_ccpr_subthemes:
+        legend_elements.append(
+            Line2D([0], [0], marker='o', color=esc_ccpr_color_map[cat],
+                   label=f"{esc_ccpr_numeric_label[cat]} - {cat[3:]}", markersize=markersize_, linestyle='')
+        )
+    ax.legend(handles=legend_elements, title="Human Rights", loc="upper left", fontsize=9)
+
+    plt.tight_layout()
+    return fig
 
 # ----------------------------------------------------------------------
 # 5) Stacked Bar Chart (2007–2024)
@@ -151,82 +192,70 @@ ccpr_categories = [
 ]
 
 years_range_extended = range(2007, 2025)
-ext_esc_counts = []
-ext_ccpr_counts = []
-
-for yr in years_range_extended:
-    esc_sum = sum(yearly_esc_ccpr_counts[yr][c] for c in esc_categories)
-    ccpr_sum = sum(yearly_esc_ccpr_counts[yr][c] for c in ccpr_categories)
-    ext_esc_counts.append(esc_sum)
-    ext_ccpr_counts.append(ccpr_sum)
-
-tot_ext = [e + c for e, c in zip(ext_esc_counts, ext_ccpr_counts)]
-ext_esc_pct = [100 * e / t if t else 0 for e, t in zip(ext_esc_counts, tot_ext)]
-ext_ccpr_pct = [100 * c / t if t else 0 for c, t in zip(ext_ccpr_counts, tot_ext)]
-
-fig, ax = plt.subplots(figsize=(14, 7))
-bar1 = ax.bar(years_range_extended, ext_esc_counts, color="red", label="ESC Rights", alpha=0.9)
-bar2 = ax.bar(years_range_extended, ext_ccpr_counts, bottom=ext_esc_counts, color="blue", label="CCPR Rights", alpha=0.9)
-
-for i, (b1, b2) in enumerate(zip(bar1, bar2)):
-    if tot_ext[i] > 0:
-        ax.text(
-            b1.get_x() + b1.get_width()/2, b1.get_height()/2,
-            f"{ext_esc_pct[i]:.1f}%", ha="center", va="center", fontsize=9, color="white"
-        )
-        ax.text(
-            b2.get_x() + b2.get_width()/2, b2.get_y() + b2.get_height()/2,
-            f"{ext_ccpr_pct[i]:.1f}%", ha="center", va="center", fontsize=9, color="white"
-        )
 
-ax.set_title("Stacked Bar Chart of ESC vs CCPR Rights Mentions (2007–2024)")
-ax.set_xlabel("Year")
-ax.set_ylabel("Number of Mentions")
-ax.set_xticks(years_range_extended)
-ax.set_xticklabels(years_range_extended, rotation=45)
-ax.legend(loc="upper left")
 
-plt.tight_layout()
-plt.show()
+def sum_esc_ccpr(yearly_esc_ccpr_counts, years):
+    esc_counts = [sum(yearly_esc_ccpr_counts[y][c] for c in esc_categories) for y in years]
+    ccpr_counts = [sum(yearly_esc_ccpr_counts[y][c] for c in ccpr_categories) for y in years]
+    return esc_counts, ccpr_counts
+
+
+def plot_esc_ccpr_stacked_bar(yearly_esc_ccpr_counts, years=years_range_extended, ccpr_only_years=()):
+    """
+    Stacked ESC vs CCPR bars with percentage labels. For years in 'ccpr_only_years'
+    only the CCPR percentage is annotated (the ESC segment is too small to label).
+    """
+    esc_counts, ccpr_counts = sum_esc_ccpr(yearly_esc_ccpr_counts, years)
+    tot = [e + c for e, c in zip(esc_counts, ccpr_counts)]
+    esc_pct = [100 * e / t if t else 0 for e, t in zip(esc_counts, tot)]
+    ccpr_pct = [100 * c / t if t else 0 for c, t in zip(ccpr_counts, tot)]
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+    bar1 = ax.bar(years, esc_counts, color="red", label="ESC Rights", alpha=0.9)
+    bar2 = ax.bar(years, ccpr_counts, bottom=esc_counts, color="blue", label="CCPR Rights", alpha=0.9)
+
+    xs = [b.get_x() + b.get_width()/2 for b in bar1]
+    esc_labels = [f"{p:.1f}%" if t > 0 and y_ not in ccpr_only_years else ""
+                  for p, t, y_ in zip(esc_pct, tot, years)]
+    ccpr_labels = [f"{p:.1f}%" if t > 0 else "" for p, t in zip(ccpr_pct, tot)]
+    annotate(ax, xs + xs, [b.get_height()/2 for b in bar1] + [b.get_y() + b.get_height()/2 for b in bar2],
+             esc_labels + ccpr_labels, ha="center", va="center", fontsize=9, color="white")
+
+    ax.set_title(f"Stacked Bar Chart of ESC vs CCPR Rights Mentions ({years[0]}–{years[-1]})")
+    ax.set_xlabel("Year")
+    ax.set_ylabel("Number of Mentions")
+    ax.set_xticks(years)
+    ax.set_xticklabels(years, rotation=45)
+    ax.legend(loc="upper left")
+
+    plt.tight_layout()
+    return fig
 
 # ----------------------------------------------------------------------
 # 6) Limited Stacked Bar Chart (2009–2024) with selective CCPR percentages
 # ----------------------------------------------------------------------
 yrs_lim = range(2009, 2025)
-lim_esc_counts = [sum(yearly_esc_ccpr_counts[y][c] for c in esc_categories) for y in yrs_lim]
-lim_ccpr_counts = [sum(yearly_esc_ccpr_counts[y][c] for c in ccpr_categories) for y in yrs_lim]
-tot_lim = [e + c for e, c in zip(lim_esc_counts, lim_ccpr_counts)]
-lim_esc_pct = [100 * e / t if t else 0 for e, t in zip(lim_esc_counts, tot_lim)]
-lim_ccpr_pct = [100 * c / t if t else 0 for c, t in zip(lim_ccpr_counts, tot_lim)]
-
-fig, ax = plt.subplots(figsize=(14, 7))
-bar1 = ax.bar(yrs_lim, lim_esc_counts, color="red", label="ESC Rights", alpha=0.9)
-bar2 = ax.bar(yrs_lim, lim_ccpr_counts, bottom=lim_esc_counts, color="blue", label="CCPR Rights", alpha=0.9)
-
-for i, (b1, b2) in enumerate(zip(bar1, bar2)):
-    y_ = yrs_lim[i]
-    if tot_lim[i] > 0:
-        if y_ in [2009, 2010, 2011]:
-            ax.text(
-                b2.get_x() + b2.get_width()/2, b2.get_y() + b2.get_height()/2,
-                f"{lim_ccpr_pct[i]:.1f}%", ha="center", va="center", fontsize=9, color="white"
-            )
-        else:
-            ax.text(
-                b1.get_x() + b1.get_width()/2, b1.get_height()/2,
-                f"{lim_esc_pct[i]:.1f}%", ha="center", va="center", fontsize=9, color="white"
-            )
-            ax.text(
-                b2.get_x() + b2.get_width()/2, b2.get_y() + b2.get_height()/2,
-                f"{lim_ccpr_pct[i]:.1f}%", ha="center", va="center", fontsize=9, color="white"
-            )
-
-ax.set_title("Stacked Bar Chart of ESC vs CCPR Rights Mentions (2009–2024)")
-ax.set_xlabel("Year")
-ax.set_ylabel("Number of Mentions")
-ax.set_xticks(yrs_lim)
-ax.set_xticklabels(yrs_lim, rotation=45)
-ax.legend(loc="upper left")
-
-plt.tight_layout()
-plt.show()
+
+
+def main():
+    data_records = load_records(file_path)
+    if PREVIEW:
+        for frac, est, margins in preview_esc_ccpr_by_year(data_records, all_years_range):
+            print(f"Preview from {frac:.1%} of the records")
+            plot_esc_ccpr_dots(est, years_range, margins)
+            plt.show()
+
+    yearly_esc_ccpr_counts = count_esc_ccpr_by_year(data_records, all_years_range)
+
+    plot_esc_ccpr_dots(yearly_esc_ccpr_counts, years_range)
+    plt.show()
+
+    plot_esc_ccpr_stacked_bar(yearly_esc_ccpr_counts, years_range_extended)
+    plt.show()
+
+    plot_esc_ccpr_stacked_bar(yearly_esc_ccpr_counts, yrs_lim, ccpr_only_years=[2009, 2010, 2011])
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
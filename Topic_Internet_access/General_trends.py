@@ -1,46 +1,94 @@
+import os
+import sys
 import json
 import matplotlib.pyplot as plt
 from collections import Counter
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Sample_preview import FRACTIONS, stratified_estimates
+from Render import annotate
+from Multilingual import record_languages, lexicon
+
 # Configuration
 INPUT_FILE = "../Data/UHRI_Internet.json"
 TARGET_WORDS = [
     "internet access", "digital divide", "connectivity",
     "access online", "access digital"
 ]
+# TARGET_WORDS in the other languages of the corpus; records are matched with the
+# words of their 'Languages' (see Multilingual.py)
+TARGET_WORDS_BY_LANGUAGE = {
+    "en": TARGET_WORDS,
+    "fr": ["accès à internet", "accès à l'internet", "fracture numérique", "connectivité",
+           "accès en ligne", "accès numérique"],
+    "es": ["acceso a internet", "brecha digital", "conectividad", "acceso en línea", "acceso digital"],
+}
+COUNT_UNIQUE = False  # Count unique recommendation clusters (see Dataset_prep.py) instead of raw records
+PREVIEW = False  # First plot estimates from growing year x body samples, with 95% error bars (see Sample_preview.py)
 
 
 def add_dummy_variable(record):
     txt = record.get("Text", "").lower()
-    return int(any(word in txt for word in TARGET_WORDS))
+    return int(any(word in txt for word in lexicon(TARGET_WORDS_BY_LANGUAGE, record_languages(record))))
 
 
-def count_frequencies(data, start_yr=2006, end_yr=2024):
+def count_frequencies(data, start_yr=2006, end_yr=2024, unique=False):
     tgt_counts, tot_counts = Counter(), Counter()
-    for r in data:
+    seen = set()
+    for i, r in enumerate(data):
         y = r.get("Year")
         if isinstance(y, int) and start_yr <= y <= end_yr:
+            if unique:
+                # Count each near-duplicate cluster once per year
+                key = (y, r.get("Cluster ID", i))
+                if key in seen:
+                    continue
+                seen.add(key)
             tot_counts[y] += 1
             if add_dummy_variable(r):
                 tgt_counts[y] += 1
     return tgt_counts, tot_counts
 
 
-def plot_stacked_bar(tgt_counts, tot_counts, start_yr=2010, end_yr=2024):
+def preview_frequencies(data, start_yr=2006, end_yr=2024, fractions=FRACTIONS):
+    """
+    Estimates of count_frequencies() (raw records) from a year x body stratified
+    sample that grows each round: yields (share of records evaluated,
+    tgt_counts, tot_counts, 95% margins of tgt_counts). Yearly totals are exact.
+    """
+    def values(r):
+        y = r.get("Year")
+        if isinstance(y, int) and start_yr <= y <= end_yr:
+            return {(y, "total"): 1, (y, "target"): add_dummy_variable(r)}
+        return {}
+
+    for frac, est, margin in stratified_estimates(data, values, fractions=fractions):
+        tgt_counts, tot_counts, tgt_margins = Counter(), Counter(), {}
+        for (y, kind), v in est.items():
+            if kind == "total":
+                tot_counts[y] = v
+            else:
+                tgt_counts[y] = v
+                tgt_margins[y] = margin[(y, kind)]
+        yield frac, tgt_counts, tot_counts, tgt_margins
+
+
+def plot_stacked_bar(tgt_counts, tot_counts, start_yr=2010, end_yr=2024, margins=None):
     yrs = list(range(start_yr, end_yr + 1))
     tgt = [tgt_counts.get(y, 0) for y in yrs]
     non_tgt = [tot_counts.get(y, 0) - tc for y, tc in zip(yrs, tgt)]
 
-    plt.figure(figsize=(12, 7))
+    fig = plt.figure(figsize=(12, 7))
     b1 = plt.bar(yrs, non_tgt, color="lightgray", label="Other recommendations")
     b2 = plt.bar(yrs, tgt, bottom=non_tgt, color="skyblue", label="Recs related to Internet access")
+    if margins is not None:
+        # Uncertainty of the estimated split between the two segments
+        plt.errorbar(yrs, non_tgt, yerr=[margins.get(y, 0) for y in yrs], fmt="none",
+                     ecolor="black", capsize=3, label="95% interval (sample estimate)")
 
-    for x, top1, top2, nt, t in zip(yrs, b1, b2, non_tgt, tgt):
-        total = nt + t
-        if total > 0:
-            pct = (t / total) * 100
-            plt.text(x, top1.get_height() + top2.get_height() / 2,
-                     f"{pct:.1f}%", ha="center", va="center", fontsize=9)
+    labels = [f"{t / (nt + t) * 100:.1f}%" if nt + t > 0 else "" for nt, t in zip(non_tgt, tgt)]
+    annotate(plt.gca(), yrs, [top1.get_height() + top2.get_height() / 2 for top1, top2 in zip(b1, b2)],
+             labels, ha="center", va="center", fontsize=9)
 
     plt.title("Recommendations specifically on Internet access among recommendations related to the digital environment (2006–2024)")
     plt.xlabel("Year")
@@ -48,21 +96,21 @@ def plot_stacked_bar(tgt_counts, tot_counts, start_yr=2010, end_yr=2024):
     plt.xticks(yrs, rotation=45)
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def plot_total_recs(tot_counts, start_yr=2006, end_yr=2024):
     yrs = list(range(start_yr, end_yr + 1))
     vals = [tot_counts.get(y, 0) for y in yrs]
 
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(yrs, vals, marker="o")
     plt.xticks(range(start_yr, end_yr + 1, 2))
     plt.xlabel("Year")
     plt.ylabel("Total Recommendations")
     plt.title("Total Recommendations (2006–2024)")
     plt.tight_layout()
-    plt.show()
+    return fig
 
 
 def main():
@@ -76,9 +124,17 @@ def main():
         print("JSON decode error.")
         return
 
-    tgt_counts, tot_counts = count_frequencies(data, 2006, 2024)
+    if PREVIEW:
+        for frac, tgt_est, tot_est, margins in preview_frequencies(data, 2006, 2024):
+            print(f"Preview from {frac:.1%} of the records")
+            plot_stacked_bar(tgt_est, tot_est, 2006, 2024, margins=margins)
+            plt.show()
+
+    tgt_counts, tot_counts = count_frequencies(data, 2006, 2024, unique=COUNT_UNIQUE)
     plot_stacked_bar(tgt_counts, tot_counts, 2006, 2024)
+    plt.show()
     plot_total_recs(tot_counts, 2006, 2024)
+    plt.show()
 
 
 if __name__ == "__main__":
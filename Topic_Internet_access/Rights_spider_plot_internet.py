@@ -1,14 +1,40 @@
-import json
+import os
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
 from collections import Counter
 import math
 from dateutil.parser import parse
 
-# Load data (excluding UPR)
-with open('../Data/UHRI_Internet.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
-data = [r for r in data if r.get("Reccomending Body", "") != "- UPR"]
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Corpus_view import CorpusView
+from Corpus_query import dataset_fingerprint
+from Output_cache import OutputCache, code_version
+import Corpus_sql
+
+INPUT_FILE = '../Data/UHRI_Internet.json'
+# Set to e.g. '../Data/UHRI_Internet.sqlite' to count themes with indexed SQL
+# queries (the database is built by Corpus_sql.py / Dataset_prep.py)
+SQL_FILE = None
+# Theme counts (and with FIGURE_DIR the figures) are served from the content-addressed
+# output cache while the dataset, theme groups and plotting code are unchanged
+OUTPUT_CACHE = True
+OUTPUT_CACHE_DIR = '../Data/.output_cache'
+# Set to e.g. '../Data/figures/spider' to save the figures there instead of showing them;
+# only figures whose inputs changed are re-rendered (scheduled report builds)
+FIGURE_DIR = None
+
+# Data (excluding UPR) is loaded on first use, so cached outputs do not need it
+_data = None
+
+def get_data():
+    global _data
+    if _data is None:
+        _data = CorpusView.from_json(INPUT_FILE).exclude(lambda r: r.get("Reccomending Body", "") == "- UPR")
+    return _data
+
+conn = Corpus_sql.get_database(INPUT_FILE, SQL_FILE, '../Data/.query_cache') if SQL_FILE else None
+cache = OutputCache(dataset_fingerprint(INPUT_FILE, '../Data/.query_cache'), OUTPUT_CACHE_DIR, enabled=OUTPUT_CACHE)
 
 # Theme groups (4 ESC / 4 CP) & colors
 theme_groups = {
@@ -68,6 +94,8 @@ def extract_year(d):
         return 0
 
 def count_themes_in_range(records, start_yr, end_yr):
+    if conn is not None:
+        return sql_count_themes_in_range(conn, start_yr, end_yr)
     counts = {g: Counter() for g in theme_groups}
     for r in records:
         y = extract_year(r.get('Document Publication Date',''))
@@ -79,6 +107,12 @@ def count_themes_in_range(records, start_yr, end_yr):
                         counts[g][st] += 1
     return counts
 
+def sql_count_themes_in_range(conn, start_yr, end_yr):
+    """count_themes_in_range() as one indexed theme aggregation over the SQL store (UPR excluded)."""
+    found = Corpus_sql.theme_counts(conn, start_yr, end_yr, [st for subs in theme_groups.values() for st in subs],
+                                    exclude_bodies=["- UPR"])
+    return {g: Counter({st: found[st] for st in subs if st in found}) for g, subs in theme_groups.items()}
+
 def get_yearly_radial_scale(y):
     if 2007 <= y <= 2011: return [10, 20, 30]
     elif 2012 <= y <= 2018: return [10, 20, 30, 40, 50, 60, 70, 80, 90]
@@ -127,7 +161,7 @@ def create_spider_plot_single_year(tc, yr_label, yr_int):
 
     ax.set_title(f"Theme Mentions ({yr_label})", y=1.1, fontweight='bold')
     plt.tight_layout()
-    plt.show()
+    return fig
 
 def create_yearly_spider_plot_grid(records, start_yr, end_yr):
     yrs = range(start_yr, end_yr+1)
@@ -176,7 +210,7 @@ def create_yearly_spider_plot_grid(records, start_yr, end_yr):
         axs[r,c].set_visible(False)
 
     plt.tight_layout()
-    plt.show()
+    return fig
 
 def create_spider_plot_aggregated(tc, label):
     lbls = list(theme_groups.keys())
@@ -213,7 +247,7 @@ def create_spider_plot_aggregated(tc, label):
 
     ax.set_title(f"Theme Mentions: {label}", y=1.1, fontweight='bold')
     plt.tight_layout()
-    plt.show()
+    return fig
 
 def display_theme_counts(tc, label):
     print(f"\n=== Theme Counts: {label} ===\n")
@@ -266,18 +300,43 @@ def create_combined_spider_plot(tc1, tc2, lbl1, lbl2):
     ax.set_title("Comparison: 2006–2020 vs 2021–2024", y=1.1, fontweight='bold')
     ax.legend(loc='upper right', bbox_to_anchor=(1.2, 1.1))
     plt.tight_layout()
-    plt.show()
+    return fig
+
+count_code = code_version(extract_year, count_themes_in_range, sql_count_themes_in_range)
+plot_params = {'groups': theme_groups, 'colors': theme_colors, 'abbreviations': abbreviations}
+
+def cached_theme_counts(start_yr, end_yr):
+    """count_themes_in_range() over the non-UPR records, served from the output cache when unchanged."""
+    tc = cache.value('theme counts', {'years': [start_yr, end_yr], 'groups': theme_groups},
+                     lambda: count_themes_in_range(get_data(), start_yr, end_yr), count_code)
+    return {g: Counter(ctr) for g, ctr in tc.items()}
+
+def output_figure(name, params, render, code):
+    """Show the figure, or save it to FIGURE_DIR through the output cache (rendered only when invalidated)."""
+    if FIGURE_DIR is None:
+        render()
+        plt.show()
+    else:
+        cache.figure(name, dict(params, **plot_params), render, os.path.join(FIGURE_DIR, name + '.png'), code)
 
 # Single-year spider plots (example: 2015–2024)
-create_yearly_spider_plot_grid(data, 2015, 2024)
+output_figure('spider_grid_2015_2024', {'years': [2015, 2024]},
+              lambda: create_yearly_spider_plot_grid(get_data(), 2015, 2024),
+              code_version(create_yearly_spider_plot_grid, get_yearly_radial_scale) + count_code)
 
 # Aggregated ranges
-tc_2006_2018 = count_themes_in_range(data, 2006, 2020)
-tc_2019_2024 = count_themes_in_range(data, 2021, 2024)
+tc_2006_2018 = cached_theme_counts(2006, 2020)
+tc_2019_2024 = cached_theme_counts(2021, 2024)
 display_theme_counts(tc_2006_2018, "2006–2020")
-create_spider_plot_aggregated(tc_2006_2018, "2006–2020")
+output_figure('spider_2006_2020', {'counts': tc_2006_2018},
+              lambda: create_spider_plot_aggregated(tc_2006_2018, "2006–2020"), code_version(create_spider_plot_aggregated))
 display_theme_counts(tc_2019_2024, "2021–2024")
-create_spider_plot_aggregated(tc_2019_2024, "2021–2024")
+output_figure('spider_2021_2024', {'counts': tc_2019_2024},
+              lambda: create_spider_plot_aggregated(tc_2019_2024, "2021–2024"), code_version(create_spider_plot_aggregated))
 
 # Combined spider plot
-create_combined_spider_plot(tc_2006_2018, tc_2019_2024, "2006–2019", "2020–2024")
+output_figure('spider_combined', {'counts': [tc_2006_2018, tc_2019_2024]},
+              lambda: create_combined_spider_plot(tc_2006_2018, tc_2019_2024, "2006–2019", "2020–2024"),
+              code_version(create_combined_spider_plot))
+if OUTPUT_CACHE:
+    print(cache.summary())
@@ -1,14 +1,40 @@
 import json
+import os
+import sys
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Corpus_view import CorpusView
+from Corpus_query import dataset_fingerprint
+from Output_cache import OutputCache, code_version
+from Multilingual import record_languages, lexicon
+import Corpus_sql
+
 # --- Configuration ---
 INPUT_FILE = "../Data/UHRI_Internet.json"  # Path to the input JSON file
 OUTPUT_EXCEL_FILE = "Internet_Distribution.xlsx"  # Output Excel file
+# Set to e.g. "../Data/UHRI_Internet.sqlite" to count the body distribution with
+# indexed SQL queries (the database is built by Corpus_sql.py / Dataset_prep.py)
+SQL_FILE = None
+CACHE_DIR = "../Data/.query_cache"
+# Serve tables and the workbook from the content-addressed output cache when the
+# dataset, the parameters below and this script are unchanged (see Output_cache.py)
+OUTPUT_CACHE = True
+OUTPUT_CACHE_DIR = "../Data/.output_cache"
+START_YR, END_YR = 2006, 2024
 
 TARGET_WORDS = [
     "internet access", "digital divide", "connectivity",
     "access online", "access digital"
 ]
+# TARGET_WORDS in the other languages of the corpus; records are matched with the
+# words of their 'Languages' (see Multilingual.py)
+TARGET_WORDS_BY_LANGUAGE = {
+    "en": TARGET_WORDS,
+    "fr": ["accès à internet", "accès à l'internet", "fracture numérique", "connectivité",
+           "accès en ligne", "accès numérique"],
+    "es": ["acceso a internet", "brecha digital", "conectividad", "acceso en línea", "acceso digital"],
+}
 
 # The 13 (or 14) selected recommending bodies.
 SELECTED_BODIES = [
@@ -20,22 +46,22 @@ SELECTED_BODIES = [
 
 def standardize_body(record):
     """
-    Standardizes the 'Reccomending Body' field.
+    Returns the standardized 'Reccomending Body' field.
     If the field contains "- Special Procedures", it is re‐labeled as "- Special Procedures".
     """
     body = record.get("Reccomending Body", "")
     if isinstance(body, str) and "- Special Procedures" in body:
-        record["Reccomending Body"] = "- Special Procedures"
-    return record
+        return "- Special Procedures"
+    return body
 
 
 def add_dummy_variable(record):
     """
-    Returns 1 if the record's 'Text' field contains any of the TARGET_WORDS (case-insensitive),
-    otherwise returns 0.
+    Returns 1 if the record's 'Text' field contains any of the TARGET_WORDS in the record's
+    language(s) (case-insensitive), otherwise returns 0.
     """
     txt = record.get("Text", "").lower()
-    return int(any(word in txt for word in TARGET_WORDS))
+    return int(any(word in txt for word in lexicon(TARGET_WORDS_BY_LANGUAGE, record_languages(record))))
 
 
 def generate_body_distribution_table(data, start_yr=2006, end_yr=2024):
@@ -44,7 +70,7 @@ def generate_body_distribution_table(data, start_yr=2006, end_yr=2024):
     as years (from start_yr to end_yr). A 'TOTAL' column (row sums) and a 'TOTAL' row (column sums)
     are appended.
     """
-    df = pd.DataFrame(data)
+    df = data.to_dataframe()
     # Filter records to valid years
     df = df[df["Year"].between(start_yr, end_yr)]
     # Filter to only include the selected recommending bodies
@@ -52,7 +78,18 @@ def generate_body_distribution_table(data, start_yr=2006, end_yr=2024):
 
     # Create pivot table: rows=Reccomending Body, columns=Year
     pivot = pd.crosstab(df["Reccomending Body"], df["Year"])
+    return add_totals(pivot, start_yr, end_yr)
+
+
+def sql_body_distribution_table(conn, start_yr=2006, end_yr=2024):
+    """generate_body_distribution_table() as one indexed GROUP BY over the SQL store (Corpus_sql.py)."""
+    pivot = Corpus_sql.body_year_counts(conn, SELECTED_BODIES, start_yr, end_yr)
+    pivot.index.name, pivot.columns.name = "Reccomending Body", "Year"
+    return add_totals(pivot, start_yr, end_yr)
+
 
+def add_totals(pivot, start_yr, end_yr):
+    """Reindex a body x year pivot to every year and append the 'TOTAL' column and row."""
     # Ensure all years from start_yr to end_yr exist as columns
     all_years = list(range(start_yr, end_yr + 1))
     pivot = pivot.reindex(columns=all_years, fill_value=0)
@@ -75,7 +112,7 @@ def generate_internet_share_table(data, start_yr=2006, end_yr=2024):
       - Share (%) of internet-related recommendations
     A TOTAL row (summing counts and recalculating the overall share) is appended.
     """
-    df = pd.DataFrame(data)
+    df = data.to_dataframe()
     # Filter records to valid years
     df = df[df["Year"].between(start_yr, end_yr)]
 
@@ -113,7 +150,7 @@ def get_missing_recommendations(data, start_yr=2006, end_yr=2024):
     distribution table. These are records that either fall outside the year range or
     have a 'Reccomending Body' not in the SELECTED_BODIES.
     """
-    df_full = pd.DataFrame(data)
+    df_full = data.to_dataframe()
     # Apply the same year filter as used in the tables
     df_year = df_full[df_full["Year"].between(start_yr, end_yr)]
     # Filter the dataset based on the selected recommending bodies
@@ -126,24 +163,46 @@ def get_missing_recommendations(data, start_yr=2006, end_yr=2024):
 
 def main():
     try:
-        with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        fingerprint = dataset_fingerprint(INPUT_FILE, CACHE_DIR)
     except FileNotFoundError:
         print(f"File not found: {INPUT_FILE}")
         return
+    cache = OutputCache(fingerprint, OUTPUT_CACHE_DIR, enabled=OUTPUT_CACHE)
+
+    # The corpus is only loaded when a table has to be rebuilt
+    loaded = []
+    def records():
+        if not loaded:
+            # Standardize the recommending body for all records (derived lazily; records are not modified)
+            loaded.append(CorpusView.from_json(INPUT_FILE).derive("Reccomending Body", standardize_body))
+        return loaded[0]
+
+    def body_distribution():
+        if SQL_FILE:
+            conn = Corpus_sql.get_database(INPUT_FILE, SQL_FILE, CACHE_DIR)
+            table = sql_body_distribution_table(conn, START_YR, END_YR)
+            conn.close()
+            return table
+        return generate_body_distribution_table(records(), START_YR, END_YR)
+
+    # Each table is keyed by the parameters and functions it depends on
+    body_params = {"years": [START_YR, END_YR], "bodies": SELECTED_BODIES}
+    share_params = {"years": [START_YR, END_YR], "target_words": TARGET_WORDS_BY_LANGUAGE}
+    body_code = code_version(standardize_body, generate_body_distribution_table, sql_body_distribution_table, add_totals)
+    share_code = code_version(add_dummy_variable, generate_internet_share_table)
+    missing_code = code_version(standardize_body, get_missing_recommendations)
+    try:
+        # Generate the two tables
+        distribution_table = cache.table("Body Distribution", body_params, body_distribution, body_code)
+        internet_share_table = cache.table("Internet Share", share_params,
+                                           lambda: generate_internet_share_table(records(), START_YR, END_YR), share_code)
+        # Identify missing recommendation(s)
+        missing_recs = cache.table("Missing recommendations", body_params,
+                                   lambda: get_missing_recommendations(records(), START_YR, END_YR), missing_code)
     except json.JSONDecodeError:
         print("JSON decode error.")
         return
 
-    # Standardize the recommending body for all records
-    data = [standardize_body(r) for r in data]
-
-    # Generate the two tables
-    distribution_table = generate_body_distribution_table(data, 2006, 2024)
-    internet_share_table = generate_internet_share_table(data, 2006, 2024)
-
-    # Identify missing recommendation(s)
-    missing_recs = get_missing_recommendations(data, 2006, 2024)
     if len(missing_recs) == 1:
         print("The recommendation that is in the full dataset but not in the table is:")
         print(missing_recs)
@@ -153,11 +212,17 @@ def main():
     else:
         print("No missing recommendations found.")
 
-    # Export the tables to an Excel file with two sheets
-    with pd.ExcelWriter(OUTPUT_EXCEL_FILE, engine="openpyxl") as writer:
-        distribution_table.to_excel(writer, sheet_name="Body Distribution")
-        internet_share_table.to_excel(writer, sheet_name="Internet Share")
+    # Export the tables to an Excel file with two sheets (the workbook is keyed by its sheets)
+    def write_workbook(path):
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            distribution_table.to_excel(writer, sheet_name="Body Distribution")
+            internet_share_table.to_excel(writer, sheet_name="Internet Share")
+    sheets = {"Body Distribution": cache.key("Body Distribution", body_params, body_code),
+              "Internet Share": cache.key("Internet Share", share_params, share_code)}
+    cache.export("Workbook", sheets, write_workbook, OUTPUT_EXCEL_FILE, code_version(main))
     print(f"Tables saved to '{OUTPUT_EXCEL_FILE}'.")
+    if OUTPUT_CACHE:
+        print(cache.summary())
 
 
 if __name__ == "__main__":
@@ -1,58 +1,116 @@
-import json
+import os
+import sys
 from dateutil.parser import parse
 import matplotlib.pyplot as plt
 
-# Load JSON data
-with open("../Data/UHRI_Internet.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Filter for UPR recommendations only
-upr_records = [r for r in data if r.get("Reccomending Body","").strip() == "- UPR"]
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Corpus_view import CorpusView
+from Sample_preview import FRACTIONS, stratified_estimates
+from Render import annotate
 
+INPUT_FILE = "../Data/UHRI_Internet.json"
 theme = "- Freedom of opinion and expression & access to information"
 yrs = range(2010, 2025)
-counts = {y: {"total":0,"theme":0} for y in yrs}
+COUNT_UNIQUE = False  # Count unique recommendation clusters (see Dataset_prep.py) instead of raw records
+PREVIEW = False  # First plot estimates from growing yearly samples, with 95% error bars (see Sample_preview.py)
+
+
+def load_upr_records(path=INPUT_FILE):
+    # Lazy view of the UPR recommendations only
+    return CorpusView.from_json(path).where(lambda r: r.get("Reccomending Body","").strip() == "- UPR")
 
-# Tally theme mentions
-for r in upr_records:
+
+def publication_year(r):
     pub_date = r.get("Document Publication Date","").strip()
-    try: y = parse(pub_date, fuzzy=True).year
-    except: continue
-    if y in yrs:
-        counts[y]["total"] += 1
-        if theme in r.get("Themes",""):
-            counts[y]["theme"] += 1
-
-# Prepare stacked data
-x_vals = list(counts.keys())
-theme_vals = [counts[y]["theme"] for y in x_vals]
-other_vals = [counts[y]["total"]-counts[y]["theme"] for y in x_vals]
-theme_pct = [
-    (t / counts[y]["total"]*100) if counts[y]["total"] else 0
-    for y, t in zip(x_vals, theme_vals)
-]
-other_pct = [
-    (o / counts[y]["total"]*100) if counts[y]["total"] else 0
-    for y, o in zip(x_vals, other_vals)
-]
-
-# Plot
-fig, ax = plt.subplots(figsize=(12, 6))
-bar1 = ax.bar(x_vals, theme_vals, color="darkblue", label="Freedom of expression")
-bar2 = ax.bar(x_vals, other_vals, bottom=theme_vals, color="lightblue", label="Other human rights")
-
-for i,(t,o) in enumerate(zip(theme_vals, other_vals)):
-    y_ = x_vals[i]
-    if y_ == 2011:
-        ax.text(y_, t + o/2, f"{other_pct[i]:.1f}%", ha="center", fontsize=10, color="black")
-    else:
-        if t>0: ax.text(y_, t/2, f"{theme_pct[i]:.1f}%", ha="center", fontsize=10, color="white")
-        if o>0: ax.text(y_, t + o/2, f"{other_pct[i]:.1f}%", ha="center", fontsize=10, color="black")
-
-ax.set_xlabel("Year", fontsize=12)
-ax.set_ylabel("Number of UPR Recommendations", fontsize=12)
-ax.set_title("UPR Recommendations: Freedom of Expression vs Other (2010–2024)", fontsize=14)
-ax.legend(loc="upper left", fontsize=10)
-ax.grid(axis="y", linestyle="--", alpha=0.7)
-plt.tight_layout()
-plt.show()
+    try: return parse(pub_date, fuzzy=True).year
+    except: return None
+
+
+def count_theme_by_year(upr_records, theme=theme, yrs=yrs, unique=False):
+    counts = {y: {"total":0,"theme":0} for y in yrs}
+    seen = set()
+
+    # Tally theme mentions
+    for i, r in enumerate(upr_records):
+        y = publication_year(r)
+        if y in yrs:
+            if unique:
+                # The same recommendation made by several States counts once per year
+                key = (y, r.get("Cluster ID", i))
+                if key in seen: continue
+                seen.add(key)
+            counts[y]["total"] += 1
+            if theme in r.get("Themes",""):
+                counts[y]["theme"] += 1
+    return counts
+
+
+def preview_theme_by_year(upr_records, theme=theme, yrs=yrs, fractions=FRACTIONS):
+    """
+    Estimates of count_theme_by_year() (raw records) from a stratified sample
+    that grows each round: yields (share of records evaluated, counts,
+    95% margins of the theme counts per year).
+    """
+    def values(r):
+        y = publication_year(r)
+        if y in yrs:
+            return {(y, "total"): 1, (y, "theme"): int(theme in r.get("Themes",""))}
+        return {}
+
+    for frac, est, margin in stratified_estimates(upr_records, values, fractions=fractions):
+        counts = {y: {"total": est.get((y, "total"), 0), "theme": est.get((y, "theme"), 0)} for y in yrs}
+        yield frac, counts, {y: margin.get((y, "theme"), 0) for y in yrs}
+
+
+def plot_theme_share(counts, margins=None):
+    # Prepare stacked data
+    x_vals = list(counts.keys())
+    theme_vals = [counts[y]["theme"] for y in x_vals]
+    other_vals = [counts[y]["total"]-counts[y]["theme"] for y in x_vals]
+    theme_pct = [
+        (t / counts[y]["total"]*100) if counts[y]["total"] else 0
+        for y, t in zip(x_vals, theme_vals)
+    ]
+    other_pct = [
+        (o / counts[y]["total"]*100) if counts[y]["total"] else 0
+        for y, o in zip(x_vals, other_vals)
+    ]
+
+    # Plot
+    fig, ax = plt.subplots(figsize=(12, 6))
+    bar1 = ax.bar(x_vals, theme_vals, color="darkblue", label="Freedom of expression")
+    bar2 = ax.bar(x_vals, other_vals, bottom=theme_vals, color="lightblue", label="Other human rights")
+    if margins is not None:
+        ax.errorbar(x_vals, theme_vals, yerr=[margins[y] for y in x_vals], fmt="none",
+                    ecolor="black", capsize=3, label="95% interval (sample estimate)")
+
+    # 2011 only gets the "other" label
+    theme_labels = [f"{p:.1f}%" if t>0 and y_ != 2011 else "" for p, t, y_ in zip(theme_pct, theme_vals, x_vals)]
+    other_labels = [f"{p:.1f}%" if o>0 or y_ == 2011 else "" for p, o, y_ in zip(other_pct, other_vals, x_vals)]
+    annotate(ax, x_vals, [t/2 for t in theme_vals], theme_labels, ha="center", fontsize=10, color="white")
+    annotate(ax, x_vals, [t + o/2 for t, o in zip(theme_vals, other_vals)], other_labels,
+             ha="center", fontsize=10, color="black")
+
+    ax.set_xlabel("Year", fontsize=12)
+    ax.set_ylabel("Number of UPR Recommendations", fontsize=12)
+    ax.set_title(f"UPR Recommendations: Freedom of Expression vs Other ({x_vals[0]}–{x_vals[-1]})", fontsize=14)
+    ax.legend(loc="upper left", fontsize=10)
+    ax.grid(axis="y", linestyle="--", alpha=0.7)
+    plt.tight_layout()
+    return fig
+
+
+def main():
+    upr_records = load_upr_records(INPUT_FILE)
+    if PREVIEW:
+        for frac, est, margins in preview_theme_by_year(upr_records, theme, yrs):
+            print(f"Preview from {frac:.1%} of the UPR records")
+            plot_theme_share(est, margins)
+            plt.show()
+    counts = count_theme_by_year(upr_records, theme, yrs, unique=COUNT_UNIQUE)
+    plot_theme_share(counts)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.decomposition import LatentDirichletAllocation, MiniBatchNMF
+from sklearn.preprocessing import normalize
+
+from Corpus_query import INPUT_FILE, load_corpus, dataset_fingerprint
+from Corpus_mmap import OUTPUT_DIR as MMAP_DIR, MappedCorpus, build_mmap_corpus, is_current
+from Multilingual import LANGUAGES, language_stopwords
+from Text_pipeline import Vocabulary, TokenFilter, tokenize
+from Trend_engine import START_YR, END_YR, ALL_THEMES, scan_emerging
+
+# --- Configuration ---
+MODEL_DIR = 'Data/UHRI_Internet.topics'   # Vocabulary, model, per-record topic weights
+METHOD = 'lda'            # 'lda' (online LDA on counts) or 'nmf' (mini-batch NMF on TF-IDF)
+N_TOPICS = 20
+MAX_FEATURES = 20000      # Most frequent unigrams kept as features
+MIN_DF = 5                # Drop words seen in fewer records...
+MAX_DF = 0.5              # ...or in more than this share of them
+BATCH_SIZE = 2048         # Records per mini-batch (only one batch is vectorized at a time)
+N_PASSES = 2              # Passes over the corpus when training
+TOP_TERMS = 10
+SEED = 42
+
+# Layout of MODEL_DIR:
+#   features.json  feature words and their document frequencies (fixed at training)
+#   model.pkl      fitted scikit-learn estimator, updated in place by 'update'
+#   weights.f32    float32[n, n_topics] memmap of per-record topic weights (rows sum to 1,
+#                  0 for records without any feature), aligned with the mapped corpus
+#   hashes.npy     uint64 hashes of the texts the model was trained on (sorted)
+#   meta.json      written last; method, sizes and source fingerprint of the weights
+
+
+def text_filter():
+    """Alphabetic unigrams minus the stopwords of every Multilingual.LANGUAGES language."""
+    return TokenFilter(Vocabulary(), language_stopwords(LANGUAGES), alpha_only=True)
+
+
+def text_hashes(corpus):
+    """64-bit hash of every record text, used to find the records a model has not seen."""
+    return np.fromiter((int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'little')
+                        for t in corpus.texts()), dtype=np.uint64, count=len(corpus))
+
+
+def batches(corpus, rows=None, batch_size=BATCH_SIZE, order=None):
+    """(record ids, texts) per batch of consecutive records (or of 'rows'); 'order' permutes the batches."""
+    rows = np.arange(len(corpus)) if rows is None else np.asarray(rows)
+    starts = np.arange(0, len(rows), batch_size)
+    for a in (starts if order is None else starts[order(len(starts))]):
+        ids = rows[a:a + batch_size]
+        yield ids, [corpus.text(int(i)) for i in ids]
+
+
+def build_vocabulary(corpus, token_filter, max_features=MAX_FEATURES, min_df=MIN_DF, max_df=MAX_DF):
+    """
+    Feature words of the model in one streaming pass: the max_features words
+    with the highest document frequency between min_df and max_df * records.
+    Returns the words and their document frequencies.
+    """
+    df = Counter()
+    for _, texts in batches(corpus):
+        for t in texts:
+            df.update(set(token_filter.ids(tokenize(t))))
+    tokens = token_filter.vocab.tokens
+    kept = [(i, c) for i, c in df.items() if min_df <= c <= max_df * len(corpus)]
+    kept.sort(key=lambda ic: (-ic[1], tokens[ic[0]]))
+    kept = kept[:max_features]
+    return [tokens[i] for i, _ in kept], np.array([c for _, c in kept], dtype=np.int64)
+
+
+class Featurizer:
+    """Texts -> sparse (texts x features) matrix: counts for LDA, L2-normalized TF-IDF for NMF."""
+
+    def __init__(self, features, df, n_records, method=METHOD):
+        self.token_filter = text_filter()
+        self.columns = dict(zip(self.token_filter.vocab.encode(features), range(len(features))))
+        self.n_features = len(features)
+        self.idf = np.log((1 + n_records) / (1 + np.asarray(df, dtype=float))) + 1 if method == 'nmf' else None
+
+    def __call__(self, texts):
+        rows, cols = [], []
+        columns = self.columns
+        for r, t in enumerate(texts):
+            c = [columns[i] for i in self.token_filter.ids(tokenize(t)) if i in columns]
+            cols.extend(c)
+            rows.extend([r] * len(c))
+        X = sparse.csr_matrix((np.ones(len(cols), dtype=np.float64), (rows, cols)),
+                              shape=(len(texts), self.n_features))
+        if self.idf is not None:
+            X = normalize(X.multiply(self.idf).tocsr())
+        return X
+
+
+def make_model(method, n_topics, n_records, batch_size=BATCH_SIZE, seed=SEED):
+    if method == 'lda':
+        return LatentDirichletAllocation(n_components=n_topics, learning_method='online', batch_size=batch_size,
+                                         total_samples=n_records, random_state=seed)
+    if method == 'nmf':
+        return MiniBatchNMF(n_components=n_topics, batch_size=batch_size, random_state=seed)
+    raise ValueError(f"Unknown topic model method '{method}' (use 'lda' or 'nmf')")
+
+
+def topic_weights(model, X):
+    """Topic weights of every row of X, normalized to sum to 1 (all 0 for rows without features)."""
+    W = model.transform(X)
+    W[X.getnnz(axis=1) == 0] = 0
+    s = W.sum(axis=1, keepdims=True)
+    return np.divide(W, s, out=np.zeros_like(W), where=s > 0).astype(np.float32)
+
+
+def _fit(model, featurize, corpus, rows=None, passes=N_PASSES, seed=SEED):
+    """partial_fit over mini-batches of the records, in a new random batch order every pass."""
+    rng = np.random.RandomState(seed)
+    for p in range(passes):
+        for _, texts in batches(corpus, rows, order=rng.permutation):
+            X = featurize(texts)
+            if X.nnz:
+                model.partial_fit(X)
+        print(f"Pass {p + 1}/{passes} done")
+
+
+def _write_weights(model, featurize, corpus, model_dir):
+    n = len(corpus)
+    weights = np.memmap(os.path.join(model_dir, 'weights.f32'), dtype=np.float32, mode='w+',
+                        shape=(max(n, 1), model.n_components))
+    for ids, texts in batches(corpus):
+        weights[ids[0]:ids[-1] + 1] = topic_weights(model, featurize(texts))
+    weights.flush()
+
+
+def _save(model_dir, model, features, df, hashes, meta):
+    with open(os.path.join(model_dir, 'model.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+    with open(os.path.join(model_dir, 'features.json'), 'w', encoding='utf-8') as f:
+        json.dump({'features': features, 'df': np.asarray(df).tolist()}, f)
+    np.save(os.path.join(model_dir, 'hashes.npy'), np.unique(hashes))
+    with open(os.path.join(model_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+
+
+def train(corpus, fingerprint, model_dir=MODEL_DIR, method=METHOD, n_topics=N_TOPICS, passes=N_PASSES):
+    """
+    Fit a topic model out-of-core: a vocabulary pass, then 'passes' passes of
+    mini-batch partial_fit, then the topic weights of every record. Only one
+    mini-batch of the document-term matrix is held in memory at a time.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    meta_file = os.path.join(model_dir, 'meta.json')
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+    features, df = build_vocabulary(corpus, text_filter())
+    if not features:
+        raise ValueError("No word passes the MIN_DF / MAX_DF limits; nothing to model.")
+    featurize = Featurizer(features, df, len(corpus), method)
+    model = make_model(method, n_topics, len(corpus))
+    _fit(model, featurize, corpus, passes=passes)
+    _write_weights(model, featurize, corpus, model_dir)
+    meta = {'method': method, 'n_topics': n_topics, 'n_features': len(features), 'n_records': len(corpus),
+            'n_trained': len(corpus), 'n_df': len(corpus), 'source_fingerprint': fingerprint}
+    _save(model_dir, model, features, df, text_hashes(corpus), meta)
+    return meta
+
+
+def load_model(model_dir=MODEL_DIR):
+    """(model, features, document frequencies, meta) of a trained model."""
+    meta = read_meta(model_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No topic model in '{model_dir}'; run the 'train' step first.")
+    with open(os.path.join(model_dir, 'model.pkl'), 'rb') as f:
+        model = pickle.load(f)
+    with open(os.path.join(model_dir, 'features.json'), 'r', encoding='utf-8') as f:
+        vocab = json.load(f)
+    return model, vocab['features'], np.array(vocab['df']), meta
+
+
+def read_meta(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def update(corpus, fingerprint, model_dir=MODEL_DIR, passes=1):
+    """
+    Fold the records whose text the model has not seen into it with partial_fit
+    (the vocabulary and, for NMF, the IDF weights stay those of training), then
+    refresh the topic weights of every record. Returns the number of new records.
+    """
+    model, features, df, meta = load_model(model_dir)
+    hashes = text_hashes(corpus)
+    seen = np.load(os.path.join(model_dir, 'hashes.npy'))
+    new_rows = np.flatnonzero(~np.isin(hashes, seen))
+    os.remove(os.path.join(model_dir, 'meta.json'))
+    featurize = Featurizer(features, df, meta['n_df'], meta['method'])
+    if len(new_rows):
+        if meta['method'] == 'lda':
+            model.total_samples = meta['n_trained'] + len(new_rows)
+        _fit(model, featurize, corpus, new_rows, passes)
+    _write_weights(model, featurize, corpus, model_dir)
+    meta.update({'n_records': len(corpus), 'n_trained': meta['n_trained'] + len(new_rows),
+                 'source_fingerprint': fingerprint})
+    _save(model_dir, model, features, df, np.concatenate([seen, hashes[new_rows]]), meta)
+    return len(new_rows)
+
+
+def open_weights(model_dir=MODEL_DIR, fingerprint=None):
+    """
+    Map the per-record topic weights read-only (records x topics, aligned with
+    the mapped corpus). With 'fingerprint', weights of another dataset are refused.
+    """
+    meta = read_meta(model_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No topic weights in '{model_dir}'; run the 'train' step first.")
+    if fingerprint is not None and meta['source_fingerprint'] != fingerprint:
+        raise RuntimeError(f"Topic weights in '{model_dir}' are for another dataset; run the 'update' step.")
+    return np.memmap(os.path.join(model_dir, 'weights.f32'), dtype=np.float32, mode='r',
+                     shape=(max(meta['n_records'], 1), meta['n_topics']))[:meta['n_records']]
+
+
+# ----------------------------------------------------------------------
+# Topics and aggregations
+# ----------------------------------------------------------------------
+def top_terms(model, features, n=TOP_TERMS):
+    """The n highest-weighted feature words of every topic."""
+    return [[features[j] for j in np.argsort(-row, kind='stable')[:n]] for row in model.components_]
+
+
+def topic_labels(model, features, n=3):
+    return [f"T{k + 1:02d} " + " / ".join(terms) for k, terms in enumerate(top_terms(model, features, n))]
+
+
+def topic_cube(corpus, weights, labels, start_yr=START_YR, end_yr=END_YR, batch_size=BATCH_SIZE * 16):
+    """
+    Topic weights summed per (year, body, topic) in the layout of
+    Trend_engine.build_cube, so its series operations and scan_emerging apply:
+    the topic slots hold expected record counts, the last slot (ALL_THEMES)
+    the records with any feature, and all mass is on keyword flag 0.
+    """
+    years = np.arange(start_yr, end_yr + 1)
+    cube = np.zeros((len(years), len(corpus.bodies), weights.shape[1] + 1, 2))
+    year = np.asarray(corpus.year, dtype=np.int64)
+    body = np.asarray(corpus.body, dtype=np.int64)
+    for a in range(0, len(weights), batch_size):
+        b = min(a + batch_size, len(weights))
+        keep = np.flatnonzero((year[a:b] >= start_yr) & (year[a:b] <= end_yr))
+        W = np.asarray(weights[a:b][keep], dtype=np.float64)
+        np.add.at(cube[..., 0], (year[a:b][keep] - start_yr, body[a:b][keep]),
+                  np.hstack([W, W.sum(axis=1, keepdims=True)]))
+    meta = {'years': years.tolist(), 'bodies': list(corpus.bodies), 'themes': list(labels) + [ALL_THEMES],
+            'keywords': []}
+    return cube, meta
+
+
+def topic_shares(cube, meta, by='year'):
+    """Share (%) of the records' topic weight per year or body (rows) and topic (columns)."""
+    counts = cube.sum(axis=-1)
+    axis = 1 if by == 'year' else 0
+    counts = counts.sum(axis=axis)
+    totals = counts[:, -1:]
+    shares = np.divide(counts[:, :-1], totals, out=np.zeros_like(counts[:, :-1]), where=totals > 0) * 100
+    index = meta['years'] if by == 'year' else meta['bodies']
+    df = pd.DataFrame(shares.round(1), index=index, columns=meta['themes'][:-1])
+    df.index.name = 'Year' if by == 'year' else 'Body'
+    return df[totals[:, 0] > 0]
+
+
+def get_corpus(input_file=INPUT_FILE, mmap_dir=MMAP_DIR):
+    """(mapped corpus, fingerprint), rebuilding the mapped corpus when the source changed."""
+    fingerprint = dataset_fingerprint(input_file)
+    if not is_current(mmap_dir, input_file):
+        build_mmap_corpus(load_corpus(input_file), mmap_dir, fingerprint)
+    return MappedCorpus(mmap_dir), fingerprint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental topic model (online LDA / mini-batch NMF) of the corpus.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_train = sub.add_parser('train', help="Fit a new model and compute every record's topic weights")
+    p_train.add_argument('--method', choices=['lda', 'nmf'], default=METHOD)
+    p_train.add_argument('--topics', type=int, default=N_TOPICS)
+    p_train.add_argument('--passes', type=int, default=N_PASSES)
+    p_update = sub.add_parser('update', help="Fold new records into the model and refresh the weights")
+    p_update.add_argument('--passes', type=int, default=1)
+    p_topics = sub.add_parser('topics', help="Top words of every topic")
+    p_topics.add_argument('--top', type=int, default=TOP_TERMS)
+    p_trends = sub.add_parser('trends', help="Topic shares per year or body")
+    p_trends.add_argument('--by', choices=['year', 'body'], default='year')
+    p_trends.add_argument('--emerging', action='store_true',
+                          help="Scan every body x topic series for upward shifts (Trend_engine.scan_emerging)")
+    p_trends.add_argument('--min-count', type=int, default=10, help="Minimum expected records per series")
+    args = parser.parse_args()
+
+    try:
+        corpus, fingerprint = get_corpus(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+    except json.JSONDecodeError:
+        print("JSON decode error.")
+        return
+
+    try:
+        if args.command == 'train':
+            meta = train(corpus, fingerprint, args.model_dir, args.method, args.topics, args.passes)
+            print(f"Trained {meta['method']} with {meta['n_topics']} topics over {meta['n_features']} words "
+                  f"on {meta['n_records']} records.")
+        elif args.command == 'update':
+            n_new = update(corpus, fingerprint, args.model_dir, args.passes)
+            print(f"Model updated with {n_new} new records; weights refreshed for {len(corpus)} records.")
+        elif args.command == 'topics':
+            model, features, _, _ = load_model(args.model_dir)
+            for k, terms in enumerate(top_terms(model, features, args.top)):
+                print(f"T{k + 1:02d}: {' '.join(terms)}")
+        else:
+            model, features, _, _ = load_model(args.model_dir)
+            weights = open_weights(args.model_dir, fingerprint)
+            cube, meta = topic_cube(corpus, weights, topic_labels(model, features))
+            with pd.option_context('display.max_columns', None, 'display.width', 200):
+                if args.emerging:
+                    df = scan_emerging(cube, meta, min_count=args.min_count).rename(columns={'Theme': 'Topic'})
+                    print(df.head(20))
+                else:
+                    print(topic_shares(cube, meta, args.by).T)
+    except (FileNotFoundError, RuntimeError, ValueError) as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
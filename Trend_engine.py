@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from Corpus_query import INPUT_FILE, load_corpus, dataset_fingerprint
+from Corpus_mmap import OUTPUT_DIR as MMAP_DIR, MappedCorpus, build_mmap_corpus, is_current
+
+# --- Configuration ---
+CUBE_FILE = 'Data/UHRI_Internet.cube.npz'   # Precomputed count cube
+TARGET_WORDS = [
+    "internet access", "digital divide", "connectivity",
+    "access online", "access digital"
+]
+ALL_THEMES = '(all records)'   # Extra theme slot counting every record once
+START_YR, END_YR = 2006, 2024
+
+
+# ----------------------------------------------------------------------
+# Count cube: (year x body x theme x keyword-flag)
+# ----------------------------------------------------------------------
+def theme_matrix(corpus):
+    """Boolean (records x themes) matrix unpacked from the corpus theme bitmask."""
+    bits = np.ascontiguousarray(corpus.theme_bits, dtype='<u8')
+    unpacked = np.unpackbits(bits.view(np.uint8), axis=1, bitorder='little')
+    return unpacked[:, :len(corpus.themes)].astype(bool)
+
+
+def keyword_flags(corpus, words=TARGET_WORDS):
+    """1 for records whose lowercased text contains any of 'words' (as in General_trends.add_dummy_variable)."""
+    return np.fromiter((any(w in t.lower() for w in words) for t in corpus.texts()),
+                       dtype=np.int8, count=len(corpus))
+
+
+def build_cube(corpus, words=TARGET_WORDS, start_yr=START_YR, end_yr=END_YR):
+    """
+    Count records per (year, body, theme, keyword flag). The last theme slot
+    (ALL_THEMES) counts every record once, which gives the total output used
+    for normalization. Records outside the year range are skipped.
+    """
+    years = np.arange(start_yr, end_yr + 1)
+    n_themes = len(corpus.themes) + 1
+    cube = np.zeros((len(years), len(corpus.bodies), n_themes, 2), dtype=np.int64)
+
+    year = np.asarray(corpus.year, dtype=np.int64)
+    keep = (year >= start_yr) & (year <= end_yr)
+    yi = year[keep] - start_yr
+    bi = np.asarray(corpus.body, dtype=np.int64)[keep]
+    fi = keyword_flags(corpus, words)[keep].astype(np.int64)
+    tm = theme_matrix(corpus)[keep]
+
+    rec, th = np.nonzero(tm)
+    np.add.at(cube, (yi[rec], bi[rec], th, fi[rec]), 1)
+    np.add.at(cube, (yi, bi, np.full_like(yi, n_themes - 1), fi), 1)
+
+    meta = {'years': years.tolist(), 'bodies': list(corpus.bodies),
+            'themes': list(corpus.themes) + [ALL_THEMES], 'keywords': list(words)}
+    return cube, meta
+
+
+def save_cube(cube, meta, path=CUBE_FILE):
+    np.savez_compressed(path, cube=cube, meta=np.array(json.dumps(meta)))
+
+
+def load_cube(path=CUBE_FILE):
+    with np.load(path) as f:
+        return f['cube'], json.loads(str(f['meta']))
+
+
+# ----------------------------------------------------------------------
+# Vectorized series operations (time is the last axis of every array)
+# ----------------------------------------------------------------------
+def safe_divide(num, den):
+    """num / den with NaN where den == 0."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def rolling_sum(x, window):
+    """Trailing rolling sum over the last axis; the first window-1 values are NaN."""
+    if window < 1:
+        raise ValueError(f"Rolling window must be at least 1, got {window}")
+    x = np.asarray(x, dtype=float)
+    c = np.cumsum(x, axis=-1)
+    out = np.full(x.shape, np.nan)
+    out[..., window - 1:] = c[..., window - 1:]
+    out[..., window:] -= c[..., :-window]
+    return out
+
+
+def rolling_share(num, den, window=3):
+    """Share of 'num' in 'den' over trailing windows (e.g. 3-year shares)."""
+    return safe_divide(rolling_sum(num, window), rolling_sum(den, window))
+
+
+def yoy_growth(x):
+    """Year-over-year relative growth; NaN for the first year and after zero years."""
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    out[..., 1:] = safe_divide(x[..., 1:] - x[..., :-1], x[..., :-1])
+    return out
+
+
+def normalize_by_total(x, total):
+    """Express counts as a share of total output (the 'TOTAL' line of the active-mechanisms plot)."""
+    return safe_divide(x, total)
+
+
+def change_points(x, min_size=3):
+    """
+    Most likely single mean shift in every series at once.
+    For each split k the reduction in squared error from fitting separate
+    means before and after k is computed from cumulative sums; the best split
+    per series is returned with its score (reduction divided by the residual
+    variance, larger = stronger) and the means before/after the split.
+    NaN years (e.g. a body with no output that year) are left out of the
+    means, and a split starts at an observed year with at least 'min_size'
+    observed years on each side; series without one get split -1 and NaNs.
+    Returns (split index, score, mean before, mean after).
+    """
+    x = np.asarray(x, dtype=float)
+    flat = x.reshape(-1, x.shape[-1])
+    n = flat.shape[1]
+    shape = x.shape[:-1]
+    if n < 2 * min_size:
+        nan = np.full(shape, np.nan)
+        return np.full(shape, -1), nan, nan.copy(), nan.copy()
+
+    observed = ~np.isnan(flat)
+    values = np.where(observed, flat, 0.0)
+    cs = np.cumsum(values, axis=1)
+    cs2 = np.cumsum(values ** 2, axis=1)
+    cn = np.cumsum(observed, axis=1)
+    total, total2, count = cs[:, -1:], cs2[:, -1:], cn[:, -1:]
+    k = np.arange(1, n)
+    left, n_left = cs[:, k - 1], cn[:, k - 1]
+    right, n_right = total - left, count - n_left
+    valid = (n_left >= min_size) & (n_right >= min_size) & observed[:, k]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain = np.where(valid, left ** 2 / n_left + right ** 2 / n_right - total ** 2 / count, -np.inf)
+    best = gain.argmax(axis=1)
+    rows = np.arange(flat.shape[0])
+    found = valid[rows, best]
+    split = np.where(found, k[best], -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g = gain[rows, best]
+        m = count[:, 0]
+        sse = total2[:, 0] - total[:, 0] ** 2 / m - g
+        # Floor the residual variance so perfect steps score high instead of NaN
+        score = np.where(found, g / np.maximum(sse / np.maximum(m - 2, 1), 1e-12), np.nan)
+        before = np.where(found, left[rows, best] / n_left[rows, best], np.nan)
+        after = np.where(found, right[rows, best] / n_right[rows, best], np.nan)
+    return split.reshape(shape), score.reshape(shape), before.reshape(shape), after.reshape(shape)
+
+
+# ----------------------------------------------------------------------
+# Batch scan
+# ----------------------------------------------------------------------
+def scan_emerging(cube, meta, keyword_only=False, window=3, min_count=10, min_size=3):
+    """
+    Scan every (body, theme) series in one vectorized pass.
+    Each series is the body's count on the theme normalized by the body's total
+    output per year. Returns one row per series with an upward change point,
+    sorted by change-point score.
+    """
+    counts = cube[..., 1] if keyword_only else cube.sum(axis=-1)     # (year, body, theme)
+    counts = np.moveaxis(counts, 0, -1).astype(float)                 # (body, theme, year)
+    totals = counts[:, -1:, :]                                        # ALL_THEMES slot
+    share = normalize_by_total(counts[:, :-1, :], totals)            # (body, theme, year)
+
+    split, score, before, after = change_points(share, min_size)
+    recent = rolling_share(counts[:, :-1, :], totals, window)[..., -1]
+    growth = yoy_growth(rolling_sum(counts[:, :-1, :], window))[..., -1]
+    n_total = counts[:, :-1, :].sum(axis=-1)
+
+    years = meta['years']
+    rising = (after > before) & ~np.isclose(after, before)   # not rounding noise on a flat series
+    b_idx, t_idx = np.nonzero((n_total >= min_count) & rising & (split >= 0))
+    df = pd.DataFrame({
+        'Body': [meta['bodies'][b] for b in b_idx],
+        'Theme': [meta['themes'][t] for t in t_idx],
+        'Mentions': n_total[b_idx, t_idx].astype(int),
+        'Change Year': [years[s] for s in split[b_idx, t_idx]],
+        'Share Before (%)': (before[b_idx, t_idx] * 100).round(1),
+        'Share After (%)': (after[b_idx, t_idx] * 100).round(1),
+        f'Share Last {window}y (%)': (recent[b_idx, t_idx] * 100).round(1),
+        f'Growth Last {window}y (%)': (growth[b_idx, t_idx] * 100).round(1),
+        'Score': score[b_idx, t_idx].round(2),
+    })
+    return df.sort_values('Score', ascending=False).reset_index(drop=True)
+
+
+def get_cube(input_file=INPUT_FILE, mmap_dir=MMAP_DIR, cube_file=CUBE_FILE, words=TARGET_WORDS):
+    """Load the count cube, rebuilding the mapped corpus and/or cube when the source changed."""
+    fingerprint = dataset_fingerprint(input_file)
+    if os.path.exists(cube_file):
+        cube, meta = load_cube(cube_file)
+        if meta.get('source_fingerprint') == fingerprint and meta['keywords'] == list(words):
+            return cube, meta
+    if not is_current(mmap_dir, input_file):
+        build_mmap_corpus(load_corpus(input_file), mmap_dir, fingerprint)
+    cube, meta = build_cube(MappedCorpus(mmap_dir), words)
+    meta['source_fingerprint'] = fingerprint
+    save_cube(cube, meta, cube_file)
+    return cube, meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan all body x theme series for emerging topics.")
+    parser.add_argument('--input', default=INPUT_FILE, help="Prepared JSON corpus")
+    parser.add_argument('--keyword-only', action='store_true',
+                        help="Only count records matching TARGET_WORDS")
+    parser.add_argument('--window', type=int, default=3, help="Rolling window in years")
+    parser.add_argument('--min-count', type=int, default=10, help="Minimum mentions per series")
+    parser.add_argument('--top', type=int, default=20, help="Rows to print")
+    args = parser.parse_args()
+    if args.window < 1:
+        parser.error("--window must be at least 1")
+
+    try:
+        cube, meta = get_cube(args.input)
+    except FileNotFoundError:
+        print(f"File not found: {args.input}")
+        return
+
+    df = scan_emerging(cube, meta, args.keyword_only, args.window, args.min_count)
+    print(f"Scanned {cube.shape[1] * (cube.shape[2] - 1)} body x theme series; "
+          f"{len(df)} show an upward shift.")
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(df.head(args.top))
+
+
+if __name__ == "__main__":
+    main()
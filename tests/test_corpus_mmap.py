@@ -0,0 +1,30 @@
+import os
+
+from Corpus_mmap import MappedCorpus, attach, build_mmap_corpus
+
+
+def records(texts):
+    return [{'Text': t, 'Themes': 'Right to education', 'Reccomending Body': 'CRC', 'Year': 2020} for t in texts]
+
+
+def test_rebuild_swaps_the_corpus_and_removes_the_previous_build(tmp_path):
+    out_dir = str(tmp_path / 'corpus.mmap')
+    build_mmap_corpus(records(['first']), out_dir)
+    first = MappedCorpus(out_dir)
+    assert attach(out_dir).text(0) == 'first'
+
+    build_mmap_corpus(records(['second', 'third']), out_dir)
+    assert os.path.islink(out_dir)
+    assert sorted(os.listdir(tmp_path)) == sorted(['corpus.mmap', os.readlink(out_dir)])
+    assert list(attach(out_dir).texts()) == ['second', 'third']
+    assert first.text(0) == 'first'     # Mapped before the rebuild: still readable
+
+
+def test_corpus_directory_of_the_old_layout_is_replaced(tmp_path):
+    out_dir = tmp_path / 'corpus.mmap'
+    out_dir.mkdir()
+    (out_dir / 'meta.json').write_text('{}')
+    build_mmap_corpus(records(['new']), str(out_dir))
+    assert os.path.islink(out_dir)
+    assert len(os.listdir(tmp_path)) == 2
+    assert MappedCorpus(str(out_dir)).text(0) == 'new'
@@ -0,0 +1,31 @@
+import pytest
+
+from Distinctive_terms import distinctive_terms
+from Text_pipeline import TokenFilter, Vocabulary
+
+TEXTS = [
+    "internet access for rural schools",
+    "internet access for rural schools and libraries",
+    "freedom of expression online and internet shutdowns",
+    "freedom of expression online for journalists",
+    "online privacy and personal data protection",
+    "personal data protection and internet access",
+]
+BODIES = ['CRC', 'CRC', 'CCPR', 'CCPR', 'CESCR', 'CESCR']
+YEARS = [2018, 2019, 2018, 2019, 2018, 2019]
+
+
+def scores(families, method):
+    token_filter = TokenFilter(Vocabulary(), {'and', 'for', 'of'}, alpha_only=True)
+    df = distinctive_terms(TEXTS, families, method, k=100, token_filter=token_filter,
+                           tokenize=str.split, ngram_range=(1, 1))
+    return {(s, t): v for s, t, v in zip(df['Slice'], df['Term'], df['Score'])}
+
+
+@pytest.mark.parametrize('method', ['log-odds', 'tfidf'])
+def test_slice_scores_do_not_depend_on_other_families(method):
+    alone = scores({'body': BODIES}, method)
+    together = scores({'body': BODIES, 'year': YEARS}, method)
+    assert alone
+    for key, value in alone.items():
+        assert together[key] == pytest.approx(value)
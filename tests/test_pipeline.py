@@ -0,0 +1,37 @@
+import importlib.util
+
+from Pipeline import Stage, stage_key
+
+STAGE_MODULE = '''
+def helper():
+    return {helper_years}
+
+
+def write_stage(out_file):
+    with open(out_file, 'w') as f:
+        f.write(str(helper()) + {stage_years})
+'''
+
+
+def load_stage(tmp_path, helper_years='(2006, 2024)', stage_years="''"):
+    """Stage whose function is defined in a freshly written module file."""
+    path = tmp_path / 'stage_module.py'
+    path.write_text(STAGE_MODULE.format(helper_years=helper_years, stage_years=stage_years))
+    spec = importlib.util.spec_from_file_location('stage_module', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return Stage('write', module.write_stage, params={'out_file': str(tmp_path / 'out.txt')})
+
+
+def test_unchanged_stage_keeps_its_key(tmp_path):
+    assert stage_key(load_stage(tmp_path), {}) == stage_key(load_stage(tmp_path), {})
+
+
+def test_editing_the_stage_function_invalidates_it(tmp_path):
+    key = stage_key(load_stage(tmp_path), {})
+    assert stage_key(load_stage(tmp_path, stage_years="' 2010-2024'"), {}) != key
+
+
+def test_editing_a_helper_of_the_stage_invalidates_it(tmp_path):
+    key = stage_key(load_stage(tmp_path), {})
+    assert stage_key(load_stage(tmp_path, helper_years='(2010, 2024)'), {}) != key
@@ -0,0 +1,27 @@
+from Dataset_prep import assign_clusters
+from Snapshot_store import add_snapshot, connect, record_keys, snapshot_records
+
+
+def record(text, year=2020):
+    return {'Text': text, 'Year': year, 'Reccomending Body': 'CRC', 'Themes': 'Right to education',
+            'Document Publication Date': f'{year}-01-01', 'Countries': 'Norway'}
+
+
+def test_export_keeps_the_ingested_record_order(tmp_path):
+    first = [record('access to the internet'), record('online privacy'), record('access to the internet'),
+             record('digital literacy')]
+    second = [record('access to the internet'), record('online privacy', 2021), record('new text'),
+              record('access to the internet'), record('digital literacy')]
+    conn = connect(str(tmp_path / 'store.sqlite'), create=True)
+    add_snapshot(conn, first, 'one')
+    add_snapshot(conn, second, 'two')
+
+    for label, records in (('one', first), ('two', second)):
+        exported = list(snapshot_records(conn, label))
+        assert exported == records
+        assert record_keys(exported) == record_keys(records)
+        assign_clusters(exported)
+        expected = [dict(r) for r in records]
+        assign_clusters(expected)
+        assert [r['Cluster ID'] for r in exported] == [r['Cluster ID'] for r in expected]
+    conn.close()
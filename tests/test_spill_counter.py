@@ -0,0 +1,47 @@
+import random
+from collections import Counter
+
+import pytest
+
+from Spill_counter import SpillCounter
+
+
+def tied_stream(seed=0, n_parts=3, n_updates=400):
+    """(partition, keys) updates with few distinct counts, so most ranks are ties."""
+    rng = random.Random(seed)
+    keys = rng.sample(range(1, 1 << 40), 60)
+    return [(rng.randrange(n_parts), [rng.choice(keys) for _ in range(rng.randint(1, 4))])
+            for _ in range(n_updates)]
+
+
+def reference(stream):
+    out = {}
+    for part, keys in stream:
+        out.setdefault(part, Counter()).update(keys)
+    return out
+
+
+@pytest.mark.parametrize('max_entries', [10 ** 6, 7, 1])
+def test_most_common_matches_counter_on_ties(tmp_path, max_entries):
+    stream = tied_stream()
+    expected = reference(stream)
+    with SpillCounter(max_entries, spill_dir=tmp_path) as counts:
+        for part, keys in stream:
+            counts.update(part, keys)
+        assert (counts.n_runs > 0) == (max_entries < 10 ** 6)
+        for k in (1, 5, 10, 100):
+            top = counts.most_common(k)
+            for part, ctr in expected.items():
+                assert list(top[part].items()) == ctr.most_common(k)
+                # The plotting code ranks the returned Counter again
+                assert top[part].most_common(k) == ctr.most_common(k)
+
+
+def test_counters_keep_first_seen_order(tmp_path):
+    stream = tied_stream(seed=1)
+    with SpillCounter(5, spill_dir=tmp_path) as counts:
+        for part, keys in stream:
+            counts.update(part, keys)
+        full = counts.counters()
+    for part, ctr in reference(stream).items():
+        assert list(full[part].items()) == list(ctr.items())
@@ -0,0 +1,41 @@
+import pytest
+
+import Text_pipeline
+from Text_pipeline import compare_tokenizers, regex_tokenize
+
+nltk_tokenizers = pytest.importorskip('nltk.tokenize')
+
+# Recommendation-like texts covering what regex_tokenize() must reproduce from
+# NLTK: contractions, hyphens, quotes, numbers and sentence ends
+TEXTS = [
+    "The Committee recommends that the State party ensure access to the Internet, including in rural areas.",
+    "Ensure children's access to digital technologies (e.g., online education) and protect them from cyber-bullying.",
+    "It can't restrict access — the Committee's view is that blocking websites isn't permissible.",
+    "We cannot accept that they're gonna block it; you'd think they'll reconsider.",
+    "Take measures to bridge the \"digital divide\" and promote e-government services.",
+    "\"Online safety\" programmes should reach women and girls, including 'safe internet' campaigns.",
+    "Recommends... strengthening non-discriminatory, rights-based digital policies -- as requested.",
+    "The State party should: (a) guarantee freedom of expression online; (b) repeal art. 5 of Law No. 12/2019.",
+    "Adopt the draft law on personal data protection by 31.12.2020 and provide 1,000 schools with broadband.",
+    "Allocate 2.5% of GDP and 10:30 hours of connectivity a week [para. 14] to 15-year-old students!",
+    "Internet shutdowns during elections should be prohibited.The Committee notes concern?",
+]
+
+
+def reference_tokenize(text):
+    """word_tokenize() on lowercased text, with an untrained Punkt model so no NLTK data is needed."""
+    sentences = nltk_tokenizers.PunktSentenceTokenizer().tokenize(text.lower())
+    words = nltk_tokenizers.NLTKWordTokenizer()
+    return [tok for sent in sentences for tok in words.tokenize(sent)]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_regex_tokenize_matches_nltk(text):
+    assert regex_tokenize(text) == reference_tokenize(text)
+
+
+def test_compare_tokenizers_reports_no_mismatch(monkeypatch):
+    monkeypatch.setitem(Text_pipeline.TOKENIZERS, 'nltk', reference_tokenize)
+    report = compare_tokenizers(TEXTS, keep=None)
+    assert report['mismatches'] == []
+    assert report['tokens'] > 0
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from Trend_engine import ALL_THEMES, change_points, rolling_sum, scan_emerging
+
+YEARS = list(range(2006, 2025))
+
+
+def one_body_cube(theme, total):
+    """Cube with one body and one theme (plus the ALL_THEMES slot) from per-year counts."""
+    cube = np.zeros((len(YEARS), 1, 2, 2))
+    cube[:, 0, 0, 0] = theme
+    cube[:, 0, 1, 0] = total
+    meta = {'years': YEARS, 'bodies': ['- CRC'], 'themes': ['Right to education', ALL_THEMES], 'keywords': []}
+    return cube, meta
+
+
+def test_gap_year_is_not_a_shift():
+    theme, total = np.full(len(YEARS), 2.0), np.full(len(YEARS), 10.0)
+    theme[8] = total[8] = 0      # The body produced nothing in 2014
+    assert scan_emerging(*one_body_cube(theme, total), min_count=1).empty
+
+    share = theme / np.where(total > 0, total, np.nan)
+    split, score, before, after = change_points(share)
+    assert np.isclose(before, 0.2) and np.isclose(after, 0.2)
+    assert score < 1e-3
+
+
+def test_shift_across_gap_year():
+    total = np.full(len(YEARS), 10.0)
+    theme = np.where(np.array(YEARS) < 2016, 1.0, 4.0)
+    theme[5] = total[5] = 0      # Gap before the shift
+    theme[10] = total[10] = 0    # Gap in the year the shift starts: it is reported at the next observed year
+    df = scan_emerging(*one_body_cube(theme, total), min_count=1)
+    assert len(df) == 1
+    row = df.iloc[0]
+    assert row['Change Year'] == 2017
+    assert row['Share Before (%)'] == 10.0 and row['Share After (%)'] == 40.0
+
+
+def test_too_few_observed_years():
+    x = np.full(8, np.nan)
+    x[[0, 1, 7]] = [0.1, 0.1, 0.5]
+    split, score, before, after = change_points(x)
+    assert split == -1 and np.isnan(score) and np.isnan(before) and np.isnan(after)
+
+
+@pytest.mark.parametrize('window', [0, -1])
+def test_rolling_sum_rejects_empty_windows(window):
+    with pytest.raises(ValueError):
+        rolling_sum(np.ones((2, 5)), window)
+
+
+def test_rolling_sum_of_one_year_is_the_series():
+    x = np.arange(10.0).reshape(2, 5)
+    np.testing.assert_array_equal(rolling_sum(x, 1), x)